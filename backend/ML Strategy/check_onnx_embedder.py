@@ -0,0 +1,77 @@
+"""
+Parity check and encode benchmark: int8 ONNX embedder vs the torch SentenceTransformer.
+
+    python check_onnx_embedder.py [--csv "data sources/mitigation_action_cleaned.csv"]
+
+Encodes the knowledge base query strings with both backends and fails
+(exit code 1) if any pair of embeddings has cosine similarity below
+--min-cosine, or if nearest-neighbour retrieval over the set disagrees for
+more than --max-rank-mismatch of the queries. Prints encode throughput for each.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.embeddings import load_embedder
+from services.mitigation_keys import mitigation_key
+
+# Extra phrasings so the check covers more than the exact canonical keys
+EXTRA_QUERIES = [
+    "Invasive Species | high", "Freshwater Risk | moderate risk", "marine hci | low",
+    "terrestrial habitat loss", "IUCN critically endangered species near a hotel",
+]
+
+
+def benchmark(embedder, texts, repeats, batch_size):
+    embedder.encode(texts[:2], batch_size=batch_size)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeats):
+        embeddings = embedder.encode(texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    return np.asarray(embeddings, dtype=np.float32), len(texts) * repeats / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default="data sources/mitigation_action_cleaned.csv")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--max-rank-mismatch", type=float, default=0.05)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, dtype=str, keep_default_na=False)
+    keys = {mitigation_key(r, t) for r, t in zip(df["risk_type"], df["threat_level"])}
+    texts = [f"{risk_type} | {threat_level}" for risk_type, threat_level in sorted(keys)] + EXTRA_QUERIES
+
+    # Uncached, so both numbers measure the models themselves
+    torch_embeddings, torch_rate = benchmark(load_embedder("torch", cached=False), texts, args.repeats, args.batch_size)
+    onnx_embeddings, onnx_rate = benchmark(load_embedder("onnx", cached=False), texts, args.repeats, args.batch_size)
+
+    cosines = (torch_embeddings * onnx_embeddings).sum(axis=1)
+    # Each query's nearest other text must be the same under both models
+    torch_similarity = torch_embeddings @ torch_embeddings.T
+    onnx_similarity = onnx_embeddings @ onnx_embeddings.T
+    np.fill_diagonal(torch_similarity, -np.inf)
+    np.fill_diagonal(onnx_similarity, -np.inf)
+    mismatch = float((torch_similarity.argmax(axis=1) != onnx_similarity.argmax(axis=1)).mean())
+
+    print(f"📐 {len(texts)} texts: cosine min {cosines.min():.4f}, mean {cosines.mean():.4f}; "
+          f"nearest-neighbour mismatch {mismatch:.1%}")
+    print(f"⏱️ torch {torch_rate:.0f} texts/s, onnx int8 {onnx_rate:.0f} texts/s "
+          f"({onnx_rate / torch_rate:.1f}x)")
+
+    if cosines.min() < args.min_cosine or mismatch > args.max_rank_mismatch:
+        worst = int(cosines.argmin())
+        print(f"❌ Parity check failed (worst: '{texts[worst]}' at {cosines[worst]:.4f})")
+        sys.exit(1)
+    print("✅ ONNX embeddings match the torch model")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,115 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+
 import pandas as pd
-from sentence_transformers import SentenceTransformer
-from chromadb import PersistentClient
-
-# Load your CSV (keep original formatting in column values)
-df = pd.read_csv("data sources/mitigation_action_cleaned.csv")
-
-# Setup ChromaDB client and collection
-client = PersistentClient(path="./chroma_storage_rag")
-collection = client.get_or_create_collection(name="mitigation_knowledge")
-
-# Load embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-# ✅ Clear existing documents safely
-existing_ids = collection.get()["ids"]
-if existing_ids:
-    collection.delete(ids=existing_ids)
-
-# Embed and add data using unaltered 'risk_type' and 'threat_level'
-for idx, row in df.iterrows():
-    risk_type = str(row.get("risk_type", "")).strip()                # e.g., "Invasive Species"
-    threat_level = str(row.get("threat_level", "")).strip().title()  # e.g., "High"
-    action = str(row.get("mitigation_action", "")).strip()
-
-    if not risk_type or not threat_level or not action:
-        continue  # Skip incomplete entries
-
-    query_text = f"{risk_type} | {threat_level}"
-    embedding = model.encode(query_text).tolist()
-
-    collection.add(
-        documents=[action],
-        metadatas=[{
-            "risk_type": risk_type,
-            "threat_level": threat_level,
-        }],
-        ids=[f"mitigation-{idx}"],
-        embeddings=[embedding]
-    )
-
-# Show a few entries to confirm
-print("✅ Embedding complete.")
-print("Total documents stored:", collection.count())
-print("Preview:")
-print(collection.peek(3))
+
+# Canonical keys and embedding backends shared with query_mitigation_action()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.embeddings import EMBEDDING_BACKEND, load_embedder
+from services.mitigation_keys import mitigation_key
+
+DEFAULT_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 64))
+MODEL_NAME = "all-MiniLM-L6-v2"
+COLLECTION_NAME = "mitigation_knowledge"
+
+
+def content_id(risk_type, threat_level, action):
+    """Deterministic id: an unchanged row keeps its id, so re-ingest can skip it."""
+    digest = hashlib.sha1(f"{risk_type}\x1f{threat_level}\x1f{action}".encode("utf-8")).hexdigest()
+    return f"mitigation-{digest[:20]}"
+
+
+def load_rows(csv_path):
+    """Canonical (id, risk_type, threat_level, action) rows, skipping incomplete and duplicate entries."""
+    # Keep original formatting in column values
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    rows, seen = [], set()
+    for record in df.to_dict("records"):
+        # e.g. "Freshwater Risk" / "High" -> "freshwater" / "high", exactly what the app queries with
+        risk_type, threat_level = mitigation_key(record.get("risk_type", ""), record.get("threat_level", ""))
+        action = str(record.get("mitigation_action", "")).strip()
+        if not risk_type or not threat_level or not action:
+            continue  # Skip incomplete entries
+        row_id = content_id(risk_type, threat_level, action)
+        if row_id not in seen:
+            seen.add(row_id)
+            rows.append((row_id, risk_type, threat_level, action))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed the mitigation knowledge base into the vector store")
+    parser.add_argument("--csv", default="data sources/mitigation_action_cleaned.csv")
+    parser.add_argument("--backend", choices=("chroma", "numpy"),
+                        default=os.getenv('MITIGATION_VECTOR_BACKEND', 'chroma').lower())
+    parser.add_argument("--chroma-path", default="./chroma_storage_rag")
+    parser.add_argument("--store-path", default="./vector_store", help="directory of the numpy backend")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--embedding-backend", choices=("torch", "onnx"), default=EMBEDDING_BACKEND)
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every row, not just new or changed ones")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = load_rows(args.csv)
+
+    if args.backend == "numpy":
+        from services.vector_store import NumpyVectorStore
+        collection = NumpyVectorStore.open_or_create(args.store_path, COLLECTION_NAME, model=MODEL_NAME)
+    else:
+        # Setup ChromaDB client and collection
+        from chromadb import PersistentClient
+        client = PersistentClient(path=args.chroma_path)
+        collection = client.get_or_create_collection(name=COLLECTION_NAME)
+
+    # Rows whose content hash is already stored are unchanged; ids no longer in the CSV are stale
+    existing_ids = set(collection.get(include=[])["ids"])
+    wanted_ids = {row[0] for row in rows}
+    stale_ids = sorted(existing_ids - wanted_ids) if not args.rebuild else sorted(existing_ids)
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+    pending = [row for row in rows if args.rebuild or row[0] not in existing_ids]
+    print(f"📄 {len(rows)} rows: {len(pending)} to embed, {len(rows) - len(pending)} unchanged, "
+          f"{len(stale_ids)} removed")
+
+    encode_seconds = add_seconds = 0.0
+    if pending:
+        # Cached texts are read back; the model itself only loads if some text was never embedded
+        model = load_embedder(args.embedding_backend, preload=False)
+        for start in range(0, len(pending), args.batch_size):
+            batch = pending[start:start + args.batch_size]
+
+            t0 = time.perf_counter()
+            embeddings = model.encode(
+                [f"{risk_type} | {threat_level}" for _, risk_type, threat_level, _ in batch],
+                batch_size=args.batch_size,
+                show_progress_bar=False
+            )
+            t1 = time.perf_counter()
+            collection.upsert(
+                ids=[row_id for row_id, _, _, _ in batch],
+                documents=[action for _, _, _, action in batch],
+                metadatas=[{"risk_type": risk_type, "threat_level": threat_level}
+                           for _, risk_type, threat_level, _ in batch],
+                embeddings=embeddings.tolist()
+            )
+            encode_seconds += t1 - t0
+            add_seconds += time.perf_counter() - t1
+
+    if args.backend == "numpy":
+        collection.save()
+
+    total_seconds = time.perf_counter() - started
+    print("✅ Embedding complete.")
+    print("Total documents stored:", collection.count())
+    if pending:
+        print(f"⏱️ encode {encode_seconds:.2f}s ({len(pending) / max(encode_seconds, 1e-9):.0f} rows/s), "
+              f"add {add_seconds:.2f}s, total {total_seconds:.2f}s, batch size {args.batch_size}")
+    else:
+        print(f"⏱️ Nothing to embed, total {total_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Export all-MiniLM-L6-v2 to ONNX and quantize it to int8 for EMBEDDING_BACKEND=onnx.
+
+Needs torch, transformers and onnxruntime on the machine that runs it (the
+deployment only needs onnxruntime and tokenizers):
+
+    python export_onnx_embedder.py [--out onnx_minilm]
+
+Writes model.onnx (fp32), model_int8.onnx (dynamic int8 weights) and
+tokenizer.json; then run check_onnx_embedder.py to verify parity.
+"""
+import argparse
+import os
+import sys
+
+import torch
+from onnxruntime.quantization import QuantType, quantize_dynamic
+from transformers import AutoModel, AutoTokenizer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.embeddings import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR, ONNX_MODEL_FILE
+
+HF_MODEL_ID = f"sentence-transformers/{EMBEDDING_MODEL_NAME}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(HF_MODEL_ID)
+    model = AutoModel.from_pretrained(HF_MODEL_ID).eval()
+    # The fast tokenizer's tokenizer.json is all OnnxEmbedder needs at runtime
+    tokenizer.backend_tokenizer.save(os.path.join(args.out, "tokenizer.json"))
+
+    sample = tokenizer(["invasive | high", "a longer sample sentence for tracing"], padding=True, return_tensors="pt")
+    fp32_path = os.path.join(args.out, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]),
+            fp32_path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"}
+                          for name in ("input_ids", "attention_mask", "token_type_ids", "last_hidden_state")},
+            opset_version=14,
+        )
+    print(f"✅ Exported {fp32_path}")
+
+    int8_path = os.path.join(args.out, ONNX_MODEL_FILE)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized to {int8_path} "
+          f"({os.path.getsize(fp32_path) / 1e6:.1f} MB -> {os.path.getsize(int8_path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Chunk every CSV and JSON file in "data sources", embed the chunks into the
+vector store and write the BM25 index that search_mitigation_knowledge()
+serves lexical answers from.
+
+    python ingest_knowledge_sources.py [--backend numpy] [--rebuild]
+    python ingest_knowledge_sources.py --bm25-only
+
+--bm25-only writes just the BM25 index, with no vector store or embedding
+model (so neither torch nor onnxruntime is needed); /mitigation-knowledge
+then answers lexically until the vector collection is ingested as well.
+
+Chunk ids are content hashes, so a re-run only embeds new or changed chunks
+and removes chunks whose source text is gone. The BM25 index is always
+rewritten; it is cheap and must list exactly the chunks in the collection.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.embeddings import EMBEDDING_BACKEND, load_embedder  # loads no model or numpy at import
+from services.hybrid_retrieval import BM25Index
+from services.knowledge_sources import load_knowledge_chunks
+
+DEFAULT_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 64))
+MODEL_NAME = "all-MiniLM-L6-v2"
+# Must match KNOWLEDGE_COLLECTION / KNOWLEDGE_INDEX_FILE in mitigation_action.py
+COLLECTION_NAME = "mitigation_sources"
+INDEX_FILE = f"{COLLECTION_NAME}.bm25.json"
+
+
+def write_bm25_index(chunks, index_path):
+    """Build and save the BM25 index; returns the seconds it took."""
+    started = time.perf_counter()
+    os.makedirs(index_path, exist_ok=True)
+    BM25Index.build(chunks).save(os.path.join(index_path, INDEX_FILE))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk and index every mitigation data source")
+    parser.add_argument("--sources", default="data sources")
+    parser.add_argument("--backend", choices=("chroma", "numpy"),
+                        default=os.getenv('MITIGATION_VECTOR_BACKEND', 'chroma').lower())
+    parser.add_argument("--chroma-path", default="./chroma_storage_rag")
+    parser.add_argument("--store-path", default="./vector_store", help="directory of the numpy backend")
+    parser.add_argument("--index-path", default="./knowledge_index", help="directory of the BM25 index")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--embedding-backend", choices=("torch", "onnx"), default=EMBEDDING_BACKEND)
+    parser.add_argument("--rebuild", action="store_true", help="re-embed every chunk, not just new or changed ones")
+    parser.add_argument("--bm25-only", action="store_true", help="write the BM25 index only, without embedding")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    chunks = load_knowledge_chunks(args.sources)
+    sources = sorted({chunk["metadata"]["source"] for chunk in chunks})
+    print(f"📄 {len(chunks)} chunks from {len(sources)} sources: {', '.join(sources)}")
+
+    if args.bm25_only:
+        index_seconds = write_bm25_index(chunks, args.index_path)
+        print(f"✅ BM25 index written: {len(chunks)} chunks, {index_seconds:.2f}s")
+        return
+
+    if args.backend == "numpy":
+        from services.vector_store import NumpyVectorStore
+        collection = NumpyVectorStore.open_or_create(args.store_path, COLLECTION_NAME, model=MODEL_NAME)
+    else:
+        from chromadb import PersistentClient
+        client = PersistentClient(path=args.chroma_path)
+        collection = client.get_or_create_collection(name=COLLECTION_NAME)
+
+    existing_ids = set(collection.get(include=[])["ids"])
+    wanted_ids = {chunk["id"] for chunk in chunks}
+    stale_ids = sorted(existing_ids - wanted_ids) if not args.rebuild else sorted(existing_ids)
+    if stale_ids:
+        collection.delete(ids=stale_ids)
+    pending = [chunk for chunk in chunks if args.rebuild or chunk["id"] not in existing_ids]
+    print(f"🧩 {len(pending)} to embed, {len(chunks) - len(pending)} unchanged, {len(stale_ids)} removed")
+
+    encode_seconds = add_seconds = 0.0
+    if pending:
+        model = load_embedder(args.embedding_backend, preload=False)
+        for start in range(0, len(pending), args.batch_size):
+            batch = pending[start:start + args.batch_size]
+
+            t0 = time.perf_counter()
+            embeddings = model.encode([chunk["text"] for chunk in batch], batch_size=args.batch_size,
+                                      show_progress_bar=False)
+            t1 = time.perf_counter()
+            collection.upsert(
+                ids=[chunk["id"] for chunk in batch],
+                documents=[chunk["text"] for chunk in batch],
+                metadatas=[chunk["metadata"] for chunk in batch],
+                embeddings=embeddings.tolist()
+            )
+            encode_seconds += t1 - t0
+            add_seconds += time.perf_counter() - t1
+
+    if args.backend == "numpy":
+        collection.save()
+
+    index_seconds = write_bm25_index(chunks, args.index_path)
+
+    total_seconds = time.perf_counter() - started
+    print("✅ Knowledge sources indexed.")
+    print(f"Total chunks stored: {collection.count()}, BM25 chunks: {len(chunks)}")
+    if pending:
+        print(f"⏱️ encode {encode_seconds:.2f}s ({len(pending) / max(encode_seconds, 1e-9):.0f} chunks/s), "
+              f"add {add_seconds:.2f}s, BM25 {index_seconds:.2f}s, total {total_seconds:.2f}s")
+    else:
+        print(f"⏱️ Nothing to embed, BM25 {index_seconds:.2f}s, total {total_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
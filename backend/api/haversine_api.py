@@ -1,5 +1,19 @@
 import math
 
+# NumPy is optional - haversine_many falls back to a Python loop without it
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Earth's radius in miles
+EARTH_RADIUS_MI = 3960
+
+# Miles spanned by one degree of latitude
+MILES_PER_DEGREE_LAT = 2 * math.pi * EARTH_RADIUS_MI / 360
+
+
 def haversine(lat1, lon1, lat2, lon2):
     """
     Calculate the great-circle distance between two points
@@ -23,6 +37,36 @@ def haversine(lat1, lon1, lat2, lon2):
     a = math.sin(dlat / 2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2)**2
     c = 2 * math.asin(math.sqrt(a))
 
-    # Earth's radius in miles
-    radius = 3960
-    return c * radius
+    return c * EARTH_RADIUS_MI
+
+
+def haversine_many(lat, lon, lats, lons):
+    """
+    Great-circle distance from one point to many points in a single array operation.
+
+    Parameters:
+        lat, lon: Latitude and longitude of the origin (in degrees).
+        lats, lons: Sequences or arrays of latitudes and longitudes (in degrees).
+
+    Returns:
+        NumPy array of distances in miles (a list if NumPy is not installed).
+    """
+    if not NUMPY_AVAILABLE:
+        return [haversine(lat, lon, lat2, lon2) for lat2, lon2 in zip(lats, lons)]
+
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=np.float64)) - np.radians(lon)
+
+    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
+    return 2 * EARTH_RADIUS_MI * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def degree_radius_for_miles(lat, radius_mi):
+    """
+    Smallest square half-width (in degrees) that contains a circle of radius_mi around lat.
+
+    Longitude degrees shrink towards the poles, so the longitude span is the wider one.
+    """
+    return radius_mi / (MILES_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
@@ -31,7 +31,6 @@ try:
     print("📦 Loading reporting imports...")
     from reportlab.lib.pagesizes import letter
     from reportlab.pdfgen import canvas
-    from flask_caching import Cache
     import pandas as pd
     import xlsxwriter
     import traceback
@@ -43,7 +42,10 @@ try:
     print("📦 Loading mitigation action module...")
     from mitigation_action import (
         generate_mitigation_report,
-        query_mitigation_action,
+        mitigation_lookup_stats,
+        ml_status,
+        query_mitigation_actions_batch,
+        search_mitigation_knowledge,
         threat_level_from_code
     )
     print("✅ Mitigation action imports successful")
@@ -51,8 +53,9 @@ except ImportError as e:
     print(f"⚠️ Mitigation action import failed: {e} - using fallback functions")
     
     # Fallback functions
-    def query_mitigation_action(risk_type, threat_level, description=None):
-        return {"action": f"Monitor {risk_type} with {threat_level} threat level", "score": 1}
+    def query_mitigation_actions_batch(risks):
+        return [{"action": f"Monitor {risk['risk_type']} with {risk['threat_code']} threat level", "score": 1}
+                for risk in risks]
     
     def threat_level_from_code(threat_code):
         mapping = {"high": 8, "moderate": 6, "medium": 4, "low": 2}
@@ -61,9 +64,16 @@ except ImportError as e:
     def generate_mitigation_report(risks):
         return pd.DataFrame(risks) if 'pandas' in sys.modules else []
 
+    def mitigation_lookup_stats():
+        return {"chromadb": False}
+
+    def ml_status():
+        return {"state": "unavailable", "error": None, "load_seconds": None}
+
+    def search_mitigation_knowledge(query, k=5, risk_type=None, budget_ms=None):
+        return {"results": [], "mode": "unavailable", "elapsed_ms": 0.0}
+
 app = Flask(__name__)
-app.config["CACHE_TYPE"] = "simple"
-cache = Cache(app)
 
 # Get allowed origins from environment or default to localhost and Vercel
 default_origins = [
@@ -102,6 +112,23 @@ try:
 except ImportError as e:
     print(f"⚠️ Could not import account routes: {e}")
 
+# Single round-trip multi-layer risk query helpers
+from services.risk_query import build_union_query, detect_table_columns, group_rows_by_layer
+# Process-wide connection pool shared with the blueprints
+from services.db_pool import get_pool, pool_stats
+from services.dataset_version import UNVERSIONED, get_dataset_version
+from services.search_cache import SEARCH_CACHE_ENABLED, SearchResultCache
+# Nominatim lookups through the shared on-disk geocode cache
+from services.geocoding import GeocodingError, geocode_zip, nominatim_search
+# Bundled NJ ZIP centroids; ZIP searches only hit the network for codes missing from the table
+from services.zip_centroids import get_zip_centroids, nearest_zip, resolve_zip
+# Prefix index behind /address-autocomplete
+from services.autocomplete import get_address_autocomplete
+
+# /search results, keyed on the snapped point and invalidated by the dataset version
+search_cache = SearchResultCache() if SEARCH_CACHE_ENABLED else None
+get_zip_centroids()
+
 # Use environment variable for secret key
 app.secret_key = os.getenv('SECRET_KEY', 'your_secret_key_change_in_production')
 logging.basicConfig(level=logging.DEBUG)
@@ -145,31 +172,14 @@ print(f"   - Cookie Name: {app.config['SESSION_COOKIE_NAME']}")
 
 Session(app)
 
-# Simple database connection - no complex parsing
-def get_db_connection_string():
-    """Get database connection string directly"""
-    database_url = os.getenv('DATABASE_URL')
-    if database_url:
-        # Ensure SSL for Supabase
-        if 'supabase.com' in database_url and '?sslmode=' not in database_url:
-            database_url += '?sslmode=require'
-        return database_url
-    
-    # Fallback - build connection string from individual variables
-    host = os.getenv('DB_HOST', 'localhost')
-    user = os.getenv('DB_USER', 'postgres')
-    password = os.getenv('DB_PASSWORD', 'password')
-    dbname = os.getenv('DB_NAME', 'postgres')
-    port = os.getenv('DB_PORT', 5432)
-    
-    return f"postgresql://{user}:{password}@{host}:{port}/{dbname}"
-
 GEOCODING_API_URL = "https://nominatim.openstreetmap.org/search"
 
 # Health check endpoint for deployment
 @app.route("/health", methods=["GET"])
 def health_check():
-    return jsonify({"status": "healthy", "message": "Bioscope API is running"}), 200
+    # Healthy as soon as Flask serves; mitigation_ml says whether ChromaDB answers yet or the fallback is used
+    return jsonify({"status": "healthy", "message": "Bioscope API is running",
+                    "mitigation_ml": ml_status()["state"]}), 200
 
 # JWT Token test endpoint
 @app.route("/test-jwt", methods=["GET"])
@@ -230,7 +240,12 @@ def db_status():
             "status": "connected",
             "postgres_version": version[0] if version else "unknown",
             "users_table_exists": users_table_exists,
-            "database_url_configured": bool(os.getenv('DATABASE_URL'))
+            "database_url_configured": bool(os.getenv('DATABASE_URL')),
+            "connection_pool": pool_stats(),
+            "search_cache": search_cache.stats() if search_cache is not None else None,
+            "zip_centroids": get_zip_centroids().stats(),
+            "autocomplete": get_address_autocomplete().stats(),
+            "mitigation_lookups": mitigation_lookup_stats()
         }), 200
         
     except Exception as e:
@@ -258,15 +273,8 @@ def log_request():
 def connect_db():
     """Simple database connection without complex parsing"""
     try:
-        # Get the connection string directly
-        connection_string = get_db_connection_string()
-        
-        app.logger.info(f"🔍 DATABASE_URL exists: {bool(os.getenv('DATABASE_URL'))}")
-        app.logger.info(f"🔗 Connecting to database...")
-        
-        # Connect directly using the connection string
-        conn = psycopg2.connect(connection_string)
-        app.logger.info("✅ Database connection successful!")
+        # Check out a pooled connection (DSN from services.db_pool.get_database_url); conn.close() returns it
+        conn = get_pool().checkout()
         return conn
         
     except psycopg2.OperationalError as err:
@@ -284,17 +292,10 @@ def connect_db():
 # Get Latitude, Longitude from ZIP Code
 def get_lat_lon_from_zip(zipcode):
     try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"postalcode": zipcode, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
+        point = resolve_zip(zipcode, geocode=geocode_zip)
 
-        if response.status_code == 200 and response.json():
-            data = response.json()[0]
-            latitude = float(data["lat"])
-            longitude = float(data["lon"])
-            return latitude, longitude
+        if point:
+            return point
         else:
             return 40.0583, -74.4057  # Default coordinates for New Jersey
 
@@ -309,35 +310,22 @@ def get_lat_lon_from_address(address):
     """
     try:
         # Remove state to prevent conflicts with ZIP code
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": address, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        print(f"API Request URL: {response.url}")  # Debugging
-        print(f"API Response Status: {response.status_code}")  # Debugging
-
-        if response.status_code == 200:
-            json_response = response.json()
-            print(f"API Response JSON: {json_response}")  # Debugging full response
+        json_response = nominatim_search({"q": address, "countrycodes": "us", "format": "json"})
+        print(f"API Response JSON: {json_response}")  # Debugging full response
 
-            if json_response:
-                data = json_response[0]  # Use first result
-                latitude = float(data["lat"])
-                longitude = float(data["lon"])
+        if json_response:
+            data = json_response[0]  # Use first result
+            latitude = float(data["lat"])
+            longitude = float(data["lon"])
 
-                # Extract ZIP Code if available
-                address_parts = data.get("display_name", "").split(",")
-                zip_code = address_parts[-2].strip() if len(address_parts) > 1 else None
-                print(f"Extracted ZIP Code: {zip_code}")
+            # Extract ZIP Code if available
+            address_parts = data.get("display_name", "").split(",")
+            zip_code = address_parts[-2].strip() if len(address_parts) > 1 else None
+            print(f"Extracted ZIP Code: {zip_code}")
 
-                return latitude, longitude, zip_code
-            else:
-                print("No results found for the address.")
-                return None, None, None
+            return latitude, longitude, zip_code
         else:
-            print(f"Nominatim API Error: {response.status_code}")
+            print("No results found for the address.")
             return None, None, None
 
     except Exception as e:
@@ -350,27 +338,29 @@ def address_autocomplete():
         return jsonify([])
 
     try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": query, "countrycodes": "us", "format": "json", "limit": 5},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        if response.status_code == 200:
-            suggestions = [
-                {"display_name": item.get("display_name", "")}
-                for item in response.json()
-                if "New Jersey" in item.get("display_name", "")
-            ]
-            return jsonify(suggestions)
-        else:
-            print(f"Nominatim API returned status {response.status_code}")
-            return jsonify([])
+        # Local prefix index; Nominatim only when nothing matches
+        return jsonify([{"display_name": name} for name in get_address_autocomplete().suggest(query)])
     except Exception as e:
         print(f"Error fetching autocomplete data: {e}")
         return jsonify([])
 
 
+@app.route("/mitigation-knowledge", methods=["GET"])
+def mitigation_knowledge():
+    """Free-text search over the mitigation data sources: ?query=&k=&risk_type=&budget_ms="""
+    query = request.args.get('query', '').strip()
+    if not query:
+        return jsonify({"error": "Missing query"}), 400
+    try:
+        k = min(max(int(request.args.get('k', 5)), 1), 20)
+        budget_ms = request.args.get('budget_ms')
+        budget_ms = float(budget_ms) if budget_ms else None
+    except ValueError:
+        return jsonify({"error": "k and budget_ms must be numbers"}), 400
+    return jsonify(search_mitigation_knowledge(query, k=k, risk_type=request.args.get('risk_type'),
+                                               budget_ms=budget_ms))
+
+
 def standardize_threat_status(status):
     mapping = {
         "critically endangered": "high",
@@ -645,12 +635,113 @@ def forgot_password():
         return jsonify({"error": str(e)}), 500
 
 
+# Risk tables present in the database, detected once per process instead of per request
+SEARCH_TABLES = ["invasive_species", "iucn_data", "freshwater_risk", "marine_hci", "terrestrial_risk"]
+search_tables = None
+
+def get_search_tables(cursor):
+    global search_tables
+    if search_tables is None:
+        search_tables = set(detect_table_columns(cursor, SEARCH_TABLES))
+        print(f"✅ Search tables detected: {sorted(search_tables)}")
+    return search_tables
+
 # Sample threat data (Replace with database or dynamic query)
 threat_data = [
     {"risk_type": "Invasive Species", "threat_code": "high", "description": "Fast-spreading non-native plant species"},
     {"risk_type": "Water Pollution", "threat_code": "moderate", "description": "Increased industrial waste in nearby rivers"},
     {"risk_type": "Air Pollution", "threat_code": "low", "description": "Localized emissions affecting air quality"},
 ]
+def query_search_risks(cursor, lat, lon, offset):
+    """Risk records for the /search response, without mitigations (see attach_mitigations)"""
+    print("Querying all risk types...")
+
+    # All five layers in one UNION ALL round trip; tables missing from the schema are skipped
+    available_tables = get_search_tables(cursor)
+    layer_queries = [
+        ("invasive", "invasive_species", "latitude, longitude, common_name, threat_code",
+         "WHERE ABS(latitude - %s) <= 0.1 AND ABS(longitude - %s) <= 0.1", (lat, lon)),
+        ("iucn", "iucn_data", "latitude, longitude, species_name, threat_status",
+         "WHERE ABS(latitude - %s) <= 0.1 AND ABS(longitude - %s) <= 0.1 LIMIT 50 OFFSET %s", (lat, lon, offset)),
+        ("freshwater", "freshwater_risk", "x, y, normalized_risk, COALESCE(risk_level, 'Low')",
+         "WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1", (lat, lon)),
+        ("marine", "marine_hci", "x, y, marine_hci",
+         "WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1", (lat, lon)),
+        ("terrestrial", "terrestrial_risk", "x, y, normalized_risk, risk_level",
+         "WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1", (lat, lon)),
+    ]
+    layer_queries = [query for query in layer_queries if query[1] in available_tables]
+
+    rows_by_layer = {}
+    if layer_queries:
+        cursor.execute(*build_union_query(layer_queries))
+        rows_by_layer = group_rows_by_layer(cursor.fetchall())
+
+    risk_data = []
+
+    for row in rows_by_layer.get("invasive", []):
+        threat_code = row[3] or "low"
+        risk_data.append({
+            "latitude": row[0], "longitude": row[1],
+            "risk_type": "Invasive Species",
+            "description": row[2],
+            "threat_code": threat_code
+        })
+
+    for row in rows_by_layer.get("iucn", []):
+        threat_code = standardize_threat_status(row[3])
+        risk_data.append({
+            "latitude": row[0], "longitude": row[1],
+            "risk_type": "IUCN",
+            "description": row[2],
+            "threat_code": threat_code
+        })
+
+    for row in rows_by_layer.get("freshwater", []):
+        # Fix case sensitivity: "Low Risk" -> "low", "Moderate Risk" -> "moderate", "High Risk" -> "high"
+        threat_code = row[3].lower().replace(" risk", "").strip()
+        risk_data.append({
+            "latitude": row[1], "longitude": row[0],
+            "risk_type": "Freshwater Risk",
+            "description": f"Freshwater risk level: {row[2]}",
+            "threat_code": threat_code
+        })
+
+    for row in rows_by_layer.get("marine", []):
+        hci = row[2] or 0
+        level = "high" if hci >= 0.75 else "moderate" if hci >= 0.4 else "low"
+        risk_data.append({
+            "latitude": row[1], "longitude": row[0],
+            "risk_type": "Marine Risk",
+            "description": f"Marine HCI Score: {hci}",
+            "threat_code": level
+        })
+
+    for row in rows_by_layer.get("terrestrial", []):
+        score = float(row[2])
+        # Fix case sensitivity: "Low Risk" -> "low", "Moderate Risk" -> "moderate", "High Risk" -> "high"
+        level = row[3].lower().replace(" risk", "").strip() if row[3] else "low"
+
+        risk_data.append({
+            "latitude": row[1],  # y = latitude
+            "longitude": row[0],  # x = longitude
+            "risk_type": "Terrestrial Risk",
+            "description": f"Terrestrial Risk Level: {score:.2f}",
+            "threat_code": level
+        })
+    return risk_data
+
+def attach_mitigations(risk_data):
+    """Copies of the risk records with their mitigation actions, resolved for this request
+
+    Kept out of the search cache: while the ML components load, the actions are static
+    fallbacks, and a cached copy would keep serving them after the knowledge base is ready.
+    """
+    actions = query_mitigation_actions_batch(
+        [{"risk_type": risk["risk_type"], "threat_code": risk["threat_code"]} for risk in risk_data]
+    )
+    return [dict(risk, mitigation=action) for risk, action in zip(risk_data, actions)]
+
 @app.route("/search", methods=["POST"])
 def search():
     try:
@@ -660,26 +751,16 @@ def search():
         if input_text.replace(",", "").replace(".", "").replace(" ", "").isdigit():
             if "," in input_text:
                 lat, lon = map(float, input_text.split(","))
-                zip_code = "Unknown"
+                zip_code = nearest_zip(lat, lon) or "Unknown"
             elif len(input_text) == 5:
-                response = requests.get(
-                    GEOCODING_API_URL,
-                    params={"postalcode": input_text, "countrycodes": "us", "format": "json"},
-                    headers={"User-Agent": "BiodivProScopeApp/1.0"}
-                )
-                if response.status_code == 200 and response.json():
-                    loc = response.json()[0]
-                    lat = float(loc["lat"])
-                    lon = float(loc["lon"])
+                point = resolve_zip(input_text, geocode=geocode_zip)
+                if point:
+                    lat, lon = point
                     zip_code = input_text
         else:
-            response = requests.get(
-                GEOCODING_API_URL,
-                params={"q": input_text, "countrycodes": "us", "format": "json"},
-                headers={"User-Agent": "BiodivProScopeApp/1.0"}
-            )
-            if response.status_code == 200 and response.json():
-                loc = response.json()[0]
+            results = nominatim_search({"q": input_text, "countrycodes": "us", "format": "json"})
+            if results:
+                loc = results[0]
                 lat = float(loc["lat"])
                 lon = float(loc["lon"])
                 zip_code = loc.get("display_name", "").split(",")[-2].strip()
@@ -691,103 +772,38 @@ def search():
         if not (NJ_BOUNDS["south"] <= lat <= NJ_BOUNDS["north"] and NJ_BOUNDS["west"] <= lon <= NJ_BOUNDS["east"]):
             return jsonify({"error": "The location is outside of New Jersey."}), 400
 
-        conn = connect_db()
-        if not conn:
-            return jsonify({"error": "Database connection failed."}), 500
-
-        cursor = conn.cursor()
         offset = int(request.json.get("offset", 0))
-        print("Querying all risk types...")
-
-        risk_data = []
 
-        cursor.execute("""
-            SELECT latitude, longitude, common_name, threat_code 
-            FROM invasive_species 
-            WHERE ABS(latitude - %s) <= 0.1 AND ABS(longitude - %s) <= 0.1
-        """, (lat, lon))
-        for row in cursor.fetchall():
-            threat_code = row[3] or "low"
-            risk_data.append({
-                "latitude": row[0], "longitude": row[1],
-                "risk_type": "Invasive Species",
-                "description": row[2],
-                "threat_code": threat_code,
-                "mitigation": query_mitigation_action("Invasive Species", threat_code)
-            })
-
-        cursor.execute("""
-            SELECT latitude, longitude, species_name, threat_status 
-            FROM iucn_data 
-            WHERE ABS(latitude - %s) <= 0.1 AND ABS(longitude - %s) <= 0.1 
-            LIMIT 50 OFFSET %s
-        """, (lat, lon, offset))
-        for row in cursor.fetchall():
-            threat_code = standardize_threat_status(row[3])
-            risk_data.append({
-                "latitude": row[0], "longitude": row[1],
-                "risk_type": "IUCN",
-                "description": row[2],
-                "threat_code": threat_code,
-                "mitigation": query_mitigation_action("IUCN", threat_code)
-            })
-
-        cursor.execute("""
-            SELECT x, y, normalized_risk, COALESCE(risk_level, 'Low') 
-            FROM freshwater_risk 
-            WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1
-        """, (lat, lon))
-        for row in cursor.fetchall():
-            # Fix case sensitivity: "Low Risk" -> "low", "Moderate Risk" -> "moderate", "High Risk" -> "high"
-            threat_code = row[3].lower().replace(" risk", "").strip()
-            risk_data.append({
-                "latitude": row[1], "longitude": row[0],
-                "risk_type": "Freshwater Risk",
-                "description": f"Freshwater risk level: {row[2]}",
-                "threat_code": threat_code,
-                "mitigation": query_mitigation_action("Freshwater Risk", threat_code)
-            })
-
-        cursor.execute("""
-            SELECT x, y, marine_hci 
-            FROM marine_hci 
-            WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1
-        """, (lat, lon))
-        for row in cursor.fetchall():
-            hci = row[2] or 0
-            level = "high" if hci >= 0.75 else "moderate" if hci >= 0.4 else "low"
-            risk_data.append({
-                "latitude": row[1], "longitude": row[0],
-                "risk_type": "Marine Risk",
-                "description": f"Marine HCI Score: {hci}",
-                "threat_code": level,
-                "mitigation": query_mitigation_action("Marine Risk", level)
-            })
+        # Nearby searches share a cache entry: query at the snapped point the entry is keyed on
+        cache_key = risk_data = None
+        version = get_dataset_version(connect_db) if search_cache is not None else UNVERSIONED
+        # Without the version triggers a reload would go unnoticed, so nothing is cached
+        if version != UNVERSIONED:
+            cache_key = search_cache.key(lat, lon, ("offset", offset), SEARCH_TABLES, version)
+            risk_data = search_cache.get(cache_key)
 
-        cursor.execute("""
-            SELECT x, y, normalized_risk, risk_level 
-            FROM terrestrial_risk 
-            WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1
-        """, (lat, lon))
-
-        for row in cursor.fetchall():
-            score = float(row[2])
-            # Fix case sensitivity: "Low Risk" -> "low", "Moderate Risk" -> "moderate", "High Risk" -> "high"
-            level = row[3].lower().replace(" risk", "").strip() if row[3] else "low"
-
-            risk_data.append({
-                "latitude": row[1],  # y = latitude
-                "longitude": row[0],  # x = longitude
-                "risk_type": "Terrestrial Risk",
-                "description": f"Terrestrial Risk Level: {score:.2f}",
-                "threat_code": level,
-                "mitigation": query_mitigation_action("Terrestrial Risk", level)
-            })
+        if risk_data is None:
+            conn = connect_db()
+            if not conn:
+                return jsonify({"error": "Database connection failed."}), 500
+            cursor = conn.cursor()
+            query_lat, query_lon = cache_key[:2] if cache_key else (lat, lon)
+            try:
+                risk_data = query_search_risks(cursor, query_lat, query_lon, offset)
+            finally:
+                conn.close()
+            if cache_key and risk_data:
+                search_cache.set(cache_key, risk_data)
+        else:
+            print(f"⚡ Search cache hit for {cache_key[:2]}")
 
-        conn.close()
+        risk_data = attach_mitigations(risk_data)
         session["risks"] = risk_data
 
         return jsonify({"center": {"latitude": lat, "longitude": lon, "zipcode": zip_code}, "risks": risk_data})
+    except GeocodingError as e:
+        print(f"⚠️ Geocoding failed: {e}")
+        return jsonify({"error": "Could not determine location."}), 400
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -999,6 +1015,9 @@ if __name__ == "__main__":
             conn = connect_db()
             if conn:
                 print("✅ Database connection verified on startup")
+                cursor = conn.cursor()
+                get_search_tables(cursor)  # Detect schema capabilities once, before the first search
+                cursor.close()
                 conn.close()
             else:
                 print("⚠️ Database connection failed - running in fallback mode")
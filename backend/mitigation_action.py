@@ -1,51 +1,142 @@
-import pandas as pd
+"""
+Mitigation actions for risks, from the ChromaDB knowledge base when it is loaded.
+
+ChromaDB and the SentenceTransformer model are loaded in a background thread
+(at import when MITIGATION_ML_PRELOAD is true, otherwise on the first lookup),
+so importing this module costs no more than pandas. Until loading finishes
+every lookup gets the static fallback action; ml_status() reports progress.
+
+MITIGATION_VECTOR_BACKEND=numpy swaps ChromaDB for services.vector_store, an
+in-process .npy + JSON store built by the ingest script with --backend numpy,
+and EMBEDDING_BACKEND=onnx swaps SentenceTransformer for the torch-free
+int8 ONNX model in services.embeddings.
+
+search_mitigation_knowledge() answers free-text questions from every file in
+"ML Strategy/data sources" (built by ingest_knowledge_sources.py) with the
+hybrid BM25 + vector retriever in services.hybrid_retrieval. Its BM25 index
+is plain JSON and serves lexical results before the ML components are up.
+"""
+import importlib.util
 import os
+import threading
+import time
 
-# Try to import optional ML dependencies
-try:
-    from chromadb import PersistentClient
-    CHROMADB_AVAILABLE = True
-except ImportError:
+import pandas as pd
+
+from services.embeddings import EMBEDDING_BACKEND, embedding_backend_available, load_embedder
+from services.hybrid_retrieval import BM25Index, HybridRetriever
+from services.mitigation_keys import canonical_risk_type, mitigation_key
+
+MITIGATION_ML_PRELOAD = os.getenv('MITIGATION_ML_PRELOAD', 'true').lower() == 'true'
+# "chroma" (PersistentClient) or "numpy" (services.vector_store)
+MITIGATION_VECTOR_BACKEND = os.getenv('MITIGATION_VECTOR_BACKEND', 'chroma').lower()
+MITIGATION_COLLECTION = "mitigation_knowledge"
+# Chunked data sources: a vector collection plus the BM25 index written next to it by the ingest script
+KNOWLEDGE_COLLECTION = "mitigation_sources"
+KNOWLEDGE_INDEX_FILE = f"{KNOWLEDGE_COLLECTION}.bm25.json"
+# How often get_knowledge_retriever() looks for a new or rebuilt index file
+KNOWLEDGE_INDEX_CHECK_SECONDS = float(os.getenv('KNOWLEDGE_INDEX_CHECK_SECONDS', 60))
+
+# Checked without importing: chromadb and torch take seconds to import
+CHROMADB_AVAILABLE = importlib.util.find_spec("chromadb") is not None
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+EMBEDDER_AVAILABLE = embedding_backend_available()
+if not CHROMADB_AVAILABLE:
     print("📝 ChromaDB not available")
-    CHROMADB_AVAILABLE = False
-    
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    print("📝 sentence-transformers not available")
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
-
-# Initialize ML components only if available
+if not EMBEDDER_AVAILABLE:
+    print(f"📝 {EMBEDDING_BACKEND} embedding backend not available")
+VECTOR_BACKEND_AVAILABLE = NUMPY_AVAILABLE if MITIGATION_VECTOR_BACKEND == "numpy" else CHROMADB_AVAILABLE
+
+# Set by the loader thread once the ML components are up
 chroma_client = None
 chroma_collection = None
 embedder = None
+knowledge_collection = None
 
-if CHROMADB_AVAILABLE and SENTENCE_TRANSFORMERS_AVAILABLE:
-    # Connect to existing ChromaDB - handle both local and deployment paths
-    chroma_path = os.path.join(os.path.dirname(__file__), "ML Strategy", "chroma_storage_rag")
-    if not os.path.exists(chroma_path):
+# "idle" -> "loading" -> "ready" | "failed"; "unavailable" without the ML dependencies
+_ml_status = {
+    "state": "idle" if VECTOR_BACKEND_AVAILABLE and EMBEDDER_AVAILABLE else "unavailable",
+    "backend": MITIGATION_VECTOR_BACKEND,
+    "embedding_backend": EMBEDDING_BACKEND,
+    "error": None,
+    "load_seconds": None,
+}
+_ml_lock = threading.Lock()
+
+
+def _store_path(directory_name):
+    # Connect to the existing store - handle both local and deployment paths
+    store_path = os.path.join(os.path.dirname(__file__), "ML Strategy", directory_name)
+    if not os.path.exists(store_path):
         # Fallback path for deployment
-        chroma_path = os.path.join(os.path.dirname(__file__), "chroma_storage_rag")
-        
+        store_path = os.path.join(os.path.dirname(__file__), directory_name)
+    return store_path
+
+
+def _open_collection():
+    if MITIGATION_VECTOR_BACKEND == "numpy":
+        from services.vector_store import NumpyVectorStore
+        return None, NumpyVectorStore.load(_store_path("vector_store"), MITIGATION_COLLECTION)
+
+    from chromadb import PersistentClient
+    client = PersistentClient(path=_store_path("chroma_storage_rag"))
+    return client, client.get_or_create_collection(name=MITIGATION_COLLECTION)
+
+
+def _open_knowledge_collection(client):
+    """The chunked data sources collection, or None if it has not been ingested."""
     try:
-        chroma_client = PersistentClient(path=chroma_path)
-        chroma_collection = chroma_client.get_or_create_collection(name="mitigation_knowledge")
-        embedder = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
-        
-        # Optional peek
-        print("🔎 Sample entries from ChromaDB:")
-        print(chroma_collection.peek(3))
-        print("📦 Total embeddings:", chroma_collection.count())
-        print("🎆 ML components initialized successfully")
+        if MITIGATION_VECTOR_BACKEND == "numpy":
+            from services.vector_store import NumpyVectorStore
+            return NumpyVectorStore.load(_store_path("vector_store"), KNOWLEDGE_COLLECTION)
+        return client.get_collection(name=KNOWLEDGE_COLLECTION)
     except Exception as e:
-        print(f"⚠️ ChromaDB initialization failed: {e}")
+        print(f"📝 Knowledge sources collection not available ({e}); knowledge search stays lexical")
+        return None
+
+
+def _load_ml_components():
+    global chroma_client, chroma_collection, embedder, knowledge_collection
+    started = time.monotonic()
+    try:
+        client, collection = _open_collection()
+        model = load_embedder()
+        print(f"📦 Total embeddings ({MITIGATION_VECTOR_BACKEND}):", collection.count())
+
+        # The collection is published last: lookups check it before touching the embedder
+        chroma_client, embedder, chroma_collection = client, model, collection
+        knowledge_collection = _open_knowledge_collection(client)
+        precompute_mitigation_actions()
+    except Exception as e:
+        print(f"⚠️ Vector store initialization failed: {e}")
         print("📝 Running in fallback mode without ML components")
-        chroma_client = None
-        chroma_collection = None
-        embedder = None
-else:
-    print("📝 ML dependencies not available, running in basic mode")
+        chroma_client = chroma_collection = embedder = knowledge_collection = None
+        with _ml_lock:
+            _ml_status.update(state="failed", error=str(e))
+        return
+
+    with _ml_lock:
+        _ml_status.update(state="ready", load_seconds=round(time.monotonic() - started, 2))
+    print(f"🎆 ML components initialized in {_ml_status['load_seconds']}s")
+
+
+def start_ml_loading():
+    """Start loading ChromaDB and the embedder in the background (once)."""
+    with _ml_lock:
+        if _ml_status["state"] != "idle":
+            return
+        _ml_status["state"] = "loading"
+    threading.Thread(target=_load_ml_components, name="mitigation-ml-loader", daemon=True).start()
+
+
+def ml_ready():
+    return _ml_status["state"] == "ready"
+
+
+def ml_status():
+    with _ml_lock:
+        return dict(_ml_status)
+
 
 def threat_level_from_code(threat_code):
     mapping = {
@@ -55,77 +146,247 @@ def threat_level_from_code(threat_code):
         "low": 2
     }
     return mapping.get(threat_code.lower(), 1)
-def query_mitigation_action(risk_type, threat_level, description=None):
-    risk_type = risk_type.strip().lower()
-    threat_level = threat_level.strip().lower()
+# Every (risk_type, threat_level) pair /search can produce; resolved once at startup
+KNOWN_RISK_TYPES = ("Invasive Species", "IUCN", "Freshwater Risk", "Marine Risk", "Terrestrial Risk")
+KNOWN_THREAT_LEVELS = ("high", "moderate", "low", "unknown")
 
-    # Skip ChromaDB queries if not available
-    if chroma_collection is None:
-        print("📝 ChromaDB not available, using fallback response")
-        fallback_desc = description or f"{risk_type} ({threat_level})"
-        return {
-            "score": 1,
-            "action": (
-                f"{fallback_desc.title()} —\n"
-                "1. Monitor the area periodically for potential risks.\n"
-                "2. Record observations and reassess priority if spread increases."
-            )
-        }
+# Canonical (risk_type, threat_level) -> {"score", "action"}, or None when only the static fallback applies
+_resolved_actions = {}
+_resolved_lock = threading.Lock()
+
+# Which path answered each ChromaDB lookup, plus memoized calls that skipped ChromaDB entirely
+_lookup_stats = {"memoized": 0, "exact_hits": 0, "exact_misses": 0, "embedding_hits": 0,
+                 "embedding_misses": 0, "errors": 0}
+
+
+def _count(name):
+    with _resolved_lock:
+        _lookup_stats[name] += 1
+
+
+def mitigation_lookup_stats():
+    with _resolved_lock:
+        stats = dict(_lookup_stats)
+        stats["resolved_pairs"] = len(_resolved_actions)
+    stats["chromadb"] = chroma_collection is not None
+    stats["ml"] = ml_status()
+    if hasattr(embedder, "cache"):
+        stats["embedding_cache"] = embedder.cache.stats()
+    if _knowledge_retriever is not None:
+        stats["knowledge_search"] = _knowledge_retriever.stats()
+    return stats
+
+
+def fallback_mitigation_action(risk_type, threat_level, description=None):
+    fallback_desc = description or f"{risk_type} ({threat_level})"
+    return {
+        "score": 1,
+        "action": (
+            f"{fallback_desc.title()} —\n"
+            "1. Monitor the area periodically for potential risks.\n"
+            "2. Record observations and reassess priority if spread increases."
+        )
+    }
+
+
+def lookup_mitigation_actions(keys):
+    """
+    Ask ChromaDB for canonical (risk_type, threat_level) pairs in two round trips at most:
+    one metadata get for exact matches, then one batched encode and multi-embedding query for the rest.
+
+    Returns:
+        ({key: result}, complete) - keys without any match are missing; complete is False if a
+        query failed, so the answers must not be memoized.
+    """
+    keys = list(dict.fromkeys(keys))
+    found = {}
+    complete = True
 
     # 1️⃣ Try metadata query
     try:
+        risk_types = sorted({risk_type for risk_type, _ in keys})
+        # Collections ingested before the canonical keys stored title-cased levels
+        threat_levels = sorted({variant for _, level in keys for variant in (level, level.title())})
         results = chroma_collection.get(
             where={
                 "$and": [
-                    {"risk_type": {"$eq": risk_type}},
-                    {"threat_level": {"$eq": threat_level}}
+                    {"risk_type": {"$in": risk_types}},
+                    {"threat_level": {"$in": threat_levels}}
                 ]
             },
             include=["documents", "metadatas"],
-
         )
-        print("🧪 Metadata Query:", results)
-
-        if results["documents"]:
-            return {
-                "score": "-",
-                "action": results["documents"][0]
-            }
+        wanted = set(keys)
+        for document, metadata in zip(results["documents"], results["metadatas"]):
+            key = mitigation_key(metadata.get("risk_type"), metadata.get("threat_level"))
+            if key in wanted and key not in found:
+                found[key] = {"score": "-", "action": document}
+        for key in keys:
+            _count("exact_hits" if key in found else "exact_misses")
     except Exception as e:
         print(f"⚠️ Metadata query failed: {e}")
+        _count("errors")
+        complete = False
 
-    # 2️⃣ Fallback: Embedding similarity search
-    try:
-        query_text = f"{risk_type} | {threat_level}"
-        embedding = embedder.encode(query_text).tolist()
+    # 2️⃣ Fallback: Embedding similarity search for every key the metadata did not answer
+    misses = [key for key in keys if key not in found]
+    if misses:
+        try:
+            query_texts = [f"{risk_type} | {threat_level}" for risk_type, threat_level in misses]
+            embeddings = embedder.encode(query_texts).tolist()
 
-        results = chroma_collection.query(
-            query_embeddings=[embedding],
-            n_results=3,
-            include=["documents", "distances"]
-        )
-        print("🧪 Embedding fallback query:", query_text)
-        print("🧪 Fallback Results:", results)
+            results = chroma_collection.query(
+                query_embeddings=embeddings,
+                n_results=1,
+                include=["documents", "distances"]
+            )
+            print(f"🧪 Embedding fallback for {len(misses)} keys: {', '.join(query_texts)}")
 
-        if results["documents"] and results["documents"][0]:
-            return {
-                "score": results["distances"][0][0],
-                "action": results["documents"][0][0]
-            }
+            for key, documents, distances in zip(misses, results["documents"], results["distances"]):
+                if documents:
+                    found[key] = {"score": distances[0], "action": documents[0]}
+                    _count("embedding_hits")
+                else:
+                    _count("embedding_misses")
+
+        except Exception as e:
+            print(f"⚠️ Embedding fallback failed: {e}")
+            _count("errors")
+            complete = False
+
+    return found, complete
+
+
+def resolve_mitigation_actions(keys):
+    """{key: result or None} for canonical keys, from the memo where possible and one batched lookup otherwise."""
+    resolved, missing = {}, []
+    with _resolved_lock:
+        for key in dict.fromkeys(keys):
+            if key in _resolved_actions:
+                resolved[key] = _resolved_actions[key]
+                _lookup_stats["memoized"] += 1
+            else:
+                missing.append(key)
+    if missing:
+        found, complete = lookup_mitigation_actions(missing)
+        for key in missing:
+            resolved[key] = found.get(key)
+        if complete:
+            with _resolved_lock:
+                for key in missing:
+                    _resolved_actions[key] = found.get(key)
+    return resolved
 
-    except Exception as e:
-        print(f"⚠️ Embedding fallback failed: {e}")
+
+def query_mitigation_action(risk_type, threat_level, description=None):
+    risk_type = risk_type.strip().lower()
+    threat_level = threat_level.strip().lower()
+
+    # Skip ChromaDB queries until the background loader has finished (or if it never will)
+    if chroma_collection is None:
+        start_ml_loading()
+        return fallback_mitigation_action(risk_type, threat_level, description)
+
+    key = mitigation_key(risk_type, threat_level)
+    result = resolve_mitigation_actions([key])[key]
 
     # 3️⃣ Fallback static response
-    fallback_desc = description or f"{risk_type} ({threat_level})"
-    return {
-        "score": 1,
-        "action": (
-            f"{fallback_desc.title()} —\n"
-            "1. Monitor the area periodically for potential risks.\n"
-            "2. Record observations and reassess priority if spread increases."
-        )
-    }
+    if result is None:
+        return fallback_mitigation_action(risk_type, threat_level, description)
+    return dict(result)
+
+
+def query_mitigation_actions_batch(risks):
+    """
+    Mitigation actions for many risk dicts (risk_type, threat_code, description) at once.
+
+    Distinct keys are resolved together, so the cost grows with the number of
+    distinct (risk_type, threat_level) pairs rather than with the number of risks.
+
+    Returns:
+        One {"score", "action"} dict per risk, in order.
+    """
+    requests = []
+    for risk in risks:
+        risk_type = str(risk.get("risk_type", "Unknown")).strip().lower()
+        threat_level = str(risk.get("threat_code", "low")).strip().lower()
+        requests.append((risk_type, threat_level, risk.get("description")))
+
+    if chroma_collection is None:
+        start_ml_loading()
+        resolved = {}
+    else:
+        resolved = resolve_mitigation_actions(mitigation_key(r, t) for r, t, _ in requests)
+
+    actions = []
+    for risk_type, threat_level, description in requests:
+        result = resolved.get(mitigation_key(risk_type, threat_level))
+        actions.append(dict(result) if result is not None
+                       else fallback_mitigation_action(risk_type, threat_level, description))
+    return actions
+
+
+def precompute_mitigation_actions(risk_types=KNOWN_RISK_TYPES, threat_levels=KNOWN_THREAT_LEVELS):
+    """Resolve every known pair up front so searches never wait on ChromaDB or the embedder."""
+    if chroma_collection is None:
+        return 0
+    resolve_mitigation_actions([mitigation_key(risk_type, threat_level)
+                                for risk_type in risk_types for threat_level in threat_levels])
+    with _resolved_lock:
+        resolved = len(_resolved_actions)
+    print(f"🗂️ Precomputed mitigation actions for {resolved} risk type/threat level pairs")
+    return resolved
+
+_knowledge_retriever = None
+_knowledge_lock = threading.Lock()
+_knowledge_index_mtime = None  # mtime of the index file the retriever was loaded from
+_knowledge_index_checked = 0.0  # monotonic time of the last stat of the index file
+
+
+def get_knowledge_retriever():
+    """
+    The hybrid retriever over the data sources, or None if its BM25 index has not been built.
+
+    The index file is re-checked every KNOWLEDGE_INDEX_CHECK_SECONDS, so an index
+    built (or rebuilt) after startup is picked up without a restart.
+    """
+    global _knowledge_retriever, _knowledge_index_mtime, _knowledge_index_checked
+    if time.monotonic() - _knowledge_index_checked >= KNOWLEDGE_INDEX_CHECK_SECONDS:
+        with _knowledge_lock:
+            if time.monotonic() - _knowledge_index_checked >= KNOWLEDGE_INDEX_CHECK_SECONDS:
+                _knowledge_index_checked = time.monotonic()
+                index_path = os.path.join(_store_path("knowledge_index"), KNOWLEDGE_INDEX_FILE)
+                try:
+                    mtime = os.path.getmtime(index_path)
+                    if mtime != _knowledge_index_mtime:
+                        retriever = HybridRetriever(BM25Index.load(index_path))
+                        _knowledge_retriever, _knowledge_index_mtime = retriever, mtime
+                        print(f"📚 Loaded BM25 index over {len(retriever.bm25.ids)} knowledge chunks")
+                except (OSError, ValueError, KeyError) as e:
+                    # Keep serving the last good index, if any; the file is looked at again next interval
+                    print(f"⚠️ Knowledge index not available: {e}")
+    retriever = _knowledge_retriever
+    # Vectors join in once the background loader has them; until then answers are BM25 only
+    if retriever is not None and retriever.collection is None and knowledge_collection is not None:
+        retriever.embedder, retriever.collection = embedder, knowledge_collection
+    return retriever
+
+
+def search_mitigation_knowledge(query, k=5, risk_type=None, budget_ms=None):
+    """
+    Top-k data source chunks for a free-text query, optionally limited to one risk type.
+
+    Returns:
+        {"results": [...], "mode": "lexical" | "hybrid" | "unavailable", "elapsed_ms": float}
+    """
+    retriever = get_knowledge_retriever()
+    if retriever is None:
+        return {"results": [], "mode": "unavailable", "elapsed_ms": 0.0}
+    if knowledge_collection is None:
+        start_ml_loading()
+    where = {"risk_type": canonical_risk_type(risk_type)} if risk_type else None
+    return retriever.search(query, k=k, where=where, budget_ms=budget_ms)
+
 
 def normalize_threat_code(threat_code):
     return threat_code.lower().replace("risk", "").strip() + " risk"
@@ -137,7 +398,9 @@ def generate_mitigation_report(risks):
         return pd.DataFrame([])
 
     report_data = []
-    for risk in risks:
+    # One batched lookup for all distinct risk type/threat level pairs in the report
+    mitigations = query_mitigation_actions_batch(risks)
+    for risk, mitigation in zip(risks, mitigations):
         risk_type = risk.get("risk_type", "Unknown")
         threat_code_raw = risk.get("threat_code", "low")
         threat_code = threat_code_raw.strip().lower()
@@ -145,8 +408,6 @@ def generate_mitigation_report(risks):
 
         description = risk.get("description", "")
 
-        mitigation = query_mitigation_action(risk_type, threat_code, description)
-
         report_data.append({
             "Risk Type": risk_type,
             "Threat Level": threat_code.title(),
@@ -156,3 +417,7 @@ def generate_mitigation_report(risks):
         })
 
     return pd.DataFrame(report_data)
+
+
+if MITIGATION_ML_PRELOAD:
+    start_ml_loading()
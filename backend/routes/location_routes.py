@@ -6,33 +6,8 @@ import os
 # Add parent directory to path to import from main app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Import the database connection function from the main app
-def connect_db():
-    """Use the same database connection logic as main app"""
-    import psycopg2
-    import os
-    
-    # Get database connection string directly (same as main app)
-    database_url = os.getenv('DATABASE_URL')
-    if database_url:
-        # Ensure SSL for Supabase
-        if 'supabase.com' in database_url and '?sslmode=' not in database_url:
-            database_url += '?sslmode=require'
-        connection_string = database_url
-    else:
-        # Fallback - build connection string from individual variables
-        host = os.getenv('DB_HOST', 'localhost')
-        user = os.getenv('DB_USER', 'postgres')
-        password = os.getenv('DB_PASSWORD', 'password')
-        dbname = os.getenv('DB_NAME', 'postgres')
-        port = os.getenv('DB_PORT', 5432)
-        connection_string = f"postgresql://{user}:{password}@{host}:{port}/{dbname}"
-    
-    try:
-        return psycopg2.connect(connection_string)
-    except Exception as err:
-        print(f"❌ Location route DB connection error: {err}")
-        return None
+# Use the same pooled database connection as the main app
+from services.db import connect_db
 
 try:
     # Try to import geocoding function from utils
@@ -251,13 +226,30 @@ def edit_location():
         city = data.get("city")
         zip_code = data.get("zip_code")
 
-        full_address = f"{street_address}, {city}, NJ {zip_code}"
-        lat, lon, _ = get_lat_lon_from_address(full_address)
-        if not lat or not lon:
-            return jsonify({"error": "Could not geocode address"}), 400
-
         conn = connect_db()
         cursor = conn.cursor()
+
+        # Only re-geocode when the address itself changed
+        cursor.execute("""
+            SELECT street_address, city, zip_code, latitude, longitude
+            FROM hotel_locations WHERE id = %s AND user_id = %s
+        """, (location_id, request.user_id))
+        existing = cursor.fetchone()
+        if existing is None:
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Location Not Found"}), 404
+
+        if tuple(existing[:3]) == (street_address, city, zip_code) and existing[3] and existing[4]:
+            lat, lon = existing[3], existing[4]
+        else:
+            full_address = f"{street_address}, {city}, NJ {zip_code}"
+            lat, lon, _ = get_lat_lon_from_address(full_address)
+            if not lat or not lon:
+                cursor.close()
+                conn.close()
+                return jsonify({"error": "Could not geocode address"}), 400
+
         cursor.execute("""
             UPDATE hotel_locations
             SET hotel_name = %s, street_address = %s, city = %s, zip_code = %s,
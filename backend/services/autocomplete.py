@@ -0,0 +1,168 @@
+"""
+In-memory prefix index for /address-autocomplete.
+
+Suggestions are kept as a sorted list of (normalized key, display name)
+pairs, so a keystroke is two bisections and a short scan instead of a
+Nominatim request. The index is seeded from the bundled NJ ZIP table, every
+New Jersey address already in the geocode cache and an optional gazetteer
+file (AUTOCOMPLETE_GAZETTEER_PATH, one name per line), and it grows with
+each address geocoded afterwards. Nominatim is only asked when nothing in
+the index matches.
+"""
+import bisect
+import os
+import re
+import threading
+
+from services.geocoding import add_result_listener, get_geocode_cache, nominatim_search
+from services.zip_centroids import load_zip_centroids, NJ_ZIP_CENTROIDS_PATH
+
+AUTOCOMPLETE_GAZETTEER_PATH = os.getenv('AUTOCOMPLETE_GAZETTEER_PATH', '')
+AUTOCOMPLETE_LIMIT = 5
+# Shorter prefixes are answered from the index only, never from the network
+AUTOCOMPLETE_MIN_NETWORK_CHARS = int(os.getenv('AUTOCOMPLETE_MIN_NETWORK_CHARS', 3))
+# Candidates looked at per query before ranking; bounds the work for one-letter prefixes
+_SCAN_LIMIT = 200
+
+_NJ_MARKER = "New Jersey"
+
+
+def normalize_text(text):
+    """Lower-case, punctuation-free, single-spaced form used for keys and queries."""
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return " ".join(text.split())
+
+
+def _keys(display_name):
+    key = normalize_text(display_name)
+    keys = {key}
+    # People type "nj" far more often than the "New Jersey" Nominatim returns
+    if "new jersey" in key:
+        keys.add(key.replace("new jersey", "nj"))
+    return keys
+
+
+class PrefixIndex:
+    """Sorted (key, display name) pairs searched by prefix with bisect."""
+
+    def __init__(self):
+        self._entries = []
+        self._names = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, display_name, extra_keys=()):
+        display_name = (display_name or "").strip()
+        if not display_name:
+            return
+        with self._lock:
+            if display_name in self._names:
+                return
+            self._names.add(display_name)
+            for key in _keys(display_name) | {normalize_text(k) for k in extra_keys}:
+                bisect.insort(self._entries, (key, display_name))
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """Up to limit display names with a key starting with the query, shortest first."""
+        prefix = normalize_text(query)
+        if not prefix:
+            return []
+        with self._lock:
+            start = bisect.bisect_left(self._entries, (prefix,))
+            candidates = []
+            for key, display_name in self._entries[start:start + _SCAN_LIMIT]:
+                if not key.startswith(prefix):
+                    break
+                candidates.append(display_name)
+        matches = []
+        for display_name in sorted(set(candidates), key=lambda name: (len(name), name)):
+            matches.append(display_name)
+            if len(matches) == limit:
+                break
+        return matches
+
+
+class AddressAutocomplete:
+    """The prefix index plus the network fallback and hit/miss counters."""
+
+    def __init__(self, gazetteer_path=AUTOCOMPLETE_GAZETTEER_PATH):
+        self.index = PrefixIndex()
+        self.gazetteer_path = gazetteer_path
+        self._stats = {"local_hits": 0, "network_lookups": 0, "misses": 0}
+        self._stats_lock = threading.Lock()
+        self._load()
+        add_result_listener(self.add_results)
+
+    def _load(self):
+        try:
+            _, centroids = load_zip_centroids(NJ_ZIP_CENTROIDS_PATH)
+        except (OSError, KeyError, ValueError):
+            centroids = {}
+        for zipcode, (_, _, place) in centroids.items():
+            self.index.add(f"{place}, NJ {zipcode}" if place else f"NJ {zipcode}", extra_keys=(zipcode,))
+
+        if self.gazetteer_path:
+            try:
+                with open(self.gazetteer_path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip() and not line.startswith("#"):
+                            self.index.add(line)
+            except OSError as e:
+                print(f"⚠️ Could not read autocomplete gazetteer {self.gazetteer_path}: {e}")
+
+        self.add_results(get_geocode_cache().cached_results())
+        print(f"🔤 Autocomplete index ready with {len(self.index)} suggestions")
+
+    def add_results(self, results):
+        """Index the New Jersey entries of a Nominatim result list."""
+        for item in results:
+            display_name = item.get("display_name") or ""
+            if _NJ_MARKER in display_name:
+                self.index.add(display_name)
+
+    def suggest(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Display names for the query, from the index when possible.
+
+        Raises:
+            GeocodingError if the index has no match and Nominatim fails.
+        """
+        matches = self.index.search(query, limit)
+        if matches:
+            self._count("local_hits")
+            return matches
+        if len(normalize_text(query)) < AUTOCOMPLETE_MIN_NETWORK_CHARS:
+            self._count("misses")
+            return []
+
+        self._count("network_lookups")
+        results = nominatim_search({"q": query, "countrycodes": "us", "format": "json", "limit": limit})
+        # nominatim_search() has already indexed fresh results; cached ones are indexed here
+        self.add_results(results)
+        return [item["display_name"] for item in results if _NJ_MARKER in (item.get("display_name") or "")]
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["suggestions"] = len(self.index)
+        return stats
+
+
+_autocomplete = None
+_autocomplete_lock = threading.Lock()
+
+
+def get_address_autocomplete():
+    """The process-wide index, built on first use."""
+    global _autocomplete
+    if _autocomplete is None:
+        with _autocomplete_lock:
+            if _autocomplete is None:
+                _autocomplete = AddressAutocomplete()
+    return _autocomplete
@@ -0,0 +1,92 @@
+"""
+Dataset version stamp for caches derived from the risk tables.
+
+A statement-level trigger on every risk table records the id of the last
+transaction that modified it in the one-row ``dataset_version`` table, so
+each loader script bumps the version on commit without any code of its own.
+Readers cache the stamp for a few seconds, so a cache hit costs no query.
+"""
+import os
+import threading
+import time
+
+DATASET_VERSION_CHECK_SECONDS = float(os.getenv('DATASET_VERSION_CHECK_SECONDS', 30))
+
+# Used until dataset_version_setup_statements() has been run against the database
+UNVERSIONED = "0"
+
+_cached_version = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def dataset_version_setup_statements(tables):
+    """DDL for the version table, its trigger function and one trigger per table."""
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS dataset_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "INSERT INTO dataset_version (id, version) VALUES (TRUE, txid_current()) ON CONFLICT (id) DO NOTHING",
+        # Only the first modifying statement of a transaction writes the row
+        """
+        CREATE OR REPLACE FUNCTION bump_dataset_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE dataset_version SET version = txid_current(), updated_at = CURRENT_TIMESTAMP
+            WHERE version <> txid_current();
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+    ]
+    for table in tables:
+        statements.append(f"DROP TRIGGER IF EXISTS trg_{table}_dataset_version ON {table}")
+        statements.append(f"""
+            CREATE TRIGGER trg_{table}_dataset_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version()
+        """)
+    return statements
+
+
+def read_dataset_version(cursor):
+    """The current stamp as a string, or UNVERSIONED if the table has not been set up."""
+    cursor.execute("SELECT to_regclass('dataset_version') IS NOT NULL")
+    if not cursor.fetchone()[0]:
+        return UNVERSIONED
+    cursor.execute("SELECT version FROM dataset_version")
+    row = cursor.fetchone()
+    return str(row[0]) if row else UNVERSIONED
+
+
+def get_dataset_version(connect):
+    """
+    Current dataset version, re-read at most every DATASET_VERSION_CHECK_SECONDS.
+
+    Parameters:
+        connect: zero-argument callable returning a DB connection (closed after use).
+    """
+    global _cached_version, _checked_at
+    with _lock:
+        if _cached_version is not None and time.monotonic() - _checked_at < DATASET_VERSION_CHECK_SECONDS:
+            return _cached_version
+
+    conn = connect()
+    if conn is None:
+        return _cached_version or UNVERSIONED
+    try:
+        cursor = conn.cursor()
+        version = read_dataset_version(cursor)
+        cursor.close()
+    except Exception as e:
+        print(f"⚠️ Could not read dataset version: {e}")
+        return _cached_version or UNVERSIONED
+    finally:
+        conn.close()
+
+    with _lock:
+        _cached_version, _checked_at = version, time.monotonic()
+    return version
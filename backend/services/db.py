@@ -1,6 +1,7 @@
 import psycopg2
 import os
 import urllib.parse as urlparse
+from services.db_pool import get_pool
 
 def get_db_config():
     """Get database configuration from environment variables"""
@@ -26,15 +27,9 @@ def get_db_config():
         }
 
 def connect_db():
-    """Connect to the database using environment configuration"""
+    """Check out a connection from the shared pool; conn.close() returns it to the pool"""
     try:
-        db_config = get_db_config()
-        
-        # Add SSL mode for production (Supabase requires SSL)
-        if 'supabase.com' in db_config.get('host', ''):
-            db_config['sslmode'] = 'require'
-            
-        return psycopg2.connect(**db_config)
+        return get_pool().checkout()
     except Exception as err:
         print(f"Database connection error: {err}")
         return None
@@ -0,0 +1,321 @@
+"""
+Process-wide PostgreSQL connection pool shared by every database call site.
+
+Opening a TCP+TLS connection to the remote Supabase pooler costs more than
+most of our queries, so connections are kept open and reused:
+
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        ...
+
+connect_db()-style call sites can keep their ``conn = ...; conn.close()``
+shape by using ``get_pool().checkout()``: the returned connection hands
+itself back to the pool on close() (or once it and all its cursors are
+garbage-collected).
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError
+
+POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN', 1))
+POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX', 10))
+POOL_CHECKOUT_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT_SECONDS', 10))
+# Ping a connection on checkout only if it has sat idle this long
+POOL_HEALTH_CHECK_AFTER = float(os.getenv('DB_POOL_HEALTH_CHECK_SECONDS', 30))
+# Close idle connections beyond the minimum size after this long
+POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE_SECONDS', 300))
+# Recycle any connection older than this, even if busy (Supabase pooler drops old sessions)
+POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME_SECONDS', 1800))
+
+
+def get_database_url(use_db_components=True):
+    """
+    DATABASE_URL (with SSL for Supabase), or a URL built from the DB_* variables.
+
+    With use_db_components=False, None when DATABASE_URL is not set.
+    """
+    database_url = os.getenv('DATABASE_URL')
+    if database_url:
+        # Ensure SSL for Supabase
+        if 'supabase.com' in database_url and 'sslmode=' not in database_url:
+            database_url += ('&' if '?' in database_url else '?') + 'sslmode=require'
+        return database_url
+    if not use_db_components:
+        return None
+
+    host = os.getenv('DB_HOST', 'localhost')
+    user = os.getenv('DB_USER', 'postgres')
+    password = os.getenv('DB_PASSWORD', 'password')
+    dbname = os.getenv('DB_NAME', 'postgres')
+    port = os.getenv('DB_PORT', 5432)
+    return f"postgresql://{user}:{password}@{host}:{port}/{dbname}"
+
+
+_pinning_factories = {}
+
+
+def _pinning_factory(base):
+    """Subclass of a cursor class whose instances can hold a reference to their PooledConnection."""
+    factory = _pinning_factories.get(base)
+    if factory is None:
+        factory = _pinning_factories.setdefault(base, type(f"Pooled{base.__name__}", (base,), {}))
+    return factory
+
+
+class PooledConnection:
+    """
+    A checked-out psycopg2 connection whose close() returns it to the pool.
+
+    Attribute reads and writes and ``with conn:`` go to the underlying
+    connection. Cursors keep a reference to the wrapper, so a connection that
+    is never closed goes back to the pool only once the wrapper and every
+    cursor on it have been garbage-collected.
+    """
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def _connection(self):
+        conn = self._conn
+        if conn is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return conn
+
+    def close(self):
+        if self._conn is not None:
+            conn = self._conn
+            object.__setattr__(self, "_conn", None)
+            self._pool.putconn(conn)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    @property
+    def raw(self):
+        return self._conn
+
+    def cursor(self, *args, **kwargs):
+        conn = self._connection()
+        base = kwargs.pop("cursor_factory", None) or conn.cursor_factory or psycopg2.extensions.cursor
+        cursor = conn.cursor(*args, cursor_factory=_pinning_factory(base), **kwargs)
+        cursor._pooled_connection = self
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
+
+    def __setattr__(self, name, value):
+        # e.g. conn.autocommit = True must reach the real connection, not the wrapper
+        setattr(self._connection(), name, value)
+
+    def __enter__(self):
+        self._connection().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Like psycopg2: ends the transaction, does not close (or return) the connection
+        return self._connection().__exit__(exc_type, exc_value, traceback)
+
+    def __del__(self):
+        # Safety net for code paths that return early without closing; cursors pin the wrapper
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Thread-safe LIFO pool with checkout health checks and idle/lifetime recycling."""
+
+    def __init__(self, dsn, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 checkout_timeout=POOL_CHECKOUT_TIMEOUT, health_check_after=POOL_HEALTH_CHECK_AFTER,
+                 max_idle=POOL_MAX_IDLE, max_lifetime=POOL_MAX_LIFETIME):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_after = health_check_after
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = deque()  # (conn, created_at, last_used_at), most recently used on the right
+        self._created_at = {}  # id(conn) -> created_at for checked-out connections
+        self._stats = {
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "reused": 0,
+            "health_checks": 0,
+            "failed_health_checks": 0,
+            "checkout_timeouts": 0,
+        }
+
+    def _open(self):
+        conn = psycopg2.connect(self.dsn, connect_timeout=10)
+        with self._lock:
+            self._stats["connections_opened"] += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        with self._lock:
+            self._stats["connections_closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn):
+        with self._lock:
+            self._stats["health_checks"] += 1
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception:
+            with self._lock:
+                self._stats["failed_health_checks"] += 1
+            return False
+
+    def _recycle_idle(self, now):
+        """Close connections idle past max_idle, keeping min_size around."""
+        expired = []
+        with self._lock:
+            while len(self._idle) > self.min_size and now - self._idle[0][2] > self.max_idle:
+                expired.append(self._idle.popleft()[0])
+        for conn in expired:
+            self._discard(conn)
+
+    def getconn(self):
+        """Check out a raw connection; pair every call with putconn()."""
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._stats["checkout_timeouts"] += 1
+            raise PoolError(f"no database connection available within {self.checkout_timeout}s")
+
+        try:
+            now = time.monotonic()
+            self._recycle_idle(now)
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    conn, created_at = self._open()
+                    break
+
+                conn, created_at, last_used_at = entry
+                if conn.closed or now - created_at > self.max_lifetime:
+                    self._discard(conn)
+                    continue
+                if now - last_used_at > self.health_check_after and not self._is_healthy(conn):
+                    self._discard(conn)
+                    continue
+                with self._lock:
+                    self._stats["reused"] += 1
+                break
+
+            with self._lock:
+                self._stats["checkouts"] += 1
+                self._created_at[id(conn)] = created_at
+            return conn
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        """Return a connection, rolling back any open transaction."""
+        with self._lock:
+            created_at = self._created_at.pop(id(conn), None)
+        if created_at is None:
+            return  # Not ours, or already returned
+
+        try:
+            if not close and not conn.closed:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+        except Exception:
+            close = True
+
+        if close or conn.closed or time.monotonic() - created_at > self.max_lifetime:
+            self._discard(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, created_at, time.monotonic()))
+        self._slots.release()
+
+    def checkout(self):
+        """Check out a connection whose close() returns it to the pool."""
+        return PooledConnection(self, self.getconn())
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "idle": len(self._idle),
+                "in_use": len(self._created_at),
+            })
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    The process-wide pool, connected to get_database_url().
+
+    The DSN is resolved here and nowhere else, so every caller shares the same
+    database whichever of them happens to create the pool first.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_database_url())
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """with pooled_connection() as conn: ... - checks out and always returns a connection."""
+    with get_pool().connection() as conn:
+        yield conn
+
+
+def pool_stats():
+    """Pool counters for status endpoints, or None before the first checkout."""
+    return _pool.stats() if _pool is not None else None
@@ -0,0 +1,184 @@
+"""
+Persistent embedding cache shared by the mitigation lookups and the ingest script.
+
+Vectors are stored in SQLite keyed by (model, sha256 of the text), with a
+bounded in-memory LRU in front, so a string such as "invasive | high" is
+embedded once per model and then read back across restarts. CachedEmbedder
+wraps any embedder with an encode() method and only sends the misses of a
+batch to the model, which it can load lazily on the first miss.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'true').lower() == 'true'
+EMBEDDING_CACHE_PATH = os.getenv(
+    'EMBEDDING_CACHE_PATH', os.path.join(tempfile.gettempdir(), "bioscope_embedding_cache.sqlite3")
+)
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 4096))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite (model, text hash) -> float32 vector store behind an in-memory LRU."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._memory = OrderedDict()  # (model, hash) -> list of floats
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "errors": 0}
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model, texts):
+        """{text: vector} for every text already cached under model; stats count each distinct text once."""
+        found, missing = {}, {}
+        unique = list(dict.fromkeys(texts))
+        with self._lock:
+            for text in unique:
+                key = (model, text_hash(text))
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[text] = vector
+                    self._stats["memory_hits"] += 1
+                else:
+                    missing[key[1]] = text
+            if not missing:
+                return found
+            try:
+                hashes = list(missing)
+                conn = self._connection()
+                # Chunked to stay under SQLite's bound-parameter limit
+                for start in range(0, len(hashes), 500):
+                    chunk = hashes[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? "
+                        f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                        [model, *chunk]
+                    ).fetchall()
+                    for digest, blob in rows:
+                        vector = array("f", blob).tolist()
+                        found[missing[digest]] = vector
+                        self._remember((model, digest), vector)
+                        self._stats["disk_hits"] += 1
+            except (sqlite3.Error, OSError) as e:
+                # A broken cache must never break embedding itself
+                self._stats["errors"] += 1
+                print(f"⚠️ Embedding cache read failed: {e}")
+            self._stats["misses"] += len(unique) - len(found)
+        return found
+
+    def put_many(self, model, vectors):
+        """Store {text: vector} under model."""
+        now = time.time()
+        with self._lock:
+            rows = []
+            for text, vector in vectors.items():
+                vector = [float(v) for v in vector]
+                digest = text_hash(text)
+                self._remember((model, digest), vector)
+                rows.append((model, digest, array("f", vector).tobytes(), now))
+            try:
+                conn = self._connection()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, created_at) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                self._stats["errors"] += 1
+                print(f"⚠️ Embedding cache write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"memory_entries": len(self._memory), "max_entries": self.max_entries, "path": self.path})
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """The process-wide cache at EMBEDDING_CACHE_PATH."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+class CachedEmbedder:
+    """encode() through the embedding cache; the wrapped model only sees cache misses."""
+
+    def __init__(self, model_name, load_model, cache=None, preload=True):
+        self.model_name = model_name
+        self._load_model = load_model
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.cache = cache or get_embedding_cache()
+        if preload:
+            self.load_model()
+
+    def load_model(self):
+        """Load the wrapped model now (once) rather than on the first cache miss."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    @property
+    def model(self):
+        return self.load_model()
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        import numpy as np
+
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        vectors = self.cache.get_many(self.model_name, texts)
+        misses = list(dict.fromkeys(text for text in texts if text not in vectors))
+        if misses:
+            encoded = self.model.encode(misses, batch_size=batch_size, **kwargs)
+            fresh = {text: [float(v) for v in vector] for text, vector in zip(misses, encoded)}
+            self.cache.put_many(self.model_name, fresh)
+            vectors.update(fresh)
+
+        embeddings = np.array([vectors[text] for text in texts], dtype=np.float32)
+        return embeddings[0] if single else embeddings
@@ -0,0 +1,140 @@
+"""
+Sentence embedding backends for the mitigation knowledge base.
+
+EMBEDDING_BACKEND=torch (default) uses SentenceTransformer. EMBEDDING_BACKEND=onnx
+runs an int8-quantized ONNX export of the same model through onnxruntime,
+with the `tokenizers` package doing the tokenization, so neither torch nor
+transformers has to be installed. Build the export with
+"ML Strategy/export_onnx_embedder.py" and check it against the torch model
+with "ML Strategy/check_onnx_embedder.py".
+
+Both backends expose encode(texts) -> numpy array of unit-length vectors
+(one row per text, or a single vector for a single string), and
+load_embedder() puts the persistent embedding cache in front of either.
+"""
+import hashlib
+import importlib.util
+import os
+
+from services.embedding_cache import EMBEDDING_CACHE_ENABLED, CachedEmbedder
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+# Hugging Face commit of the torch model; empty follows the hub's main branch
+EMBEDDING_MODEL_REVISION = os.getenv('EMBEDDING_MODEL_REVISION', '')
+ONNX_MODEL_DIR = os.getenv(
+    'ONNX_MODEL_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ML Strategy", "onnx_minilm")
+)
+ONNX_MODEL_FILE = "model_int8.onnx"
+ONNX_MAX_LENGTH = 256  # all-MiniLM-L6-v2's max_seq_length
+
+
+def embedding_backend_available(backend=EMBEDDING_BACKEND):
+    """True if the packages a backend needs are installed (checked without importing them)."""
+    if backend == "onnx":
+        modules = ("numpy", "onnxruntime", "tokenizers")
+    else:
+        modules = ("sentence_transformers",)
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+
+class OnnxEmbedder:
+    """Mean-pooled, L2-normalized sentence embeddings from an ONNX export of the model."""
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, model_file=ONNX_MODEL_FILE, threads=None):
+        import numpy as np
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self._np = np
+        self.model_path = os.path.join(model_dir, model_file)
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=ONNX_MAX_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+    def _encode_batch(self, texts):
+        np = self._np
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        # Same pooling as the sentence-transformers model: mean over real tokens, then unit length
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        """SentenceTransformer.encode() compatible subset; extra keyword arguments are ignored."""
+        np = self._np
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        embeddings = np.vstack(batches).astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def _load_model(backend):
+    if backend == "onnx":
+        return OnnxEmbedder()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu", revision=EMBEDDING_MODEL_REVISION or None)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def model_revision(backend=EMBEDDING_BACKEND):
+    """
+    Short id of the exact weights a backend would load, found without loading them.
+
+    ONNX: hash of the exported model file. torch: EMBEDDING_MODEL_REVISION, else the
+    commit the local Hugging Face cache resolved main to, else "main".
+    """
+    if backend == "onnx":
+        try:
+            return _file_sha256(os.path.join(ONNX_MODEL_DIR, ONNX_MODEL_FILE))[:12]
+        except OSError:
+            return "missing"
+    if EMBEDDING_MODEL_REVISION:
+        return EMBEDDING_MODEL_REVISION[:12]
+    hub_cache = os.getenv('HF_HUB_CACHE') or os.path.join(
+        os.getenv('HF_HOME') or os.path.join(os.path.expanduser("~"), ".cache", "huggingface"), "hub"
+    )
+    ref = os.path.join(hub_cache, f"models--sentence-transformers--{EMBEDDING_MODEL_NAME}", "refs", "main")
+    try:
+        with open(ref) as f:
+            return f.read().strip()[:12] or "main"
+    except OSError:
+        return "main"
+
+
+def load_embedder(backend=EMBEDDING_BACKEND, cached=EMBEDDING_CACHE_ENABLED, preload=True):
+    """
+    The configured embedding model, behind the persistent embedding cache unless cached is False.
+
+    With preload=False the weights are only loaded when a text misses the cache.
+    """
+    if not cached:
+        return _load_model(backend)
+    # Each backend and each set of weights gets its own cache namespace, so a re-export
+    # or a model update never serves vectors computed by the previous weights
+    model_name = f"{EMBEDDING_MODEL_NAME}:{'onnx-int8' if backend == 'onnx' else 'torch'}@{model_revision(backend)}"
+    return CachedEmbedder(model_name, lambda: _load_model(backend), preload=preload)
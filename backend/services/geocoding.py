@@ -0,0 +1,221 @@
+"""
+Nominatim lookups through a persistent SQLite cache.
+
+Every geocoding call site goes through nominatim_search(), so a repeated
+ZIP, address or autocomplete query costs one local read instead of an HTTP
+round trip. Queries are keyed by their normalized parameters; empty answers
+are cached too (for a shorter time), while network and HTTP errors are not.
+"""
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+import requests
+
+GEOCODING_API_URL = "https://nominatim.openstreetmap.org/search"
+GEOCODING_USER_AGENT = "BiodivProScopeApp/1.0"
+
+GEOCODE_CACHE_PATH = os.getenv(
+    'GEOCODE_CACHE_PATH', os.path.join(tempfile.gettempdir(), "bioscope_geocode_cache.sqlite3")
+)
+GEOCODE_CACHE_TTL_SECONDS = float(os.getenv('GEOCODE_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+GEOCODE_NEGATIVE_TTL_SECONDS = float(os.getenv('GEOCODE_NEGATIVE_TTL_SECONDS', 24 * 3600))
+GEOCODE_TIMEOUT_SECONDS = float(os.getenv('GEOCODE_TIMEOUT_SECONDS', 10))
+
+# Only these fields of a Nominatim result are used anywhere
+_RESULT_FIELDS = ("lat", "lon", "display_name")
+
+
+class GeocodingError(Exception):
+    """Nominatim could not be reached or answered with an error status."""
+
+
+def normalize_query(params):
+    """Stable cache key: lower-cased, whitespace-collapsed parameters in name order."""
+    parts = []
+    for name in sorted(params):
+        value = " ".join(str(params[name]).lower().split())
+        value = re.sub(r"\s*,\s*", ", ", value).strip(" ,")
+        parts.append(f"{name}={value}")
+    return "&".join(parts)
+
+
+class GeocodeCache:
+    """SQLite-backed query -> results store with per-entry expiry."""
+
+    def __init__(self, path=GEOCODE_CACHE_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "expired": 0, "errors": 0}
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")  # Lets several worker processes read while one writes
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    query TEXT PRIMARY KEY,
+                    results TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, query):
+        """Cached results (possibly an empty list), or None on a miss."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT results, expires_at FROM geocode_cache WHERE query = ?", (query,)
+                ).fetchone()
+                if row is None:
+                    self._stats["misses"] += 1
+                    return None
+                if row[1] <= now:
+                    conn.execute("DELETE FROM geocode_cache WHERE query = ?", (query,))
+                    conn.commit()
+                    self._stats["expired"] += 1
+                    self._stats["misses"] += 1
+                    return None
+                results = json.loads(row[0])
+                self._stats["hits" if results else "negative_hits"] += 1
+                return results
+            except (sqlite3.Error, OSError, ValueError) as e:
+                # A broken cache must never break geocoding itself
+                self._stats["errors"] += 1
+                print(f"⚠️ Geocode cache read failed: {e}")
+                return None
+
+    def put(self, query, results, ttl):
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (query, results, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    (query, json.dumps(results), now + ttl, now)
+                )
+                conn.commit()
+            except (sqlite3.Error, OSError) as e:
+                self._stats["errors"] += 1
+                print(f"⚠️ Geocode cache write failed: {e}")
+
+    def cached_results(self):
+        """Every unexpired, non-empty result list in the cache."""
+        with self._lock:
+            try:
+                rows = self._connection().execute(
+                    "SELECT results FROM geocode_cache WHERE expires_at > ? AND results <> '[]'", (time.time(),)
+                ).fetchall()
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Geocode cache scan failed: {e}")
+                return []
+        results = []
+        for (payload,) in rows:
+            try:
+                results.extend(json.loads(payload))
+            except ValueError:
+                continue
+        return results
+
+    def purge_expired(self):
+        with self._lock:
+            try:
+                conn = self._connection()
+                deleted = conn.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+                conn.commit()
+                return deleted
+            except (sqlite3.Error, OSError) as e:
+                print(f"⚠️ Geocode cache purge failed: {e}")
+                return 0
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            try:
+                stats["entries"] = self._connection().execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+            except (sqlite3.Error, OSError):
+                stats["entries"] = None
+        stats["path"] = self.path
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# Callables notified with every fresh result list fetched from Nominatim
+_result_listeners = []
+
+
+def add_result_listener(callback):
+    """Call callback(results) whenever nominatim_search() fetches new, non-empty results."""
+    _result_listeners.append(callback)
+
+
+def get_geocode_cache():
+    """The process-wide cache at GEOCODE_CACHE_PATH."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = GeocodeCache()
+                _cache.purge_expired()
+    return _cache
+
+
+def nominatim_search(params):
+    """
+    Nominatim /search results for params, served from the cache when possible.
+
+    Returns:
+        List of results with lat, lon and display_name (empty if nothing matched).
+
+    Raises:
+        GeocodingError if Nominatim is unreachable or returns an error status.
+    """
+    cache = get_geocode_cache()
+    query = normalize_query(params)
+    results = cache.get(query)
+    if results is not None:
+        return results
+
+    try:
+        response = requests.get(
+            GEOCODING_API_URL,
+            params=params,
+            headers={"User-Agent": GEOCODING_USER_AGENT},
+            timeout=GEOCODE_TIMEOUT_SECONDS
+        )
+    except requests.RequestException as e:
+        raise GeocodingError(f"Nominatim request failed: {e}")
+    if response.status_code != 200:
+        raise GeocodingError(f"Nominatim returned HTTP {response.status_code}")
+
+    results = [{field: item.get(field) for field in _RESULT_FIELDS} for item in response.json()]
+    cache.put(query, results, GEOCODE_CACHE_TTL_SECONDS if results else GEOCODE_NEGATIVE_TTL_SECONDS)
+    if results:
+        for callback in _result_listeners:
+            try:
+                callback(results)
+            except Exception as e:
+                print(f"⚠️ Geocode result listener failed: {e}")
+    return results
+
+
+def geocode_zip(zipcode):
+    """ZIP centroid (lat, lon) from Nominatim, or None if it has no match; raises GeocodingError like nominatim_search."""
+    results = nominatim_search({"postalcode": zipcode, "countrycodes": "us", "format": "json"})
+    if results:
+        return float(results[0]["lat"]), float(results[0]["lon"])
+    return None
@@ -0,0 +1,215 @@
+"""
+Memory-mapped rasters for the regular-grid HCI risk layers.
+
+freshwater_risk, marine_hci and terrestrial_risk are gridded datasets whose
+x/y values sit on a regular lattice. export_raster() writes one layer as
+
+    <name>.values.npy   float64 (bands, height, width), NaN where a band is NULL
+    <name>.mask.npy     bool (height, width), True where the grid has a row
+    <name>.json         geo-transform, band names and text band categories
+
+and HciRaster opens those files with mmap_mode="r", so every worker process
+shares the same pages through the OS cache. Point and window lookups are
+index arithmetic on the geo-transform; nothing is searched.
+"""
+import json
+import math
+import os
+from numbers import Number
+
+import numpy as np
+
+# Value columns stored per layer, in the order the /search record builders expect after x, y
+HCI_LAYERS = {
+    "freshwater_risk": ["normalized_risk", "risk_level"],
+    "marine_hci": ["marine_hci"],
+    "terrestrial_risk": ["normalized_risk", "risk_level"],
+}
+
+# Relative tolerance when checking that coordinates fall on the lattice
+LATTICE_TOLERANCE = 1e-3
+# Coordinates are rounded to this many decimals (about 0.1 m) before the lattice
+# step is measured, so float noise in the source cannot pass for a tiny step
+COORDINATE_DECIMALS = 6
+# Exports whose lattice would exceed this many cells are refused before any file is allocated
+HCI_RASTER_MAX_CELLS = int(os.getenv('HCI_RASTER_MAX_CELLS', 20_000_000))
+
+
+def _lattice_step(coordinates):
+    """Smallest spacing between distinct coordinates - the lattice step if any two cells are adjacent."""
+    unique = np.unique(coordinates)
+    if len(unique) < 2:
+        return 1.0
+    return float(np.diff(unique).min())
+
+
+def _lattice_index(coordinates, origin, step):
+    position = (coordinates - origin) / step
+    index = np.rint(position)
+    off_lattice = np.abs(position - index) > LATTICE_TOLERANCE
+    if off_lattice.any():
+        raise ValueError(f"{int(off_lattice.sum())} coordinates are off the {step:g} degree lattice")
+    return index.astype(np.int64)
+
+
+def _replace(temp_path, path):
+    # Renaming keeps processes that still map the old file on the old inode
+    os.replace(temp_path, path)
+
+
+def export_raster(rows, band_names, out_dir, name, dataset_version=None):
+    """
+    Write (x, y, band values...) rows as a memory-mappable raster.
+
+    Text bands (e.g. risk_level) are stored as category codes; their labels go in the JSON.
+
+    Returns:
+        The metadata dict written to <name>.json.
+    """
+    # One pass over the (possibly server-side) cursor, keeping columns rather than row tuples
+    xs, ys, columns = [], [], [[] for _ in band_names]
+    for row in rows:
+        if row[0] is None or row[1] is None:
+            continue
+        xs.append(float(row[0]))
+        ys.append(float(row[1]))
+        for band, column in enumerate(columns):
+            column.append(row[2 + band])
+    if not xs:
+        raise ValueError(f"{name}: no rows with coordinates to export")
+
+    xs = np.round(np.array(xs), COORDINATE_DECIMALS)
+    ys = np.round(np.array(ys), COORDINATE_DECIMALS)
+    step_x, step_y = _lattice_step(xs), _lattice_step(ys)
+    # North-up grid: row 0 is the northernmost lattice line
+    origin_x, origin_y = float(xs.min()), float(ys.max())
+    width = int(round((float(xs.max()) - origin_x) / step_x)) + 1
+    height = int(round((origin_y - float(ys.min())) / step_y)) + 1
+    if width * height > HCI_RASTER_MAX_CELLS:
+        raise ValueError(f"{name}: a {width}x{height} lattice (step {step_x:g} x {step_y:g}) exceeds "
+                         f"HCI_RASTER_MAX_CELLS={HCI_RASTER_MAX_CELLS}; the layer is probably not a regular grid")
+    cols = _lattice_index(xs, origin_x, step_x)
+    rows_index = _lattice_index(-ys, -origin_y, step_y)
+
+    categories = {}
+    bands = np.full((len(band_names), len(xs)), np.nan)
+    for band, band_name in enumerate(band_names):
+        raw = columns[band]
+        if all(value is None or (isinstance(value, Number) and not isinstance(value, bool)) for value in raw):
+            bands[band] = [np.nan if value is None else float(value) for value in raw]
+        else:
+            labels = sorted({str(value) for value in raw if value is not None})
+            codes = {label: code for code, label in enumerate(labels)}
+            bands[band] = [np.nan if value is None else codes[str(value)] for value in raw]
+            categories[band_name] = labels
+
+    os.makedirs(out_dir, exist_ok=True)
+    values_path = os.path.join(out_dir, f"{name}.values.npy")
+    mask_path = os.path.join(out_dir, f"{name}.mask.npy")
+    meta_path = os.path.join(out_dir, f"{name}.json")
+
+    values = np.lib.format.open_memmap(values_path + ".tmp", mode="w+", dtype=np.float64,
+                                       shape=(len(band_names), height, width))
+    values[:] = np.nan
+    values[:, rows_index, cols] = bands
+    values.flush()
+    del values
+
+    mask = np.lib.format.open_memmap(mask_path + ".tmp", mode="w+", dtype=np.bool_, shape=(height, width))
+    mask[:] = False
+    mask[rows_index, cols] = True
+    mask.flush()
+    del mask
+
+    metadata = {
+        "name": name,
+        "bands": list(band_names),
+        "categories": categories,
+        "width": width,
+        "height": height,
+        # GDAL-style affine transform for cell centres: x = x0 + col * dx, y = y0 + row * dy
+        "transform": [origin_x, step_x, 0.0, origin_y, 0.0, -step_y],
+        "cells": int(len(xs)),
+        "dataset_version": dataset_version,
+    }
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    # Metadata last, so a reader that sees the new JSON also gets the new arrays
+    _replace(values_path + ".tmp", values_path)
+    _replace(mask_path + ".tmp", mask_path)
+    _replace(meta_path + ".tmp", meta_path)
+    return metadata
+
+
+class HciRaster:
+    """Read-only, memory-mapped view of one exported layer."""
+
+    def __init__(self, directory, name):
+        self.meta_path = os.path.join(directory, f"{name}.json")
+        with open(self.meta_path) as f:
+            self.metadata = json.load(f)
+        self.mtime = os.path.getmtime(self.meta_path)
+        self.values = np.load(os.path.join(directory, f"{name}.values.npy"), mmap_mode="r")
+        self.mask = np.load(os.path.join(directory, f"{name}.mask.npy"), mmap_mode="r")
+        self.bands = self.metadata["bands"]
+        self.categories = self.metadata["categories"]
+        self.width, self.height = self.metadata["width"], self.metadata["height"]
+        self.origin_x, self.step_x, _, self.origin_y, _, step_y = self.metadata["transform"]
+        self.step_y = -step_y
+
+    def is_stale(self):
+        """True once a newer export has replaced the files this view maps."""
+        try:
+            return os.path.getmtime(self.meta_path) != self.mtime
+        except OSError:
+            return True
+
+    def _cell(self, lat, lon):
+        return (int(math.floor((self.origin_y - lat) / self.step_y + 0.5)),
+                int(math.floor((lon - self.origin_x) / self.step_x + 0.5)))
+
+    def _row(self, row, col):
+        values = []
+        for band, band_name in enumerate(self.bands):
+            value = float(self.values[band, row, col])
+            if value != value:
+                value = None
+            elif band_name in self.categories:
+                value = self.categories[band_name][int(value)]
+            values.append(value)
+        x = self.origin_x + col * self.step_x
+        y = self.origin_y - row * self.step_y
+        return (x, y, *values)
+
+    def point(self, lat, lon):
+        """The (x, y, bands...) row of the lattice cell containing the point, or None."""
+        if not (math.isfinite(lat) and math.isfinite(lon)):
+            return None
+        row, col = self._cell(lat, lon)
+        if not (0 <= row < self.height and 0 <= col < self.width) or not self.mask[row, col]:
+            return None
+        return self._row(row, col)
+
+    def window_shape(self, south, west, north, east):
+        """(row slice, col slice) of the lattice points inside the bounds."""
+        row_start = max(int(math.ceil((self.origin_y - north) / self.step_y - LATTICE_TOLERANCE)), 0)
+        row_stop = min(int(math.floor((self.origin_y - south) / self.step_y + LATTICE_TOLERANCE)) + 1, self.height)
+        col_start = max(int(math.ceil((west - self.origin_x) / self.step_x - LATTICE_TOLERANCE)), 0)
+        col_stop = min(int(math.floor((east - self.origin_x) / self.step_x + LATTICE_TOLERANCE)) + 1, self.width)
+        return slice(row_start, max(row_stop, row_start)), slice(col_start, max(col_stop, col_start))
+
+    def window(self, south, west, north, east):
+        """(x, y, bands...) rows for every lattice point with data inside the bounds."""
+        rows, cols = self.window_shape(south, west, north, east)
+        present = np.argwhere(self.mask[rows, cols])
+        return [self._row(rows.start + r, cols.start + c) for r, c in present]
+
+    def stats(self):
+        return {
+            "bands": self.bands,
+            "width": self.width,
+            "height": self.height,
+            "cells": self.metadata["cells"],
+            "dataset_version": self.metadata.get("dataset_version"),
+        }
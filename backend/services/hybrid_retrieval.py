@@ -0,0 +1,199 @@
+"""
+Hybrid BM25 + vector retrieval over the chunked mitigation knowledge sources.
+
+The BM25 inverted index is precomputed at ingest and saved as JSON next to
+the vector collection; it also carries the chunk texts and metadata, so a
+lexical answer needs nothing else. HybridRetriever.search() runs BM25
+first. When the best lexical hit clearly wins, or the per-query latency
+budget would not survive an embedding call, it answers from BM25 alone
+(one query per RETRIEVAL_PROBE_SECONDS still runs the vector stage, so a
+slow cold start does not switch it off for good). Otherwise it embeds the
+query, asks the vector collection and fuses both rankings with reciprocal
+rank fusion.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from services.metadata_filter import matches_where
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Reciprocal rank fusion constant from Cormack et al.; damps the weight of the very top ranks
+RRF_K = 60
+
+RETRIEVAL_BUDGET_MS = float(os.getenv('RETRIEVAL_BUDGET_MS', 150))
+# Top BM25 score must beat the runner-up by this factor to skip the vector stage
+LEXICAL_CONFIDENCE_RATIO = float(os.getenv('LEXICAL_CONFIDENCE_RATIO', 1.5))
+# While the vector stage is over budget, one query per interval still runs it to re-measure
+RETRIEVAL_PROBE_SECONDS = float(os.getenv('RETRIEVAL_PROBE_SECONDS', 30))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall(str(text).lower()) if token not in _STOPWORDS and len(token) > 1]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of chunks, with postings precomputed per term."""
+
+    def __init__(self, ids, documents, metadatas, postings, lengths):
+        self.ids, self.documents, self.metadatas = ids, documents, metadatas
+        self.postings = postings  # term -> [[chunk index, term frequency], ...]
+        self.lengths = lengths
+        self.average_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+        count = len(ids)
+        self.idf = {term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                    for term, docs in postings.items()}
+
+    @classmethod
+    def build(cls, chunks):
+        """Index chunks (dicts with id, text and metadata)."""
+        postings, lengths = {}, []
+        for index, chunk in enumerate(chunks):
+            tokens = tokenize(chunk["text"])
+            lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append([index, frequency])
+        return cls([c["id"] for c in chunks], [c["text"] for c in chunks],
+                   [c["metadata"] for c in chunks], postings, lengths)
+
+    def save(self, path):
+        with open(path + ".tmp", "w") as f:
+            json.dump({"ids": self.ids, "documents": self.documents, "metadatas": self.metadatas,
+                       "postings": self.postings, "lengths": self.lengths}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["ids"], data["documents"], data["metadatas"], data["postings"], data["lengths"])
+
+    def search(self, query, k=5, where=None):
+        """[(chunk index, score), ...] best first; only chunks whose metadata matches where."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, frequency in self.postings[term]:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[index] / (self.average_length or 1))
+                scores[index] = scores.get(index, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        if where:
+            ranked = [item for item in ranked if matches_where(self.metadatas[item[0]], where)]
+        return ranked[:k]
+
+
+class HybridRetriever:
+    """BM25 first, vectors when they are worth the time, fused with reciprocal rank fusion."""
+
+    def __init__(self, bm25, collection=None, embedder=None, budget_ms=RETRIEVAL_BUDGET_MS,
+                 confidence_ratio=LEXICAL_CONFIDENCE_RATIO, probe_seconds=RETRIEVAL_PROBE_SECONDS):
+        self.bm25 = bm25
+        self.collection = collection
+        self.embedder = embedder
+        self.budget_ms = budget_ms
+        self.confidence_ratio = confidence_ratio
+        self.probe_seconds = probe_seconds
+        self._vector_ms = None  # moving average of the embed + vector query time
+        self._vector_at = 0.0  # monotonic time the vector stage last ran
+        self._lock = threading.Lock()
+        self._stats = {"queries": 0, "lexical_only": 0, "hybrid": 0, "over_budget_skips": 0, "probes": 0,
+                       "vector_errors": 0}
+
+    def _result(self, index, score, how):
+        return {"id": self.bm25.ids[index], "text": self.bm25.documents[index],
+                "metadata": self.bm25.metadatas[index], "score": round(score, 6), "matched_by": how}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def search(self, query, k=5, where=None, budget_ms=None):
+        """
+        Top-k chunks for the query.
+
+        Returns:
+            {"results": [...], "mode": "lexical" | "hybrid", "elapsed_ms": float}
+        """
+        started = time.perf_counter()
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        self._count("queries")
+        lexical = self.bm25.search(query, k=max(k, 20), where=where)
+
+        def done(results, mode):
+            self._count("lexical_only" if mode == "lexical" else "hybrid")
+            return {"results": results, "mode": mode, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+        lexical_results = [self._result(index, score, "bm25") for index, score in lexical[:k]]
+        if self.collection is None or self.embedder is None:
+            return done(lexical_results, "lexical")
+        # A clear lexical winner is answered without an embedding call
+        if lexical and (len(lexical) == 1 or lexical[0][1] >= self.confidence_ratio * lexical[1][1]):
+            return done(lexical_results, "lexical")
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        probe = False
+        with self._lock:
+            if self._vector_ms is not None and elapsed_ms + self._vector_ms > budget_ms:
+                # The estimate only changes when the stage runs, so let one query through now and then
+                probe = time.monotonic() - self._vector_at >= self.probe_seconds
+                if not probe:
+                    self._stats["over_budget_skips"] += 1
+                    skip = True
+                else:
+                    self._stats["probes"] += 1
+                    self._vector_at = time.monotonic()  # one probe per interval, even under concurrency
+                    skip = False
+            else:
+                skip = False
+        if skip:
+            return done(lexical_results, "lexical")
+
+        vector_started = time.perf_counter()
+        try:
+            embedding = self.embedder.encode([query]).tolist()
+            vector = self.collection.query(query_embeddings=embedding, n_results=max(k, 20), where=where or None,
+                                           include=["distances"])
+        except Exception as e:
+            print(f"⚠️ Vector retrieval failed: {e}")
+            self._count("vector_errors")
+            return done(lexical_results, "lexical")
+        vector_ms = (time.perf_counter() - vector_started) * 1000
+        with self._lock:
+            # A probe replaces the stale estimate outright instead of averaging it down slowly
+            if self._vector_ms is None or probe:
+                self._vector_ms = vector_ms
+            else:
+                self._vector_ms = 0.8 * self._vector_ms + 0.2 * vector_ms
+            self._vector_at = time.monotonic()
+
+        positions = {chunk_id: index for index, chunk_id in enumerate(self.bm25.ids)}
+        fused, matched = {}, {}
+        for rank, (index, _) in enumerate(lexical):
+            fused[index] = fused.get(index, 0.0) + 1.0 / (RRF_K + rank + 1)
+            matched[index] = "bm25"
+        for rank, chunk_id in enumerate(vector["ids"][0] if vector["ids"] else []):
+            index = positions.get(chunk_id)
+            if index is None:
+                continue  # vector collection has a chunk the lexical index does not
+            fused[index] = fused.get(index, 0.0) + 1.0 / (RRF_K + rank + 1)
+            matched[index] = "both" if index in matched else "vector"
+        ranked = sorted(fused.items(), key=lambda item: -item[1])[:k]
+        return done([self._result(index, score, matched[index]) for index, score in ranked], "hybrid")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["vector_ms_avg"] = round(self._vector_ms, 2) if self._vector_ms is not None else None
+        stats.update({"chunks": len(self.bm25.ids), "budget_ms": self.budget_ms})
+        return stats
@@ -0,0 +1,183 @@
+"""
+Chunking for the mitigation knowledge sources in "ML Strategy/data sources".
+
+Every CSV and JSON file there becomes a list of chunks, each a dict of
+id, text and metadata (source, risk_type, threat_level and, where the
+source has one, reference). CSV rows are one chunk each. JSON documents are
+flattened into "heading: text" lines per record or section; short records
+are packed together and long ones split into overlapping word windows.
+Chunk ids are content hashes, so the same text from several files (the
+cleaned CSVs overlap heavily) is indexed once and unchanged chunks are
+skipped on re-ingest.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+
+from services.mitigation_keys import canonical_risk_type, canonical_threat_level
+
+CHUNK_WORDS = 120
+CHUNK_OVERLAP_WORDS = 30
+# Short JSON records (one species, one statute clause) are packed together up to this size
+CHUNK_MIN_WORDS = 40
+
+# Risk type of sources whose rows do not say; matched against the file name
+_SOURCE_RISK_TYPES = (
+    ("invasive", "invasive"),
+    ("iucn", "iucn"),
+    ("redlist", "iucn"),
+    ("freshwater", "freshwater"),
+    ("58_10a", "freshwater"),  # NJ Water Pollution Control Act
+    ("marine", "marine"),
+    ("terrestrial", "terrestrial"),
+)
+
+# Table-of-contents dot leaders and page numbers in the PDF-derived JSON
+_LEADER = re.compile(r"\s*\.{4,}\s*\d*\s*$")
+
+
+def _column(fieldnames, *candidates, contains=None):
+    normalized = {name.strip().lower().replace(" ", "_"): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    if contains:
+        for key, name in normalized.items():
+            if contains in key:
+                return name
+    return None
+
+
+def source_risk_type(filename):
+    name = filename.lower()
+    for marker, risk_type in _SOURCE_RISK_TYPES:
+        if marker in name:
+            return risk_type
+    return ""
+
+
+def chunk_id(text, metadata):
+    key = f"{metadata.get('risk_type', '')}\x1f{metadata.get('threat_level', '')}\x1f{text}"
+    return "chunk-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def split_words(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP_WORDS):
+    """Overlapping windows of at most size words."""
+    words = text.split()
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    step = max(size - overlap, 1)
+    return [" ".join(words[start:start + size]) for start in range(0, len(words) - overlap, step)]
+
+
+def _clean(value):
+    return _LEADER.sub("", " ".join(str(value).split()))
+
+
+def csv_chunks(path):
+    filename = os.path.basename(path)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        risk_col = _column(fields, "risk_type")
+        level_col = _column(fields, "threat_level")
+        action_col = _column(fields, "mitigation_action", "mitigation_actions", "action", contains="action")
+        description_col = _column(fields, "description")
+        reference_col = _column(fields, "source", "regulation_reference", contains="reference")
+        if action_col is None:
+            return []
+        for row in reader:
+            action = _clean(row.get(action_col) or "")
+            if not action:
+                continue
+            description = _clean(row.get(description_col) or "") if description_col else ""
+            metadata = {
+                "source": filename,
+                "risk_type": canonical_risk_type(row.get(risk_col)) if risk_col else source_risk_type(filename),
+                "threat_level": canonical_threat_level(row.get(level_col)) if level_col else "",
+                "reference": _clean(row.get(reference_col) or "") if reference_col else "",
+            }
+            text = f"{description}: {action}" if description else action
+            for piece in split_words(text):
+                yield {"id": chunk_id(piece, metadata), "text": piece, "metadata": metadata}
+
+
+def _flatten(value, heading):
+    """(heading, text) lines for every non-empty leaf under value."""
+    if isinstance(value, dict):
+        for key, child in value.items():
+            label = str(key).replace("_", " ")
+            yield from _flatten(child, f"{heading} / {label}" if heading else label)
+    elif isinstance(value, list):
+        for child in value:
+            yield from _flatten(child, heading)
+    elif value not in (None, ""):
+        text = _clean(value)
+        if text:
+            yield heading, text
+
+
+def _records(document):
+    """Split a JSON document into records: list items, or the top-level sections of a dict."""
+    if isinstance(document, list):
+        return [("", item) for item in document]
+    if isinstance(document, dict) and len(document) == 1:
+        ((key, inner),) = document.items()
+        if isinstance(inner, dict):
+            return [(str(key).replace("_", " "), inner)]
+    if isinstance(document, dict):
+        return list(document.items()) if len(document) > 1 else [("", document)]
+    return [("", document)]
+
+
+def json_chunks(path):
+    filename = os.path.basename(path)
+    with open(path, encoding="utf-8") as f:
+        document = json.load(f)
+    metadata = {"source": filename, "risk_type": source_risk_type(filename), "threat_level": "", "reference": ""}
+
+    def pieces():
+        buffer, seen = [], set()
+        for heading, record in _records(document):
+            heading = str(heading).replace("_", " ")
+            text = " ".join(f"{label}: {text}" if label else text for label, text in _flatten(record, heading))
+            # Repeated records (the species controls list has many) add nothing to the index
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            words = text.split()
+            if len(buffer) + len(words) > CHUNK_WORDS and buffer:
+                yield " ".join(buffer)
+                buffer = []
+            if len(words) > CHUNK_WORDS:
+                yield from split_words(" ".join(words))
+                continue
+            buffer.extend(words)
+            if len(buffer) >= CHUNK_MIN_WORDS:
+                yield " ".join(buffer)
+                buffer = []
+        if buffer:
+            yield " ".join(buffer)
+
+    for piece in pieces():
+        yield {"id": chunk_id(piece, metadata), "text": piece, "metadata": dict(metadata)}
+
+
+def load_knowledge_chunks(directory):
+    """Deduplicated chunks from every CSV and JSON file in directory (other files are skipped)."""
+    chunks, seen = [], set()
+    for filename in sorted(os.listdir(directory)):
+        path = os.path.join(directory, filename)
+        if filename.lower().endswith(".csv"):
+            source = csv_chunks(path)
+        elif filename.lower().endswith(".json"):
+            source = json_chunks(path)
+        else:
+            continue
+        for chunk in source:
+            if chunk["id"] not in seen:
+                seen.add(chunk["id"])
+                chunks.append(chunk)
+    return chunks
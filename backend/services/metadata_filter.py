@@ -0,0 +1,45 @@
+"""
+ChromaDB-style metadata ``where`` filters evaluated in Python.
+
+Shared by the in-process vector store and the BM25 index, and free of
+numpy so the lexical search path does not need it.
+"""
+
+
+def _equal(value, operand):
+    # ChromaDB stores booleans apart from numbers, so True never matches 1
+    return isinstance(value, bool) == isinstance(operand, bool) and value == operand
+
+
+def _condition_matches(value, condition):
+    """One field's condition; a missing field (None) fails $eq/$in and passes $ne/$nin, as in ChromaDB."""
+    if not isinstance(condition, dict):
+        return _equal(value, condition)
+    for operator, operand in condition.items():
+        if operator == "$eq" and not _equal(value, operand):
+            return False
+        if operator == "$ne" and _equal(value, operand):
+            return False
+        if operator == "$in" and not any(_equal(value, item) for item in operand):
+            return False
+        if operator == "$nin" and any(_equal(value, item) for item in operand):
+            return False
+        if operator not in ("$eq", "$ne", "$in", "$nin"):
+            raise ValueError(f"Unsupported metadata operator {operator}")
+    return True
+
+
+def matches_where(metadata, where):
+    """ChromaDB-style metadata filter: field conditions combined with $and / $or."""
+    if not where:
+        return True
+    for field, condition in where.items():
+        if field == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif field == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif not _condition_matches(metadata.get(field), condition):
+            return False
+    return True
@@ -0,0 +1,46 @@
+"""
+Canonical (risk_type, threat_level) keys for the mitigation knowledge base.
+
+The ingest script stores these values as ChromaDB metadata and
+query_mitigation_action() looks them up with the same functions, so
+"Freshwater Risk" / "High Risk" at query time and "freshwater" / "high"
+in the CSV meet on one exact key instead of falling through to an
+embedding search.
+"""
+
+# Display names used by the apps -> risk_type values in the knowledge base CSVs
+_RISK_TYPE_ALIASES = {
+    "invasive species": "invasive",
+    "invasive": "invasive",
+    "iucn": "iucn",
+    "iucn red list": "iucn",
+    "freshwater risk": "freshwater",
+    "freshwater": "freshwater",
+    "marine risk": "marine",
+    "marine hci": "marine",
+    "marine": "marine",
+    "terrestrial risk": "terrestrial",
+    "terrestrial": "terrestrial",
+}
+
+_THREAT_LEVEL_ALIASES = {
+    "medium": "moderate",
+}
+
+
+def canonical_risk_type(risk_type):
+    """'Freshwater Risk', ' freshwater ' -> 'freshwater'; unknown types are just lower-cased."""
+    value = " ".join(str(risk_type or "").lower().replace("_", " ").split())
+    return _RISK_TYPE_ALIASES.get(value, value)
+
+
+def canonical_threat_level(threat_level):
+    """'High', 'High Risk', 'medium' -> 'high', 'high', 'moderate'."""
+    value = " ".join(str(threat_level or "").lower().split())
+    if value.endswith(" risk"):
+        value = value[:-len(" risk")]
+    return _THREAT_LEVEL_ALIASES.get(value, value)
+
+
+def mitigation_key(risk_type, threat_level):
+    return canonical_risk_type(risk_type), canonical_threat_level(threat_level)
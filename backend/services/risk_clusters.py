@@ -0,0 +1,131 @@
+"""
+Precomputed multi-resolution cluster aggregates for the risk map.
+
+Every risk point is counted into a grid cell at its finest zoom level and the
+cells are then merged 2x2 into their parents, all the way up to zoom 0. A map
+request only reads the cells of one level inside the viewport, so the payload
+depends on the viewport size in pixels, not on how many points it covers.
+"""
+import math
+import threading
+
+# 256px tiles split into 4x4 cells gives roughly 64px between cluster centres
+CELLS_PER_TILE = 4
+DEFAULT_MAX_ZOOM = 14
+# Upper bound on cells read per request (a 1920x1080 viewport is ~30x17 cells)
+DEFAULT_MAX_CELLS = 2000
+
+# Tie-breaker for the dominant threat_code: the more severe code wins
+THREAT_SEVERITY = {"high": 3, "moderate": 2, "medium": 2, "low": 1}
+
+
+def _summarize(count, sum_lat, sum_lon, threats):
+    dominant = max(threats.items(), key=lambda item: (item[1], THREAT_SEVERITY.get(str(item[0]).lower(), 0)))[0]
+    return (count, round(sum_lat / count, 6), round(sum_lon / count, 6), dominant)
+
+
+class RiskClusterPyramid:
+    """Cluster counts, centroids and dominant threat_code for zoom levels 0..max_zoom."""
+
+    def __init__(self, max_zoom=DEFAULT_MAX_ZOOM, cells_per_tile=CELLS_PER_TILE, version=None):
+        self.max_zoom = max_zoom
+        self.cells_per_tile = cells_per_tile
+        self.version = version  # dataset version the points were read at, if known
+        self.levels = {}  # zoom -> {(cell_lat, cell_lon): (count, lat, lon, threat_code)}
+        self.points = 0
+        self._finest = {}  # cell -> [count, sum_lat, sum_lon, {threat_code: count}] until build()
+        self._lock = threading.Lock()
+
+    def cell_size(self, zoom):
+        """Cell edge in degrees at a zoom level (Web Mercator tiles are 360 / 2**zoom degrees wide)."""
+        return 360.0 / (2 ** zoom * self.cells_per_tile)
+
+    def add(self, lat, lon, threat_code):
+        size = self.cell_size(self.max_zoom)
+        cell = (math.floor(lat / size), math.floor(lon / size))
+        aggregate = self._finest.get(cell)
+        if aggregate is None:
+            aggregate = self._finest[cell] = [0, 0.0, 0.0, {}]
+        aggregate[0] += 1
+        aggregate[1] += lat
+        aggregate[2] += lon
+        aggregate[3][threat_code] = aggregate[3].get(threat_code, 0) + 1
+        self.points += 1
+
+    def build(self):
+        """Summarize the finest level and merge it 2x2 into each coarser level."""
+        level = self._finest
+        levels = {}
+        for zoom in range(self.max_zoom, -1, -1):
+            levels[zoom] = {cell: _summarize(*aggregate) for cell, aggregate in level.items()}
+            if zoom == 0:
+                break
+            parents = {}
+            for (cell_lat, cell_lon), (count, sum_lat, sum_lon, threats) in level.items():
+                # Cells double in size per level, so the parent is the floor-halved index
+                parent = parents.get((cell_lat >> 1, cell_lon >> 1))
+                if parent is None:
+                    parent = parents[(cell_lat >> 1, cell_lon >> 1)] = [0, 0.0, 0.0, {}]
+                parent[0] += count
+                parent[1] += sum_lat
+                parent[2] += sum_lon
+                for threat_code, threat_count in threats.items():
+                    parent[3][threat_code] = parent[3].get(threat_code, 0) + threat_count
+            level = parents
+
+        with self._lock:
+            self.levels = levels
+            self._finest = {}
+        return self
+
+    def _cell_ranges(self, south, west, north, east, zoom):
+        size = self.cell_size(zoom)
+        return (
+            range(math.floor(south / size), math.floor(north / size) + 1),
+            range(math.floor(west / size), math.floor(east / size) + 1),
+        )
+
+    def query(self, south, west, north, east, zoom, max_cells=DEFAULT_MAX_CELLS):
+        """
+        Clusters of the level for zoom whose cells overlap the bounds.
+
+        A viewport spanning more than max_cells cells at that zoom is answered from a
+        coarser level, so the payload stays bounded whatever bounds the client sends.
+
+        Returns:
+            (zoom level actually used, [cluster dicts])
+        """
+        zoom = min(max(int(zoom), 0), self.max_zoom)
+        if not all(math.isfinite(value) for value in (south, west, north, east)):
+            return zoom, []
+        lat_range, lon_range = self._cell_ranges(south, west, north, east, zoom)
+        while zoom > 0 and len(lat_range) * len(lon_range) > max_cells:
+            zoom -= 1
+            lat_range, lon_range = self._cell_ranges(south, west, north, east, zoom)
+        cells = self.levels.get(zoom, {})
+
+        if len(lat_range) * len(lon_range) <= len(cells):
+            matches = (
+                ((cell_lat, cell_lon), cells[(cell_lat, cell_lon)])
+                for cell_lat in lat_range for cell_lon in lon_range
+                if (cell_lat, cell_lon) in cells
+            )
+        else:
+            # Viewport is wider than the data: scanning the level is cheaper than the cell range
+            matches = (
+                (cell, summary) for cell, summary in cells.items()
+                if cell[0] in lat_range and cell[1] in lon_range
+            )
+
+        return zoom, [
+            {"latitude": lat, "longitude": lon, "count": count, "threat_code": threat_code}
+            for _, (count, lat, lon, threat_code) in matches
+        ]
+
+    def stats(self):
+        return {
+            "points": self.points,
+            "version": self.version,
+            "max_zoom": self.max_zoom,
+            "cells_per_level": {zoom: len(cells) for zoom, cells in sorted(self.levels.items())},
+        }
@@ -0,0 +1,136 @@
+"""
+Helpers for querying several risk tables in a single database round trip.
+
+Each layer becomes one parenthesised SELECT that returns ``(layer, row)``,
+where ``row`` is a JSON array of the layer's own columns. The arrays keep
+the exact shape of a plain per-layer SELECT, so the same row builders work
+for both, while UNION ALL only has to reconcile two columns.
+"""
+import base64
+import json
+
+
+def detect_table_columns(cursor, tables):
+    """Return {table: set(column names)} for the tables that exist in the current schema."""
+    cursor.execute("""
+        SELECT table_name, column_name
+        FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = ANY(%s)
+    """, (list(tables),))
+
+    columns = {}
+    for table, column in cursor.fetchall():
+        columns.setdefault(table, set()).add(column)
+    return columns
+
+
+def split_columns(columns):
+    """'x, y, marine_hci' -> ['x', 'y', 'marine_hci']"""
+    return [column.strip() for column in columns.split(",")]
+
+
+def first_supported_variant(variants, available_columns):
+    """Pick the first (columns, ...) variant whose columns all exist, or None."""
+    for variant in variants:
+        if set(split_columns(variant[0])) <= available_columns:
+            return variant
+    return None
+
+
+def _layer_selects(parts, with_ring=False):
+    selects = []
+    params = []
+    for layer_name, table, columns, where_clause, where_params, *extra in parts:
+        extra_sql, extra_params = (extra[0], extra[1]) if with_ring else ("", ())
+        selects.append(
+            f"(SELECT %s::text AS layer, json_build_array({columns}) AS row{extra_sql} FROM {table} {where_clause})"
+        )
+        params.append(layer_name)
+        params.extend(extra_params)
+        params.extend(where_params)
+    return "\nUNION ALL\n".join(selects), params
+
+
+def build_union_query(parts):
+    """
+    Combine per-layer selects into one UNION ALL statement.
+
+    Parameters:
+        parts: iterable of (layer_name, table, columns, where_clause, where_params).
+               where_clause may include ORDER BY / LIMIT; it only applies to its own layer.
+
+    Returns:
+        (sql, params) ready for cursor.execute. Rows come back as (layer_name, [values...]).
+    """
+    return _layer_selects(parts)
+
+
+def ring_expression(lat_column, lon_column, lat, lon):
+    """Chebyshev distance in degrees - the smallest square radius that still contains the row."""
+    return f", GREATEST(ABS({lat_column} - %s), ABS({lon_column} - %s)) AS ring", (lat, lon)
+
+
+def build_adaptive_radius_query(parts, radii):
+    """
+    One UNION ALL at the widest radius, trimmed server-side to the smallest radius that has rows.
+
+    Gives the same rows as querying each radius in turn until something is found, in one
+    round trip and without shipping the rows of the wider rings.
+
+    Parameters:
+        parts: iterable of (layer_name, table, columns, where_clause, where_params,
+               ring_sql, ring_params) where where_clause selects the widest radius and
+               ring_sql/ring_params come from ring_expression().
+        radii: candidate square radii in degrees.
+
+    Returns:
+        (sql, params) ready for cursor.execute. Rows come back as (layer_name, [values...]).
+    """
+    union_sql, params = _layer_selects(parts, with_ring=True)
+    sql = f"""
+        WITH candidates AS (
+            {union_sql}
+        )
+        SELECT layer, row FROM candidates
+        WHERE ring <= (
+            SELECT MIN(radius) FROM unnest(%s::float8[]) AS radius
+            WHERE radius >= (SELECT MIN(ring) FROM candidates)
+        )
+    """
+    return sql, params + [list(radii)]
+
+
+def trim_to_smallest_radius(risks, lat, lon, radii):
+    """Python twin of build_adaptive_radius_query for risk records that are already in memory."""
+    rings = [max(abs(risk["latitude"] - lat), abs(risk["longitude"] - lon)) for risk in risks]
+    for radius in sorted(radii):
+        within = [risk for risk, ring in zip(risks, rings) if ring <= radius]
+        if within:
+            return within
+    return []
+
+
+def group_rows_by_layer(rows):
+    """Split (layer_name, row) results back into {layer_name: [row, ...]}."""
+    grouped = {}
+    for layer_name, row in rows:
+        grouped.setdefault(layer_name, []).append(row)
+    return grouped
+
+
+def encode_page_cursor(state):
+    """Opaque, URL-safe token for a JSON-serialisable pagination state."""
+    payload = json.dumps(state, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_page_cursor(token):
+    """Inverse of encode_page_cursor; raises ValueError for anything it did not produce."""
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        state = json.loads(payload)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"malformed cursor: {e}")
+    if not isinstance(state, dict):
+        raise ValueError("malformed cursor")
+    return state
@@ -0,0 +1,75 @@
+"""
+In-process LRU cache for /search results.
+
+Keys are (quantized lat, quantized lon, radius, layers, dataset version):
+nearby searches for the same area (e.g. the same ZIP centroid) share an
+entry, and a loader rewriting any risk table moves the dataset version on,
+so stale entries are never hit again and simply age out of the LRU.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SEARCH_CACHE_ENABLED = os.getenv('SEARCH_CACHE_ENABLED', 'true').lower() == 'true'
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 1024))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv('SEARCH_CACHE_TTL_SECONDS', 3600))
+# Degrees; 0.001 is ~100 m, well inside the 0.1 degree search squares
+SEARCH_CACHE_PRECISION = float(os.getenv('SEARCH_CACHE_PRECISION', 0.001))
+
+
+class SearchResultCache:
+    """Thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL_SECONDS,
+                 precision=SEARCH_CACHE_PRECISION):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.precision = precision
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def quantize(self, lat, lon):
+        """Snap a point to the cache grid; query at the snapped point so the entry is exact for its key."""
+        return (round(round(lat / self.precision) * self.precision, 6),
+                round(round(lon / self.precision) * self.precision, 6))
+
+    def key(self, lat, lon, radius, layers, dataset_version):
+        lat, lon = self.quantize(lat, lon)
+        return (lat, lon, radius, tuple(layers), dataset_version)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            expires_at, value = entry
+            if now >= expires_at:
+                del self._entries[key]
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({"size": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl})
+        return stats
@@ -0,0 +1,207 @@
+"""
+In-memory uniform-grid index over the biodiversity risk tables.
+
+Each table is held as a column store (``array('d')`` for numeric columns,
+de-duplicated lists for text columns) sorted by grid cell, so a square
+radius query only touches the handful of cells that overlap it.
+"""
+import math
+import threading
+from array import array
+from numbers import Number
+
+DEFAULT_CELL_SIZE = 0.1  # degrees, matches the smallest /search radius
+
+_MISSING = float("nan")
+
+
+def _cell_of(lat, lon, cell_size):
+    return (math.floor(lat / cell_size), math.floor(lon / cell_size))
+
+
+class GridLayer:
+    """One risk table bucketed into cell_size x cell_size degree cells."""
+
+    def __init__(self, rows, lat_index, lon_index, cell_size=DEFAULT_CELL_SIZE):
+        self.lat_index = lat_index
+        self.lon_index = lon_index
+        self.cell_size = cell_size
+        self.cells = {}
+        self.cell_bounds = None  # (min lat cell, max lat cell, min lon cell, max lon cell) of populated cells
+        self.columns = []
+        self.numeric = []
+        self._build(rows)
+
+    def _build(self, rows):
+        # Columns start as array('d') and only become lists when a non-numeric value shows up,
+        # so a large layer streams from the cursor straight into its compact form
+        columns = interned = None
+        cell_lats, cell_lons = array("l"), array("l")
+        for row in rows:
+            lat, lon = row[self.lat_index], row[self.lon_index]
+            if lat is None or lon is None:
+                continue  # can never match a radius predicate in SQL either
+            if columns is None:
+                columns = [array("d") for _ in row]
+                interned = [None] * len(row)
+            for position, value in enumerate(row):
+                column = columns[position]
+                if interned[position] is None:
+                    if value is None:
+                        column.append(_MISSING)
+                        continue
+                    if isinstance(value, Number) and not isinstance(value, bool):
+                        column.append(float(value))
+                        continue
+                    # First text value: the column becomes a list, with NaN turned back into None
+                    column = columns[position] = [None if v != v else v for v in column]
+                    interned[position] = {}
+                column.append(interned[position].setdefault(value, value))
+            cell_lat, cell_lon = _cell_of(float(lat), float(lon), self.cell_size)
+            cell_lats.append(cell_lat)
+            cell_lons.append(cell_lon)
+
+        if columns is None:
+            return
+
+        # Counting pass per cell, then a stable placement: rows keep table order within a cell
+        counts = {}
+        for cell in zip(cell_lats, cell_lons):
+            counts[cell] = counts.get(cell, 0) + 1
+        offsets, start = {}, 0
+        for cell in sorted(counts):
+            offsets[cell] = start
+            self.cells[cell] = (start, start + counts[cell])
+            start += counts[cell]
+        del counts
+        order = array("q", bytes(8 * len(cell_lats)))
+        for i, cell in enumerate(zip(cell_lats, cell_lons)):
+            order[offsets[cell]] = i
+            offsets[cell] += 1
+        del offsets, cell_lats, cell_lons
+
+        # Gather one column at a time, so only one unsorted column is alive next to its sorted copy
+        for position, column in enumerate(columns):
+            is_numeric = interned[position] is None
+            columns[position] = None
+            self.columns.append(array("d", (column[i] for i in order)) if is_numeric else [column[i] for i in order])
+            self.numeric.append(is_numeric)
+            del column
+
+        min_lat_cell = min(cell[0] for cell in self.cells)
+        max_lat_cell = max(cell[0] for cell in self.cells)
+        min_lon_cell = min(cell[1] for cell in self.cells)
+        max_lon_cell = max(cell[1] for cell in self.cells)
+        self.cell_bounds = (min_lat_cell, max_lat_cell, min_lon_cell, max_lon_cell)
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def _row(self, i):
+        values = []
+        for column, is_numeric in zip(self.columns, self.numeric):
+            value = column[i]
+            if is_numeric and value != value:  # NaN marks a NULL
+                value = None
+            values.append(value)
+        return tuple(values)
+
+    def query(self, lat, lon, radius):
+        """Return raw rows with ABS(lat - row_lat) <= radius AND ABS(lon - row_lon) <= radius."""
+        if not self.columns or not all(math.isfinite(v) for v in (lat, lon, radius)):
+            return []
+
+        lats = self.columns[self.lat_index]
+        lons = self.columns[self.lon_index]
+        # Clamp the square to the populated extent so a huge radius costs no more than a full scan
+        min_lat_cell, max_lat_cell, min_lon_cell, max_lon_cell = self.cell_bounds
+        south = max(lat - radius, min_lat_cell * self.cell_size)
+        north = min(lat + radius, (max_lat_cell + 1) * self.cell_size)
+        west = max(lon - radius, min_lon_cell * self.cell_size)
+        east = min(lon + radius, (max_lon_cell + 1) * self.cell_size)
+        if south > north or west > east:
+            return []
+        min_cell = _cell_of(south, west, self.cell_size)
+        max_cell = _cell_of(north, east, self.cell_size)
+
+        if (max_cell[0] - min_cell[0] + 1) * (max_cell[1] - min_cell[1] + 1) > len(self.cells):
+            # Wider than the layer is dense: walk the populated cells (kept in key order) instead
+            spans = [span for (cell_lat, cell_lon), span in self.cells.items()
+                     if min_cell[0] <= cell_lat <= max_cell[0] and min_cell[1] <= cell_lon <= max_cell[1]]
+        else:
+            spans = [self.cells[cell] for cell in (
+                (cell_lat, cell_lon)
+                for cell_lat in range(min_cell[0], max_cell[0] + 1)
+                for cell_lon in range(min_cell[1], max_cell[1] + 1)
+            ) if cell in self.cells]
+
+        rows = []
+        for span in spans:
+            for i in range(*span):
+                if abs(lats[i] - lat) <= radius and abs(lons[i] - lon) <= radius:
+                    rows.append(self._row(i))
+        return rows
+
+
+class RiskGridIndex:
+    """Grid layers for every risk table plus the builder that turns a row into a risk record."""
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE, version=None):
+        self.cell_size = cell_size
+        self.version = version  # dataset version the rows were read at, if known
+        self.layers = {}
+        self.failed_layers = []
+        self._lock = threading.Lock()
+
+    def add_layer(self, name, rows, lat_index, lon_index, build_record):
+        layer = GridLayer(rows, lat_index, lon_index, self.cell_size)
+        with self._lock:
+            self.layers[name] = (layer, build_record)
+        return layer
+
+    def query_layer(self, name, lat, lon, radius):
+        """Risk records from one layer."""
+        layer, build_record = self.layers[name]
+        return [build_record(row, lat, lon) for row in layer.query(lat, lon, radius)]
+
+    def query(self, lat, lon, radius):
+        """Return risk records from every layer, in layer registration order."""
+        records = []
+        for layer, build_record in list(self.layers.values()):
+            records.extend(build_record(row, lat, lon) for row in layer.query(lat, lon, radius))
+        return records
+
+    def query_adaptive(self, lat, lon, radii):
+        """
+        Query at the widest radius and keep only the smallest radius that has any rows.
+
+        Same result as calling query() for each radius in turn until one is non-empty.
+        """
+        widest = max(radii)
+        matches = []
+        nearest_ring = None
+        for layer, build_record in list(self.layers.values()):
+            rows = layer.query(lat, lon, widest)
+            rings = [
+                max(abs(row[layer.lat_index] - lat), abs(row[layer.lon_index] - lon)) for row in rows
+            ]
+            if rings:
+                nearest_ring = min(rings) if nearest_ring is None else min(nearest_ring, min(rings))
+            matches.append((build_record, rows, rings))
+
+        if nearest_ring is None:
+            return []
+
+        radius = min(r for r in radii if r >= nearest_ring)
+        records = []
+        for build_record, rows, rings in matches:
+            records.extend(build_record(row, lat, lon) for row, ring in zip(rows, rings) if ring <= radius)
+        return records
+
+    def stats(self):
+        return {
+            "cell_size": self.cell_size,
+            "version": self.version,
+            "layers": {name: len(layer) for name, (layer, _) in self.layers.items()},
+            "failed_layers": list(self.failed_layers),
+        }
@@ -0,0 +1,173 @@
+"""
+In-process vector store for small collections such as the mitigation knowledge base.
+
+The collection lives in two files:
+
+    <name>.<generation>.embeddings.npy   float32 (rows, dim), L2-normalized
+    <name>.json                          ids, documents, metadatas, the embedding model
+                                         name and the generation of its embeddings file
+
+and NumpyVectorStore mirrors the slice of the ChromaDB collection API the app
+uses (get / query / upsert / delete / count), including metadata ``where``
+filters, so mitigation_action.py can switch backends by configuration.
+Top-k is one matrix-vector product per query; distances are squared L2,
+ChromaDB's default, which for unit vectors is 2 - 2 * cosine similarity.
+
+Each save writes a new embeddings file under a fresh generation and then swaps
+the JSON in with one rename, so a reader always gets matching files.
+"""
+import json
+import os
+import re
+import uuid
+
+import numpy as np
+
+from services.metadata_filter import matches_where
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class NumpyVectorStore:
+    """A ChromaDB-compatible collection held in memory and saved as .npy + JSON."""
+
+    def __init__(self, directory, name, model=None):
+        self.directory = directory
+        self.name = name
+        self.model = model
+        self.ids, self.documents, self.metadatas = [], [], []
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+
+    def _embeddings_path(self, generation=None):
+        # Stores saved before generations existed have a single <name>.embeddings.npy
+        suffix = f".{generation}" if generation else ""
+        return os.path.join(self.directory, f"{self.name}{suffix}.embeddings.npy")
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.directory, f"{self.name}.json")
+
+    @classmethod
+    def load(cls, directory, name):
+        """Open a saved store; raises OSError if it has not been built."""
+        store = cls(directory, name)
+        for attempt in range(2):
+            with open(store._meta_path) as f:
+                meta = json.load(f)
+            try:
+                store.embeddings = np.load(store._embeddings_path(meta.get("generation")))
+                break
+            except FileNotFoundError:
+                # A concurrent save replaced the JSON and removed this generation; read the new one
+                if attempt:
+                    raise
+        store.model = meta.get("model")
+        store.ids, store.documents, store.metadatas = meta["ids"], meta["documents"], meta["metadatas"]
+        if len(store.ids) != len(store.embeddings):
+            raise ValueError(f"{name}: {len(store.ids)} ids but {len(store.embeddings)} embeddings")
+        return store
+
+    @classmethod
+    def open_or_create(cls, directory, name, model=None):
+        try:
+            return cls.load(directory, name)
+        except OSError:
+            return cls(directory, name, model)
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        generation = uuid.uuid4().hex[:12]
+        embeddings_path = self._embeddings_path(generation)
+        with open(embeddings_path + ".tmp", "wb") as f:
+            np.save(f, self.embeddings)
+        os.replace(embeddings_path + ".tmp", embeddings_path)
+        with open(self._meta_path + ".tmp", "w") as f:
+            json.dump({"model": self.model, "generation": generation, "ids": self.ids,
+                       "documents": self.documents, "metadatas": self.metadatas}, f)
+        # The only rename readers can observe: the new JSON names the embeddings file written above
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+
+        previous = re.compile(rf"{re.escape(self.name)}(\.[0-9a-f]{{12}})?\.embeddings\.npy")
+        for filename in os.listdir(self.directory):
+            if previous.fullmatch(filename) and filename != os.path.basename(embeddings_path):
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def count(self):
+        return len(self.ids)
+
+    def _rows(self, where=None, ids=None):
+        wanted = set(ids) if ids is not None else None
+        return [i for i in range(len(self.ids))
+                if (wanted is None or self.ids[i] in wanted) and matches_where(self.metadatas[i], where)]
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        rows = self._rows(where, ids)
+        result = {"ids": [self.ids[i] for i in rows]}
+        if "documents" in include:
+            result["documents"] = [self.documents[i] for i in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self.metadatas[i] for i in rows]
+        return result
+
+    def query(self, query_embeddings, n_results=10, where=None, include=("documents", "distances")):
+        """Top n_results rows per query embedding, closest first."""
+        rows = np.array(self._rows(where), dtype=np.int64)
+        result = {key: [] for key in ("ids", "documents", "metadatas", "distances") if key == "ids" or key in include}
+        queries = _normalize(query_embeddings)
+        if len(rows) == 0:
+            for values in result.values():
+                values.extend([] for _ in queries)
+            return result
+
+        similarities = queries @ self.embeddings[rows].T
+        k = min(n_results, len(rows))
+        for scores in similarities:
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(rows) else np.arange(len(rows))
+            top = top[np.argsort(-scores[top])]
+            picked = rows[top]
+            result["ids"].append([self.ids[i] for i in picked])
+            if "documents" in result:
+                result["documents"].append([self.documents[i] for i in picked])
+            if "metadatas" in result:
+                result["metadatas"].append([self.metadatas[i] for i in picked])
+            if "distances" in result:
+                result["distances"].append([float(2.0 - 2.0 * s) for s in scores[top]])
+        return result
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        vectors = _normalize(embeddings)
+        if self.embeddings.size == 0:
+            self.embeddings = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        position = {row_id: i for i, row_id in enumerate(self.ids)}
+        appended = []
+        for row_id, document, metadata, vector in zip(ids, documents, metadatas, vectors):
+            if row_id in position:
+                i = position[row_id]
+                self.documents[i], self.metadatas[i] = document, metadata
+                self.embeddings[i] = vector
+            else:
+                position[row_id] = len(self.ids)
+                self.ids.append(row_id)
+                self.documents.append(document)
+                self.metadatas.append(metadata)
+                appended.append(vector)
+        if appended:
+            self.embeddings = np.vstack([self.embeddings, np.stack(appended)])
+
+    def delete(self, ids):
+        drop = set(ids)
+        keep = [i for i, row_id in enumerate(self.ids) if row_id not in drop]
+        self.ids = [self.ids[i] for i in keep]
+        self.documents = [self.documents[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self.embeddings = self.embeddings[keep] if self.embeddings.size else self.embeddings
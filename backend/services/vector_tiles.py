@@ -0,0 +1,189 @@
+"""
+Mapbox Vector Tile (MVT) encoding for the point risk layers, plus a disk cache.
+
+Only what point layers need from the MVT 2.1 spec is implemented, so tiles are
+built without protobuf or PostGIS. Tiles are cached on disk under the dataset
+version they were built from; a new version simply starts a new directory.
+"""
+import math
+import os
+import shutil
+import struct
+import tempfile
+
+DEFAULT_EXTENT = 4096
+# Extra tile units around each tile so markers on an edge are not clipped by the neighbour
+DEFAULT_BUFFER = 64
+MAX_ZOOM = 22
+
+_POINT = 1
+_MOVE_TO_ONE = (1 & 0x7) | (1 << 3)
+
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) in degrees of Web Mercator tile z/x/y."""
+    n = 2 ** z
+
+    def lat_of(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return lat_of(y + 1), x / n * 360.0 - 180.0, lat_of(y), (x + 1) / n * 360.0 - 180.0
+
+
+def buffered_tile_bounds(z, x, y, extent=DEFAULT_EXTENT, buffer=DEFAULT_BUFFER):
+    """tile_bounds() grown by buffer tile units on every side."""
+    grow = buffer / extent
+    south, west, _, _ = tile_bounds(z, x - grow, y + grow)
+    _, _, north, east = tile_bounds(z, x + grow, y - grow)
+    return south, west, north, east
+
+
+def _tile_position(lat, lon, z, x, y, extent):
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    world_x = (lon + 180.0) / 360.0 * n
+    world_y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return int(round((world_x - x) * extent)), int(round((world_y - y) * extent))
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _length_delimited(field, payload):
+    return _key(field, 2) + _varint(len(payload)) + payload
+
+
+def _packed(field, values):
+    return _length_delimited(field, b"".join(_varint(v) for v in values))
+
+
+def _value(value):
+    """Encode a feature property as an MVT Value message."""
+    if isinstance(value, bool):
+        return _key(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _key(5, 0) + _varint(value)
+        return _key(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _key(3, 1) + struct.pack("<d", value)
+    return _length_delimited(1, str(value).encode("utf-8"))
+
+
+def encode_point_layer(name, features, z, x, y, extent=DEFAULT_EXTENT, buffer=DEFAULT_BUFFER):
+    """
+    Encode one MVT layer of point features.
+
+    Parameters:
+        name: layer name inside the tile.
+        features: iterable of (feature_id, lat, lon, properties dict).
+        z, x, y: the tile being built.
+
+    Returns:
+        The encoded Layer message (without the Tile wrapper).
+    """
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    encoded_features = []
+    occupied = set()
+
+    for feature_id, lat, lon, properties in features:
+        px, py = _tile_position(lat, lon, z, x, y, extent)
+        if not (-buffer <= px < extent + buffer and -buffer <= py < extent + buffer):
+            continue
+        # Points that land on the same tile pixel draw identically; keep the first one
+        if (px, py) in occupied:
+            continue
+        occupied.add((px, py))
+
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags.extend((key_index[key], value_index[value_key]))
+
+        feature = _key(1, 0) + _varint(feature_id)
+        if tags:
+            feature += _packed(2, tags)
+        feature += _key(3, 0) + _varint(_POINT)
+        feature += _packed(4, [_MOVE_TO_ONE, _zigzag(px), _zigzag(py)])
+        encoded_features.append(_length_delimited(2, feature))
+
+    layer = _key(15, 0) + _varint(2) + _length_delimited(1, name.encode("utf-8"))
+    layer += b"".join(encoded_features)
+    layer += b"".join(_length_delimited(3, key.encode("utf-8")) for key in keys)
+    layer += b"".join(_length_delimited(4, _value(value)) for value in values)
+    layer += _key(5, 0) + _varint(extent)
+    return layer
+
+
+def encode_tile(layers):
+    """Wrap encoded layers from encode_point_layer() into a Tile message."""
+    return b"".join(_length_delimited(3, layer) for layer in layers)
+
+
+class TileDiskCache:
+    """Encoded tiles on disk, one directory per dataset version."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, version, layer, z, x, y):
+        return os.path.join(self.root, str(version), layer, str(z), str(x), f"{y}.mvt")
+
+    def get(self, version, layer, z, x, y):
+        try:
+            with open(self._path(version, layer, z, x, y), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, version, layer, z, x, y, tile):
+        path = self._path(version, layer, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so concurrent readers never see half a tile
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(tile)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def prune(self, keep_version):
+        """Delete tiles cached for every other dataset version."""
+        try:
+            entries = os.listdir(self.root)
+        except OSError:
+            return
+        for entry in entries:
+            if entry != str(keep_version):
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
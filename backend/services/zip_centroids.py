@@ -0,0 +1,231 @@
+"""
+Bundled table of New Jersey ZIP code centroids.
+
+data/nj_zip_centroids.csv is read into a dict on the first get_zip_centroids()
+call (not at import; call it before forking workers to share the loaded
+table), so resolving a known ZIP is a dict lookup and never leaves the
+process. A k-d tree over the same centroids, built on the first reverse
+lookup, answers point -> nearest ZIP locally. The file carries its own
+version line; regenerate it with build_nj_zip_centroids.py, or point
+NJ_ZIP_CENTROIDS_PATH at another copy.
+Codes missing from the table fall back to Nominatim (through the geocode
+cache), and the answer is remembered for the life of the process.
+"""
+import csv
+import math
+import os
+import threading
+
+NJ_ZIP_CENTROIDS_PATH = os.getenv(
+    'NJ_ZIP_CENTROIDS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nj_zip_centroids.csv")
+)
+
+# New Jersey ZIP codes are 07001-08999
+NJ_ZIP_PREFIXES = ("07", "08")
+
+# Reverse lookups further than this from every centroid return no ZIP; most NJ ZIPs are a few km across
+ZIP_REVERSE_MAX_KM = float(os.getenv('ZIP_REVERSE_MAX_KM', 5))
+
+# New Jersey has roughly 590 ZCTAs. A smaller table (such as a hand-made seed)
+# leaves gaps where the nearest centroid belongs to the wrong town, so reverse
+# lookups are refused below this size.
+NJ_ZIP_MIN_COMPLETE = 400
+
+# Longitude degrees are scaled by cos(latitude) at the middle of the state so
+# squared degree distances rank points like kilometres do across New Jersey
+_LON_SCALE = math.cos(math.radians(40.1))
+_KM_PER_DEGREE = 111.195
+
+_VERSION_PREFIX = "# version:"
+
+
+def is_nj_zip(zipcode):
+    """True for a five-digit code in the New Jersey 07xxx-08xxx range."""
+    return (isinstance(zipcode, str) and len(zipcode) == 5 and zipcode.isdigit()
+            and zipcode.startswith(NJ_ZIP_PREFIXES))
+
+
+def load_zip_centroids(path=NJ_ZIP_CENTROIDS_PATH):
+    """
+    Read a centroid CSV (zip, latitude, longitude, place).
+
+    Returns:
+        (version, {zip: (lat, lon, place)}); version is None if the file has no version line.
+    """
+    version = None
+    centroids = {}
+    with open(path, newline="") as f:
+        lines = []
+        for line in f:
+            if line.startswith("#"):
+                if line.lower().startswith(_VERSION_PREFIX):
+                    version = line[len(_VERSION_PREFIX):].strip()
+                continue
+            lines.append(line)
+    for row in csv.DictReader(lines):
+        zipcode = row["zip"].strip().zfill(5)
+        if not is_nj_zip(zipcode):
+            continue
+        centroids[zipcode] = (float(row["latitude"]), float(row["longitude"]), (row.get("place") or "").strip())
+    return version, centroids
+
+
+class ZipKDTree:
+    """Static 2-d tree over ZIP centroids for nearest-ZIP queries."""
+
+    def __init__(self, centroids):
+        # Each node is (zip, y, x, left, right) with the split axis implied by depth
+        points = [(zipcode, lat, lon * _LON_SCALE) for zipcode, (lat, lon) in centroids.items()]
+        self.size = len(points)
+        self.root = self._build(points, 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = 1 + depth % 2
+        points.sort(key=lambda point: point[axis])
+        middle = len(points) // 2
+        zipcode, y, x = points[middle]
+        return (zipcode, y, x,
+                self._build(points[:middle], depth + 1),
+                self._build(points[middle + 1:], depth + 1))
+
+    def nearest(self, lat, lon):
+        """(zip, distance in km) of the closest centroid, or None for an empty tree."""
+        if self.root is None:
+            return None
+        target = (lat, lon * _LON_SCALE)
+        best = [None, float("inf")]
+
+        def visit(node, depth):
+            zipcode, y, x, left, right = node
+            distance = (y - target[0]) ** 2 + (x - target[1]) ** 2
+            if distance < best[1]:
+                best[0], best[1] = zipcode, distance
+            delta = target[depth % 2] - (y, x)[depth % 2]
+            near, far = (left, right) if delta < 0 else (right, left)
+            if near is not None:
+                visit(near, depth + 1)
+            # Only cross the split line if it is closer than the best match so far
+            if far is not None and delta * delta < best[1]:
+                visit(far, depth + 1)
+
+        visit(self.root, 0)
+        return best[0], math.sqrt(best[1]) * _KM_PER_DEGREE
+
+
+class ZipCentroidTable:
+    """The bundled centroids plus ZIPs learned from the network during this process."""
+
+    def __init__(self, path=NJ_ZIP_CENTROIDS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._learned = {}
+        self._stats = {"hits": 0, "learned_hits": 0, "misses": 0}
+        try:
+            self.version, self._centroids = load_zip_centroids(path)
+            print(f"📮 Loaded {len(self._centroids)} NJ ZIP centroids (version {self.version})")
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️ Could not load NJ ZIP centroids from {path}: {e}")
+            self.version, self._centroids = None, {}
+        self._tree = None
+        self._reverse_stats = {"reverse_hits": 0, "reverse_misses": 0, "reverse_refused": 0}
+
+    @property
+    def complete(self):
+        """True when the bundled table covers the state well enough for reverse lookups."""
+        return len(self._centroids) >= NJ_ZIP_MIN_COMPLETE
+
+    def __contains__(self, zipcode):
+        return zipcode in self._centroids or zipcode in self._learned
+
+    def lookup(self, zipcode):
+        """(lat, lon) for a known ZIP, or None."""
+        entry = self._centroids.get(zipcode)
+        with self._lock:
+            if entry is not None:
+                self._stats["hits"] += 1
+                return entry[0], entry[1]
+            learned = self._learned.get(zipcode)
+            self._stats["learned_hits" if learned else "misses"] += 1
+            return learned
+
+    def remember(self, zipcode, lat, lon):
+        """Keep a network-resolved NJ ZIP so the next lookup stays local."""
+        if is_nj_zip(zipcode):
+            with self._lock:
+                self._learned[zipcode] = (lat, lon)
+
+    def nearest_zip(self, lat, lon, max_km=ZIP_REVERSE_MAX_KM):
+        """
+        The ZIP whose centroid is closest to the point, or None if none is within max_km.
+
+        Always None for an incomplete table: a wrong ZIP label is worse than none.
+        """
+        if not self.complete:
+            with self._lock:
+                self._reverse_stats["reverse_refused"] += 1
+            return None
+        with self._lock:
+            tree = self._tree
+            if tree is None:
+                # Bundled centroids only: learned codes may be PO box ZIPs with no area of their own
+                tree = self._tree = ZipKDTree({zipcode: entry[:2] for zipcode, entry in self._centroids.items()})
+        match = tree.nearest(lat, lon)
+        found = match is not None and match[1] <= max_km
+        with self._lock:
+            self._reverse_stats["reverse_hits" if found else "reverse_misses"] += 1
+        return match[0] if found else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(self._reverse_stats)
+            stats.update({
+                "version": self.version,
+                "bundled": len(self._centroids),
+                "complete": self.complete,
+                "learned": len(self._learned),
+                "path": self.path,
+            })
+        return stats
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_zip_centroids():
+    """The process-wide table at NJ_ZIP_CENTROIDS_PATH."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = ZipCentroidTable()
+    return _table
+
+
+def nearest_zip(lat, lon, max_km=ZIP_REVERSE_MAX_KM):
+    """Reverse-geocode a point to the nearest NJ ZIP without any network call."""
+    return get_zip_centroids().nearest_zip(lat, lon, max_km)
+
+
+def resolve_zip(zipcode, geocode=None):
+    """
+    Centroid of a ZIP: bundled table first, then geocode(zipcode) for unknown codes.
+
+    Parameters:
+        geocode: optional callable returning (lat, lon) or None; only called on a miss.
+
+    Returns:
+        (lat, lon), or None if neither the table nor the fallback knows the code.
+    """
+    table = get_zip_centroids()
+    point = table.lookup(zipcode)
+    if point is not None or geocode is None:
+        return point
+    point = geocode(zipcode)
+    if point is not None:
+        table.remember(zipcode, *point)
+    return point
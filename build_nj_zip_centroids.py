@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Build backend/services/data/nj_zip_centroids.csv from the Census ZCTA gazetteer.
+
+Download the national ZCTA gazetteer file (e.g. 2020_Gaz_zcta_national.txt from
+https://www.census.gov/geographies/reference-files/time-series/geo/gazetteer-files.html)
+and run:
+
+    python build_nj_zip_centroids.py 2020_Gaz_zcta_national.txt [--version 2020]
+
+Without access to census.gov, --zipcodes-package builds the table from the
+`zipcodes` PyPI package instead (pip install zipcodes; coordinates from
+GeoNames, CC BY 4.0). Only its active STANDARD codes are kept, which roughly
+matches the ZCTA set: PO box and single-organization ZIPs have no area of
+their own and would mislabel reverse lookups.
+
+Only 07xxx-08xxx codes are kept; existing place names are carried over.
+"""
+import argparse
+import csv
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from services.zip_centroids import NJ_ZIP_CENTROIDS_PATH, is_nj_zip, load_zip_centroids
+
+
+def read_gazetteer(path):
+    """{zip: (lat, lon)} for the NJ rows of a tab-separated gazetteer file."""
+    centroids = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter="\t")
+        header = [name.strip() for name in next(reader)]
+        geoid, lat, lon = header.index("GEOID"), header.index("INTPTLAT"), header.index("INTPTLONG")
+        for row in reader:
+            zipcode = row[geoid].strip()
+            if is_nj_zip(zipcode):
+                centroids[zipcode] = (round(float(row[lat]), 6), round(float(row[lon]), 6))
+    return centroids
+
+
+def read_zipcodes_package():
+    """({zip: (lat, lon)}, {zip: city}, version) for the active standard NJ ZIPs of the zipcodes package."""
+    try:
+        import zipcodes
+    except ImportError:
+        print("❌ The zipcodes package is not installed (pip install zipcodes)")
+        sys.exit(1)
+    centroids, places = {}, {}
+    for record in zipcodes.filter_by(state="NJ", zip_code_type="STANDARD", active=True):
+        zipcode = record["zip_code"]
+        if is_nj_zip(zipcode) and record.get("lat") and record.get("long"):
+            centroids[zipcode] = (round(float(record["lat"]), 6), round(float(record["long"]), 6))
+            places[zipcode] = record.get("city") or ""
+    return centroids, places, f"zipcodes-{getattr(zipcodes, '__version__', 'unknown')}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("gazetteer", nargs="?", help="Census ZCTA gazetteer .txt file")
+    parser.add_argument("--zipcodes-package", action="store_true",
+                        help="read the zipcodes PyPI package instead of a gazetteer file")
+    parser.add_argument("--version", default=None, help="version stamp written to the table")
+    parser.add_argument("--out", default=NJ_ZIP_CENTROIDS_PATH)
+    args = parser.parse_args()
+
+    if args.zipcodes_package:
+        centroids, source_places, source_version = read_zipcodes_package()
+    elif args.gazetteer:
+        centroids, source_places = read_gazetteer(args.gazetteer), {}
+        source_version = os.path.splitext(os.path.basename(args.gazetteer))[0]
+    else:
+        parser.error("give a gazetteer file or --zipcodes-package")
+    if not centroids:
+        print("❌ No New Jersey ZCTAs found - is this the national ZCTA gazetteer?")
+        sys.exit(1)
+
+    places = dict(source_places)
+    if os.path.exists(args.out):
+        _, existing = load_zip_centroids(args.out)
+        places.update({zipcode: entry[2] for zipcode, entry in existing.items() if entry[2]})
+
+    version = args.version or source_version
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", newline="") as f:
+        f.write("# NJ ZIP code centroids (07xxx-08xxx), loaded by services/zip_centroids.py\n")
+        f.write(f"# version: {version}\n")
+        if args.zipcodes_package:
+            f.write("# Source: zipcodes PyPI package (MIT), coordinates from GeoNames (CC BY 4.0, geonames.org)\n")
+        f.write("# Regenerate from the Census ZCTA gazetteer with: python build_nj_zip_centroids.py <Gaz_zcta_national.txt>\n")
+        writer = csv.writer(f)
+        writer.writerow(["zip", "latitude", "longitude", "place"])
+        for zipcode in sorted(centroids):
+            lat, lon = centroids[zipcode]
+            writer.writerow([zipcode, lat, lon, places.get(zipcode, "")])
+
+    print(f"✅ Wrote {len(centroids)} NJ ZIP centroids (version {version}) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -105,5 +105,14 @@ CREATE INDEX IF NOT EXISTS idx_freshwater_risk_location ON freshwater_risk(x, y)
 CREATE INDEX IF NOT EXISTS idx_marine_hci_location ON marine_hci(x, y);
 CREATE INDEX IF NOT EXISTS idx_terrestrial_risk_location ON terrestrial_risk(x, y);
 
+-- Keyset pages of GET /risks/bbox (WHERE lat/lon BETWEEN ... AND id > last ORDER BY id LIMIT n):
+-- the bounding box and the id bound are both checked in the index, so only the viewport's rows
+-- are read and sorted, never the whole table. GET /migrate-db creates the same indexes.
+CREATE INDEX IF NOT EXISTS idx_invasive_species_bbox_keyset ON invasive_species(latitude, longitude, id);
+CREATE INDEX IF NOT EXISTS idx_iucn_data_bbox_keyset ON iucn_data(latitude, longitude, id);
+CREATE INDEX IF NOT EXISTS idx_freshwater_risk_bbox_keyset ON freshwater_risk(y, x, id);
+CREATE INDEX IF NOT EXISTS idx_marine_hci_bbox_keyset ON marine_hci(y, x, id);
+CREATE INDEX IF NOT EXISTS idx_terrestrial_risk_bbox_keyset ON terrestrial_risk(y, x, id);
+
 -- Grant necessary permissions (adjust as needed)
 -- Note: This might not be needed in Supabase as it handles permissions differently
@@ -0,0 +1,43 @@
+-- =====================================================
+-- Bioscope Dataset Version Stamp
+-- Run this script in your Supabase SQL Editor after database_setup.sql.
+-- (GET /migrate-db on minimal_app.py runs the same statements.)
+-- Any write to a risk table stores the writing transaction id in
+-- dataset_version, which invalidates cached vector tiles.
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS dataset_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO dataset_version (id, version) VALUES (TRUE, txid_current()) ON CONFLICT (id) DO NOTHING;
+
+-- Only the first modifying statement of a transaction writes the row
+CREATE OR REPLACE FUNCTION bump_dataset_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE dataset_version SET version = txid_current(), updated_at = CURRENT_TIMESTAMP
+    WHERE version <> txid_current();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_invasive_species_dataset_version ON invasive_species;
+CREATE TRIGGER trg_invasive_species_dataset_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON invasive_species
+FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();
+
+DROP TRIGGER IF EXISTS trg_iucn_data_dataset_version ON iucn_data;
+CREATE TRIGGER trg_iucn_data_dataset_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON iucn_data
+FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();
+
+DROP TRIGGER IF EXISTS trg_freshwater_risk_dataset_version ON freshwater_risk;
+CREATE TRIGGER trg_freshwater_risk_dataset_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON freshwater_risk
+FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();
+
+DROP TRIGGER IF EXISTS trg_marine_hci_dataset_version ON marine_hci;
+CREATE TRIGGER trg_marine_hci_dataset_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON marine_hci
+FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();
+
+DROP TRIGGER IF EXISTS trg_terrestrial_risk_dataset_version ON terrestrial_risk;
+CREATE TRIGGER trg_terrestrial_risk_dataset_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON terrestrial_risk
+FOR EACH STATEMENT EXECUTE FUNCTION bump_dataset_version();
@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from "react";
+import React, { useState, useEffect, useCallback, useRef } from "react";
 import _ from "lodash";
 import {
   Box, Typography, TextField, Button, Paper, List, ListItem, ListItemText, ToggleButton, ToggleButtonGroup
@@ -207,38 +207,59 @@ const MapUpdater = ({ location }) => {
   return null;
 };
 
-const MapPaginationHandler = ({ location, setRisks, offset, setOffset, loadedAreas, setLoadedAreas }) => {
+// Pages fetched per viewport before waiting for the next pan/zoom
+const MAX_VIEWPORT_PAGES = 5;
+
+const riskKey = (risk) =>
+  risk.risk_id || `${risk.source}:${risk.latitude},${risk.longitude}:${risk.description}`;
+
+const MapPaginationHandler = ({ location, setRisks }) => {
+  const loadedKeys = useRef(new Set());
+
+  // A new search replaces the risk list, so viewport pages start over too
+  useEffect(() => {
+    loadedKeys.current = new Set();
+  }, [location]);
+
   const map = useMapEvents({
     moveend: () => handleMapMove(),
     zoomend: () => handleMapMove(),
   });
 
   const handleMapMove = () => {
-    const center = map.getCenter();
-    debouncedFetch(center);
+    debouncedFetch(map.getBounds(), map.getZoom());
   };
 
-  const debouncedFetch = useCallback(_.debounce(async (center) => {
-    const key = `${center.lat.toFixed(3)},${center.lng.toFixed(3)}`;
-    if (loadedAreas.includes(key)) return;
+  const debouncedFetch = useCallback(_.debounce(async (bounds, zoom) => {
+    const apiUrl = process.env.REACT_APP_API_URL || 'http://127.0.0.1:5001';
+    let cursor = null;
 
     try {
-      const apiUrl = process.env.REACT_APP_API_URL || 'http://127.0.0.1:5001';
-      const response = await axios.post(`${apiUrl}/search`, {
-        input_text: `${center.lat}, ${center.lng}`,
-        offset: offset + 50
-      }, {
-        headers: { "Content-Type": "application/json" },
-        withCredentials: true,
-      });
+      // Keyset pages of the visible area: each page costs the same however far we have paged
+      for (let page = 0; page < MAX_VIEWPORT_PAGES; page++) {
+        const response = await axios.get(`${apiUrl}/risks/bbox`, {
+          params: {
+            south: bounds.getSouth(),
+            west: bounds.getWest(),
+            north: bounds.getNorth(),
+            east: bounds.getEast(),
+            zoom,
+            ...(cursor ? { cursor } : {}),
+          },
+          withCredentials: true,
+        });
+
+        const fresh = response.data.risks.filter((risk) => !loadedKeys.current.has(riskKey(risk)));
+        fresh.forEach((risk) => loadedKeys.current.add(riskKey(risk)));
+        if (fresh.length) setRisks(prev => [...prev, ...fresh]);
 
-      setRisks(prev => [...prev, ...response.data.risks]);
-      setOffset(prev => prev + 50);
-      setLoadedAreas(prev => [...prev, key]);
+        cursor = response.data.next_cursor;
+        if (!cursor) break;
+      }
     } catch (err) {
       console.error("Pagination fetch error:", err);
     }
-  }, 800), [offset, loadedAreas]);
+  }, 800), []);
 
   return null;
 };
@@ -250,8 +271,6 @@ const RiskMap = () => {
   const [risks, setRisks] = useState([]);
   const [error, setError] = useState("");
   const [reportFormat, setReportFormat] = useState(null);
-  const [offset, setOffset] = useState(0);
-  const [loadedAreas, setLoadedAreas] = useState([]);
 
   const handleFormatChange = (event, newFormat) => {
     if (newFormat) setReportFormat(newFormat);
@@ -480,7 +499,7 @@ const downloadReport = async () => {
         <Box sx={{ width: { xs: "100%", md: "75%" }, height: "calc(100vh - 64px)" }}>
           <MapContainer center={[40.8172, -74.2007]} zoom={12} style={{ height: "100%", width: "100%" }}>
             <MapUpdater location={location} />
-            <MapPaginationHandler location={location} setRisks={setRisks} offset={offset} setOffset={setOffset} loadedAreas={loadedAreas} setLoadedAreas={setLoadedAreas} />
+            <MapPaginationHandler location={location} setRisks={setRisks} />
             <TileLayer url="https://server.arcgisonline.com/ArcGIS/rest/services/World_Topo_Map/MapServer/tile/{z}/{y}/{x}" />
 
             {location && (
@@ -2,9 +2,13 @@
 """
 Bioscope Flask Backend - Step 1: Adding Database Support
 """
+import math
 import os
 import sys
-from flask import Flask, jsonify, request, session
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Flask, Response, jsonify, request, session
 from flask_cors import CORS
 from flask_session import Session
 from datetime import timedelta
@@ -33,9 +37,153 @@ except ImportError as e:
     print(f"⚠️ Report generation dependencies not available: {e}")
     REPORTS_AVAILABLE = False
 
+# Shared backend modules (same import root backend/app.py runs from)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+try:
+    from services.db_pool import get_database_url as pool_database_url, get_pool, pool_stats
+    DB_POOL_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Shared connection pool not available: {e}")
+    DB_POOL_AVAILABLE = False
+
+try:
+    from services.spatial_index import RiskGridIndex, DEFAULT_CELL_SIZE
+    SPATIAL_INDEX_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Spatial index not available: {e}")
+    SPATIAL_INDEX_AVAILABLE = False
+
+try:
+    from services.risk_clusters import RiskClusterPyramid
+    RISK_CLUSTERS_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Risk clusters not available: {e}")
+    RISK_CLUSTERS_AVAILABLE = False
+
+try:
+    from services.dataset_version import (
+        UNVERSIONED, get_dataset_version, dataset_version_setup_statements, read_dataset_version
+    )
+    DATASET_VERSION_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Dataset versioning not available: {e}")
+    DATASET_VERSION_AVAILABLE = False
+
+try:
+    from services.search_cache import SEARCH_CACHE_ENABLED, SearchResultCache
+    SEARCH_CACHE_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Search cache not available: {e}")
+    SEARCH_CACHE_AVAILABLE = False
+
+try:
+    from services.vector_tiles import (
+        MAX_ZOOM as TILE_MAX_ZOOM,
+        TileDiskCache,
+        buffered_tile_bounds,
+        encode_point_layer,
+        encode_tile
+    )
+    VECTOR_TILES_AVAILABLE = DATASET_VERSION_AVAILABLE
+except ImportError as e:
+    print(f"⚠️ Vector tiles not available: {e}")
+    VECTOR_TILES_AVAILABLE = False
+
+try:
+    from services.hci_raster import HCI_LAYERS, HciRaster, export_raster
+    HCI_RASTER_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ HCI rasters not available: {e}")
+    HCI_RASTER_AVAILABLE = False
+
+try:
+    from services.geocoding import GeocodingError, geocode_zip, get_geocode_cache, nominatim_search
+    GEOCODE_CACHE_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Geocode cache not available: {e} - geocoding without cache")
+    GEOCODE_CACHE_AVAILABLE = False
+
+    class GeocodingError(Exception):
+        pass
+
+    def nominatim_search(params):
+        response = requests.get(
+            GEOCODING_API_URL,
+            params=params,
+            headers={"User-Agent": "BiodivProScopeApp/1.0"},
+            timeout=10
+        )
+        if response.status_code != 200:
+            raise GeocodingError(f"Nominatim returned HTTP {response.status_code}")
+        return response.json()
+
+try:
+    from services.zip_centroids import get_zip_centroids, nearest_zip, resolve_zip
+    ZIP_CENTROIDS_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Bundled ZIP centroids not available: {e} - ZIP codes geocoded over the network")
+    ZIP_CENTROIDS_AVAILABLE = False
+
+try:
+    from services.autocomplete import get_address_autocomplete
+    AUTOCOMPLETE_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Autocomplete index not available: {e} - suggestions come from Nominatim")
+    AUTOCOMPLETE_AVAILABLE = False
+
+try:
+    from services.risk_query import (
+        build_adaptive_radius_query,
+        build_union_query,
+        detect_table_columns,
+        first_supported_variant,
+        group_rows_by_layer,
+        split_columns,
+        ring_expression,
+        trim_to_smallest_radius,
+        encode_page_cursor,
+        decode_page_cursor
+    )
+    COMBINED_QUERY_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Combined risk query not available: {e}")
+    COMBINED_QUERY_AVAILABLE = False
+
+try:
+    from api.haversine_api import haversine_many, degree_radius_for_miles
+    DISTANCE_SEARCH_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Distance search not available: {e}")
+    DISTANCE_SEARCH_AVAILABLE = False
+
 # Constants
 GEOCODING_API_URL = "https://nominatim.openstreetmap.org/search"
 NJ_BOUNDS = {"north": 41.36, "south": 38.92, "west": -75.58, "east": -73.90}
+SPATIAL_INDEX_ENABLED = os.getenv('SPATIAL_INDEX_ENABLED', 'false').lower() == 'true'
+POSTGIS_ENABLED = os.getenv('POSTGIS_ENABLED', 'false').lower() == 'true'
+SEARCH_RADII = [0.1, 0.2, 0.5]  # degrees, tried smallest first
+# "single_pass": one query at the widest radius trimmed to the smallest radius with results
+# "progressive": the original query-per-radius retry loop
+SEARCH_RADIUS_MODE = os.getenv('SEARCH_RADIUS_MODE', 'single_pass').lower()
+# Largest "radius_mi" /search accepts; New Jersey is about 170 miles end to end
+SEARCH_MAX_RADIUS_MI = 50
+# Fan the five layer queries out over a thread pool, each on its own pooled connection
+PARALLEL_LAYER_QUERIES = os.getenv('PARALLEL_LAYER_QUERIES', 'false').lower() == 'true'
+LAYER_QUERY_WORKERS = int(os.getenv('LAYER_QUERY_WORKERS', 5))
+LAYER_QUERY_TIMEOUT_MS = int(os.getenv('LAYER_QUERY_TIMEOUT_MS', 3000))
+# Rows per layer in each /risks/bbox page
+BBOX_PAGE_SIZE = int(os.getenv('BBOX_PAGE_SIZE', 200))
+BBOX_MAX_PAGE_SIZE = 1000
+# Finest zoom level precomputed for /risks/clusters (coarser levels are merged from it)
+CLUSTER_MAX_ZOOM = int(os.getenv('CLUSTER_MAX_ZOOM', 14))
+# Vector tiles: on-disk cache root, per-tile feature cap and browser cache lifetime for unversioned URLs
+TILE_CACHE_DIR = os.getenv('TILE_CACHE_DIR', os.path.join(tempfile.gettempdir(), "bioscope_tiles"))
+TILE_MAX_FEATURES = int(os.getenv('TILE_MAX_FEATURES', 20000))
+TILE_MAX_AGE_SECONDS = int(os.getenv('TILE_MAX_AGE_SECONDS', 3600))
+# Memory-mapped rasters of the gridded HCI layers (written by GET /export-hci-rasters)
+HCI_RASTER_DIR = os.getenv('HCI_RASTER_DIR', os.path.join(tempfile.gettempdir(), "bioscope_hci_rasters"))
+HCI_WINDOW_MAX_CELLS = int(os.getenv('HCI_WINDOW_MAX_CELLS', 10000))
 
 # Create Flask app
 app = Flask(__name__)
@@ -90,22 +238,22 @@ allowed_origins = os.getenv('ALLOWED_ORIGINS', 'https://bioscope-project.vercel.
 CORS(app, resources={r"/*": {"origins": allowed_origins}}, supports_credentials=True)
 
 # Database connection function
+def get_database_url():
+    """DATABASE_URL with SSL enforced for Supabase, or None if not configured"""
+    # services.db_pool only fails to import without psycopg2, and then there is no database anyway
+    return pool_database_url(use_db_components=False) if DB_POOL_AVAILABLE else None
+
 def connect_db():
-    """Connect to database if available"""
+    """Check out a pooled database connection if available; conn.close() returns it to the pool"""
     if not DATABASE_AVAILABLE:
         return None
     
     try:
-        database_url = os.getenv('DATABASE_URL')
-        if not database_url:
+        # Only DATABASE_URL enables the database here; the pool resolves the same URL itself
+        if not get_database_url():
             return None
-            
-        # Ensure SSL for Supabase
-        if 'supabase.com' in database_url and '?sslmode=' not in database_url:
-            database_url += '?sslmode=require'
-            
-        conn = psycopg2.connect(database_url)
-        return conn
+
+        return get_pool().checkout()
     except Exception as e:
         print(f"Database connection failed: {e}")
         return None
@@ -150,8 +298,470 @@ def calculate_risk_from_hci(hci_value, hci_type="general"):
         else:
             return "low", max(hci_value / 3.0, 0.1)
 
-def query_biodiversity_risks(lat, lon, search_radius=0.1):
-    """Query all types of biodiversity risks around a location"""
+# Risk record builders - one per layer/column variant, shared by SQL and in-memory paths
+def invasive_species_record(row, lat, lon):
+    return {
+        "latitude": float(row[0]) if row[0] else lat,
+        "longitude": float(row[1]) if row[1] else lon,
+        "risk_type": "Invasive Species",
+        "description": f"{row[2]} ({row[3] if row[3] else 'Unknown scientific name'})",
+        "threat_code": row[4] or "low",
+        "source": "invasive_species"
+    }
+
+def invasive_species_basic_record(row, lat, lon):
+    """Fallback record when the scientific_name column is missing"""
+    return {
+        "latitude": float(row[0]) if row[0] else lat,
+        "longitude": float(row[1]) if row[1] else lon,
+        "risk_type": "Invasive Species",
+        "description": f"{row[2]}",
+        "threat_code": row[3] or "low",
+        "source": "invasive_species"
+    }
+
+def iucn_record(row, lat, lon):
+    return {
+        "latitude": float(row[0]) if row[0] else lat,
+        "longitude": float(row[1]) if row[1] else lon,
+        "risk_type": "Endangered Species",
+        "description": f"{row[2]} ({row[3]}) in {row[4] if row[4] else 'Unknown habitat'}",
+        "threat_code": standardize_threat_status(row[3]),
+        "source": "iucn_data"
+    }
+
+def iucn_basic_record(row, lat, lon):
+    """Fallback record when the habitat column is missing"""
+    return {
+        "latitude": float(row[0]) if row[0] else lat,
+        "longitude": float(row[1]) if row[1] else lon,
+        "risk_type": "Endangered Species",
+        "description": f"{row[2]} ({row[3]})",
+        "threat_code": standardize_threat_status(row[3]),
+        "source": "iucn_data"
+    }
+
+def freshwater_record(row, lat, lon):
+    normalized_risk = float(row[2]) if row[2] else 0.5
+    risk_level_db = row[3] if row[3] else "Low"
+    risk_level, _ = calculate_risk_from_hci(normalized_risk, "freshwater")
+    return {
+        "latitude": float(row[1]) if row[1] else lat,
+        "longitude": float(row[0]) if row[0] else lon,
+        "risk_type": "Freshwater Ecosystem Risk",
+        "description": f"Normalized Risk: {normalized_risk:.2f}, Risk Level: {risk_level_db}",
+        "threat_code": risk_level,
+        "source": "freshwater_risk"
+    }
+
+def marine_record(row, lat, lon):
+    hci_value = float(row[2]) if row[2] else 0.1
+    risk_level, normalized_risk = calculate_risk_from_hci(hci_value, "marine")
+    return {
+        "latitude": float(row[1]) if row[1] else lat,
+        "longitude": float(row[0]) if row[0] else lon,
+        "risk_type": "Marine Ecosystem Risk",
+        "description": f"Marine HCI: {hci_value:.2f}, Human-coexistence impact level: {risk_level}",
+        "threat_code": risk_level,
+        "source": "marine_hci"
+    }
+
+def terrestrial_record(row, lat, lon):
+    normalized_risk = float(row[2]) if row[2] else 0.5
+    risk_level_db = row[3] if row[3] else "low"
+    risk_level, _ = calculate_risk_from_hci(normalized_risk, "terrestrial")
+    return {
+        "latitude": float(row[1]) if row[1] else lat,
+        "longitude": float(row[0]) if row[0] else lon,
+        "risk_type": "Terrestrial Ecosystem Risk",
+        "description": f"Normalized Risk: {normalized_risk:.2f}, Risk Level: {risk_level_db}",
+        "threat_code": risk_level_db.lower() if risk_level_db else risk_level,
+        "source": "terrestrial_risk"
+    }
+
+# The five risk layers behind /search. Each layer lists its column variants in
+# preference order (older databases are missing scientific_name / habitat).
+RISK_LAYERS = [
+    {
+        "table": "invasive_species",
+        "lat_column": "latitude",
+        "lon_column": "longitude",
+        "queries": [
+            ("latitude, longitude, common_name, scientific_name, threat_code", invasive_species_record),
+            ("latitude, longitude, common_name, threat_code", invasive_species_basic_record),
+        ],
+    },
+    {
+        "table": "iucn_data",
+        "lat_column": "latitude",
+        "lon_column": "longitude",
+        "queries": [
+            ("latitude, longitude, species_name, threat_status, habitat", iucn_record),
+            ("latitude, longitude, species_name, threat_status", iucn_basic_record),
+        ],
+    },
+    {
+        "table": "freshwater_risk",
+        "lat_column": "y",
+        "lon_column": "x",
+        "queries": [("x, y, normalized_risk, risk_level", freshwater_record)],
+    },
+    {
+        "table": "marine_hci",
+        "lat_column": "y",
+        "lon_column": "x",
+        "queries": [("x, y, marine_hci", marine_record)],
+    },
+    {
+        "table": "terrestrial_risk",
+        "lat_column": "y",
+        "lon_column": "x",
+        "queries": [("x, y, normalized_risk, risk_level", terrestrial_record)],
+    },
+]
+
+def risk_layer_filter(layer, lat, lon, search_radius, use_postgis=False):
+    """WHERE clause and parameters selecting a layer's rows inside the search square"""
+    if use_postgis:
+        # The envelope keeps the same square as the ABS() predicate but is answered by the GiST index,
+        # and KNN ordering returns the nearest rows first
+        return """
+            WHERE geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+            ORDER BY geom <-> ST_SetSRID(ST_MakePoint(%s, %s), 4326)
+        """, (lon - search_radius, lat - search_radius, lon + search_radius, lat + search_radius, lon, lat)
+
+    return f"""
+        WHERE ABS({layer['lat_column']} - %s) <= %s AND ABS({layer['lon_column']} - %s) <= %s
+    """, (lat, search_radius, lon, search_radius)
+
+def query_risk_layer(conn, cursor, layer, lat, lon, search_radius):
+    """Query one risk layer, trying each column variant until one succeeds"""
+    # With PostGIS enabled, a failing geom query still falls back to the plain coordinate scan
+    for use_postgis in ([True, False] if POSTGIS_ENABLED else [False]):
+        where_clause, params = risk_layer_filter(layer, lat, lon, search_radius, use_postgis)
+        for columns, build_record in layer["queries"]:
+            try:
+                cursor.execute(f"SELECT {columns} FROM {layer['table']} {where_clause}", params)
+                return [build_record(row, lat, lon) for row in cursor.fetchall()]
+            except Exception as e:
+                print(f"Error querying {layer['table']} ({columns}, postgis={use_postgis}): {e}")
+                conn.rollback()  # Clear the aborted transaction so the next variant can run
+    return []
+
+# Schema capabilities, detected once per process: {table: (columns, build_record, has_geom)}
+risk_layer_plans = None
+risk_layer_plans_lock = threading.Lock()
+
+def get_risk_layer_plans(cursor):
+    """Pick each layer's column variant from information_schema once, instead of try/except per request"""
+    global risk_layer_plans
+    with risk_layer_plans_lock:
+        if risk_layer_plans is None:
+            available = detect_table_columns(cursor, [layer["table"] for layer in RISK_LAYERS])
+            plans = {}
+            for layer in RISK_LAYERS:
+                table_columns = available.get(layer["table"], set())
+                variant = first_supported_variant(layer["queries"], table_columns)
+                if variant is None:
+                    print(f"⚠️ Skipping {layer['table']}: table or required columns missing")
+                    continue
+                plans[layer["table"]] = (variant[0], variant[1], "geom" in table_columns)
+            risk_layer_plans = plans
+            print(f"✅ Risk layer capabilities detected: { {table: plan[0] for table, plan in plans.items()} }")
+        return risk_layer_plans
+
+def reset_risk_layer_plans():
+    """Forget detected capabilities (e.g. after a schema change) so the next search re-detects them"""
+    global risk_layer_plans
+    with risk_layer_plans_lock:
+        risk_layer_plans = None
+
+def query_combined_risks(cursor, lat, lon, search_radius, radii=None):
+    """Query every risk layer in a single UNION ALL round trip (trimmed to the smallest of radii if given)"""
+    plans = get_risk_layer_plans(cursor)
+    parts = []
+    for layer in RISK_LAYERS:
+        plan = plans.get(layer["table"])
+        if plan is None:
+            continue
+        columns, _, has_geom = plan
+        where_clause, params = risk_layer_filter(
+            layer, lat, lon, search_radius, use_postgis=POSTGIS_ENABLED and has_geom
+        )
+        part = (layer["table"], layer["table"], columns, where_clause, params)
+        if radii:
+            part += ring_expression(layer["lat_column"], layer["lon_column"], lat, lon)
+        parts.append(part)
+
+    if not parts:
+        return []
+
+    cursor.execute(*(build_adaptive_radius_query(parts, radii) if radii else build_union_query(parts)))
+    rows_by_layer = group_rows_by_layer(cursor.fetchall())
+
+    risk_data = []
+    for layer in RISK_LAYERS:
+        if layer["table"] in rows_by_layer:
+            build_record = plans[layer["table"]][1]
+            risk_data.extend(build_record(row, lat, lon) for row in rows_by_layer[layer["table"]])
+    return risk_data
+
+def risk_layer_bbox_predicate(layer, bounds, use_postgis=False):
+    """SQL predicate and parameters selecting a layer's rows inside south/west/north/east bounds"""
+    if use_postgis:
+        return "geom && ST_MakeEnvelope(%s, %s, %s, %s, 4326)", [
+            bounds["west"], bounds["south"], bounds["east"], bounds["north"]
+        ]
+    return f"{layer['lat_column']} BETWEEN %s AND %s AND {layer['lon_column']} BETWEEN %s AND %s", [
+        bounds["south"], bounds["north"], bounds["west"], bounds["east"]
+    ]
+
+def risk_layer_bbox_filter(layer, bounds, after_id, page_size, use_postgis=False):
+    """WHERE/ORDER BY/LIMIT for the next keyset page of a layer's rows inside the viewport
+
+    Rows come back in id order starting after after_id, so a deep page costs no more than the first.
+    With the (lat, lon, id) index from bbox_keyset_index_statements() the rows in the viewport are
+    found and filtered on id in the index, then sorted; the cost follows the rows in the viewport,
+    not the table. One extra row is fetched to tell whether the layer has another page.
+    """
+    spatial, params = risk_layer_bbox_predicate(layer, bounds, use_postgis)
+    return f"WHERE {spatial} AND id > %s ORDER BY id LIMIT %s", params + [after_id, page_size + 1]
+
+def bbox_keyset_index_statements():
+    """CREATE INDEX statements backing the /risks/bbox keyset pages (also in database_setup.sql)"""
+    return [
+        f"CREATE INDEX IF NOT EXISTS idx_{layer['table']}_bbox_keyset "
+        f"ON {layer['table']}({layer['lat_column']}, {layer['lon_column']}, id)"
+        for layer in RISK_LAYERS
+    ]
+
+def query_bbox_page(cursor, bounds, after_ids, page_size):
+    """One keyset page per layer inside bounds; returns (risks, {table: last id} for layers with more rows)"""
+    plans = get_risk_layer_plans(cursor)
+    parts = []
+    for layer in RISK_LAYERS:
+        table = layer["table"]
+        if table not in plans or table not in after_ids:
+            continue
+        columns, _, has_geom = plans[table]
+        where_clause, params = risk_layer_bbox_filter(
+            layer, bounds, after_ids[table], page_size, use_postgis=POSTGIS_ENABLED and has_geom
+        )
+        parts.append((table, table, f"id, {columns}", where_clause, params))
+
+    if not parts:
+        return [], {}
+
+    cursor.execute(*build_union_query(parts))
+    rows_by_layer = group_rows_by_layer(cursor.fetchall())
+
+    center_lat = (bounds["south"] + bounds["north"]) / 2
+    center_lon = (bounds["west"] + bounds["east"]) / 2
+    risks = []
+    next_ids = {}
+    for layer in RISK_LAYERS:
+        table = layer["table"]
+        rows = sorted(rows_by_layer.get(table, []), key=lambda row: row[0])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_ids[table] = rows[-1][0]
+        build_record = plans[table][1]
+        for row in rows:
+            record = build_record(row[1:], center_lat, center_lon)
+            record["risk_id"] = f"{table}:{row[0]}"
+            risks.append(record)
+    return risks, next_ids
+
+def thinned_tile_query(layer, columns, spatial, params, bounds, max_features):
+    """SELECT returning the lowest-id row of each cell of a grid over bounds, at most max_features cells
+
+    The grid is square in degrees with floor(sqrt(max_features)) cells per side, so the kept points
+    are spread over the whole tile and the same rows are picked on every rebuild.
+    """
+    side = max(int(math.sqrt(max_features)), 1)
+    cell_lat = (bounds["north"] - bounds["south"]) / side
+    cell_lon = (bounds["east"] - bounds["west"]) / side
+    query = f"""
+        SELECT DISTINCT ON (cell_y, cell_x) id, {columns}
+        FROM (
+            SELECT *, floor(({layer['lat_column']} - %s) / %s) AS cell_y,
+                      floor(({layer['lon_column']} - %s) / %s) AS cell_x
+            FROM {layer['table']}
+            WHERE {spatial}
+        ) cells
+        ORDER BY cell_y, cell_x, id
+        LIMIT %s
+    """
+    return query, [bounds["south"], cell_lat, bounds["west"], cell_lon] + params + [max_features]
+
+def build_risk_tile(cursor, layer, z, x, y):
+    """Encode one layer's risks inside tile z/x/y (plus a small edge buffer) as an MVT tile"""
+    table = layer["table"]
+    south, west, north, east = buffered_tile_bounds(z, x, y)
+    features = []
+
+    plan = get_risk_layer_plans(cursor).get(table)
+    # Nothing is stored outside New Jersey, so tiles elsewhere are empty without a query
+    overlaps_nj = (south <= NJ_BOUNDS["north"] and north >= NJ_BOUNDS["south"] and
+                   west <= NJ_BOUNDS["east"] and east >= NJ_BOUNDS["west"])
+    if plan is not None and overlaps_nj:
+        columns, build_record, has_geom = plan
+        bounds = {"south": south, "west": west, "north": north, "east": east}
+        spatial, params = risk_layer_bbox_predicate(layer, bounds, use_postgis=POSTGIS_ENABLED and has_geom)
+        cursor.execute(f"SELECT id, {columns} FROM {table} WHERE {spatial} LIMIT %s", params + [TILE_MAX_FEATURES + 1])
+        rows = cursor.fetchall()
+        if len(rows) > TILE_MAX_FEATURES:
+            # Too many points for one tile (low zooms): the first N by id would all come from
+            # whichever area was loaded first, so keep one point per cell of an even grid instead
+            cursor.execute(*thinned_tile_query(layer, columns, spatial, params, bounds, TILE_MAX_FEATURES))
+            rows = cursor.fetchall()
+        for row in rows:
+            record = build_record(row[1:], None, None)
+            if record["latitude"] is None or record["longitude"] is None:
+                continue
+            features.append((row[0], record["latitude"], record["longitude"], {
+                "risk_id": f"{table}:{row[0]}",
+                "risk_type": record["risk_type"],
+                "description": record["description"],
+                "threat_code": record["threat_code"],
+            }))
+
+    return encode_tile([encode_point_layer(table, features, z, x, y)])
+
+# Parallel layer execution (opt-in via PARALLEL_LAYER_QUERIES=true)
+layer_executor = None
+layer_executor_lock = threading.Lock()
+
+def get_layer_workers():
+    """Bounded thread pool for layer queries plus the shared connection pool they draw from"""
+    global layer_executor
+    with layer_executor_lock:
+        if layer_executor is None:
+            layer_executor = ThreadPoolExecutor(
+                max_workers=LAYER_QUERY_WORKERS, thread_name_prefix="risk-layer"
+            )
+        return layer_executor, get_pool()
+
+def query_layer_on_pooled_connection(pool, active_connections, active_lock, layer, plan, lat, lon, search_radius):
+    """Run one layer query on its own pooled connection under a server-side statement timeout
+
+    The connection is listed in active_connections (under active_lock) only while this worker
+    owns it, so a cancel from the caller can never reach a connection already back in the pool.
+    """
+    columns, build_record, has_geom = plan
+    conn = pool.getconn()
+    with active_lock:
+        active_connections[layer["table"]] = conn
+    broken = False
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SET LOCAL statement_timeout = {LAYER_QUERY_TIMEOUT_MS}")
+        where_clause, params = risk_layer_filter(
+            layer, lat, lon, search_radius, use_postgis=POSTGIS_ENABLED and has_geom
+        )
+        cursor.execute(f"SELECT {columns} FROM {layer['table']} {where_clause}", params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return [build_record(row, lat, lon) for row in rows]
+    finally:
+        with active_lock:
+            active_connections.pop(layer["table"], None)
+        try:
+            conn.rollback()  # End the read-only transaction (and the SET LOCAL) before reuse
+        except psycopg2.Error:
+            broken = True
+        pool.putconn(conn, close=broken)
+
+def query_biodiversity_risks_parallel(lat, lon, search_radius):
+    """Query the risk layers concurrently; returns (risks, timed_out_layers)
+
+    Layers that miss LAYER_QUERY_TIMEOUT_MS are cancelled and left out, so latency tracks
+    the slowest layer that makes its deadline instead of the sum of all five.
+    """
+    executor, pool = get_layer_workers()
+
+    conn = pool.getconn()
+    try:
+        cursor = conn.cursor()
+        plans = get_risk_layer_plans(cursor)
+        cursor.close()
+        conn.rollback()
+    finally:
+        pool.putconn(conn)
+
+    active_connections = {}
+    active_lock = threading.Lock()
+    futures = {
+        executor.submit(
+            query_layer_on_pooled_connection, pool, active_connections, active_lock,
+            layer, plans[layer["table"]], lat, lon, search_radius
+        ): layer["table"]
+        for layer in RISK_LAYERS if layer["table"] in plans
+    }
+
+    # Layers queue behind each other once there are more layers than workers
+    waves = -(-len(futures) // LAYER_QUERY_WORKERS) if futures else 0
+    done, not_done = wait(futures, timeout=waves * LAYER_QUERY_TIMEOUT_MS / 1000.0 + 1.0)
+
+    timed_out_layers = []
+    for future in not_done:
+        table = futures[future]
+        timed_out_layers.append(table)
+        future.cancel()
+        # Under the lock the worker still owns conn: it cannot be handed back to the pool mid-cancel
+        with active_lock:
+            conn = active_connections.get(table)
+            if conn is not None:
+                conn.cancel()  # Stop the server-side query so the connection frees up quickly
+
+    results_by_table = {}
+    for future in done:
+        table = futures[future]
+        try:
+            results_by_table[table] = future.result()
+        except psycopg2.extensions.QueryCanceledError:
+            timed_out_layers.append(table)
+        except Exception as e:
+            print(f"Error querying {table} in parallel: {e}")
+
+    if timed_out_layers:
+        print(f"⏱️ Layer queries missed their {LAYER_QUERY_TIMEOUT_MS} ms deadline: {timed_out_layers}")
+
+    risk_data = []
+    for layer in RISK_LAYERS:
+        risk_data.extend(results_by_table.get(layer["table"], []))
+    return risk_data, timed_out_layers
+
+def query_biodiversity_risks(lat, lon, search_radius=0.1, radii=None, timed_out_layers=None):
+    """Query all types of biodiversity risks around a location
+    
+    With radii, a single query runs at the widest radius and only the risks within the
+    smallest radius that has any results are returned (same as retrying each radius in turn).
+    In parallel mode, names of layers that missed their deadline are appended to timed_out_layers.
+    """
+    if radii:
+        search_radius = max(radii)
+
+    index = current_risk_index()
+    if index is not None:
+        missing = [layer for layer in RISK_LAYERS if layer["table"] not in index.layers]
+        if not missing:
+            if radii:
+                return index.query_adaptive(lat, lon, radii)
+            return index.query(lat, lon, search_radius)
+        if not radii or COMBINED_QUERY_AVAILABLE:
+            risk_data = query_risk_layers_mixed(index, missing, lat, lon, search_radius)
+            return trim_to_smallest_radius(risk_data, lat, lon, radii) if radii else risk_data
+
+    if PARALLEL_LAYER_QUERIES and DATABASE_AVAILABLE and COMBINED_QUERY_AVAILABLE and DB_POOL_AVAILABLE and get_database_url():
+        try:
+            risk_data, missed = query_biodiversity_risks_parallel(lat, lon, search_radius)
+            if timed_out_layers is not None:
+                timed_out_layers.extend(missed)
+            return trim_to_smallest_radius(risk_data, lat, lon, radii) if radii else risk_data
+        except Exception as e:
+            print(f"⚠️ Parallel layer queries failed: {e} - falling back to a single connection")
+
     if not DATABASE_AVAILABLE:
         return []
     
@@ -163,147 +773,18 @@ def query_biodiversity_risks(lat, lon, search_radius=0.1):
     risk_data = []
     
     try:
-        # Query invasive species (handle potential missing scientific_name column)
-        try:
-            cursor.execute("""
-                SELECT latitude, longitude, common_name, scientific_name, threat_code 
-                FROM invasive_species 
-                WHERE ABS(latitude - %s) <= %s AND ABS(longitude - %s) <= %s
-            """, (lat, search_radius, lon, search_radius))
-            
-            for row in cursor.fetchall():
-                risk_data.append({
-                    "latitude": float(row[0]) if row[0] else lat,
-                    "longitude": float(row[1]) if row[1] else lon,
-                    "risk_type": "Invasive Species",
-                    "description": f"{row[2]} ({row[3] if row[3] else 'Unknown scientific name'})",
-                    "threat_code": row[4] or "low",
-                    "source": "invasive_species"
-                })
-        except:
-            # Fallback query without scientific_name column
-            cursor.execute("""
-                SELECT latitude, longitude, common_name, threat_code 
-                FROM invasive_species 
-                WHERE ABS(latitude - %s) <= %s AND ABS(longitude - %s) <= %s
-            """, (lat, search_radius, lon, search_radius))
-            
-            for row in cursor.fetchall():
-                risk_data.append({
-                    "latitude": float(row[0]) if row[0] else lat,
-                    "longitude": float(row[1]) if row[1] else lon,
-                    "risk_type": "Invasive Species",
-                    "description": f"{row[2]}",
-                    "threat_code": row[3] or "low",
-                    "source": "invasive_species"
-                })
-        
-        # Query IUCN endangered species (handle potential missing habitat column)
-        try:
-            cursor.execute("""
-                SELECT latitude, longitude, species_name, threat_status, habitat 
-                FROM iucn_data 
-                WHERE ABS(latitude - %s) <= %s AND ABS(longitude - %s) <= %s
-            """, (lat, search_radius, lon, search_radius))
-            
-            for row in cursor.fetchall():
-                threat_code = standardize_threat_status(row[3])
-                risk_data.append({
-                    "latitude": float(row[0]) if row[0] else lat,
-                    "longitude": float(row[1]) if row[1] else lon,
-                    "risk_type": "Endangered Species",
-                    "description": f"{row[2]} ({row[3]}) in {row[4] if row[4] else 'Unknown habitat'}",
-                    "threat_code": threat_code,
-                    "source": "iucn_data"
-                })
-        except Exception as e:
-            print(f"Error querying IUCN data with habitat column: {e}")
-            # Fallback query without habitat column
+        if COMBINED_QUERY_AVAILABLE:
             try:
-                cursor.execute("""
-                    SELECT latitude, longitude, species_name, threat_status 
-                    FROM iucn_data 
-                    WHERE ABS(latitude - %s) <= %s AND ABS(longitude - %s) <= %s
-                """, (lat, search_radius, lon, search_radius))
-                
-                for row in cursor.fetchall():
-                    threat_code = standardize_threat_status(row[3])
-                    risk_data.append({
-                        "latitude": float(row[0]) if row[0] else lat,
-                        "longitude": float(row[1]) if row[1] else lon,
-                        "risk_type": "Endangered Species",
-                        "description": f"{row[2]} ({row[3]})",
-                        "threat_code": threat_code,
-                        "source": "iucn_data"
-                    })
-            except Exception as e2:
-                print(f"Error querying IUCN data without habitat column: {e2}")
-        
-        # Query freshwater risks (handle potential missing columns)
-        try:
-            cursor.execute("""
-                SELECT x, y, normalized_risk, risk_level 
-                FROM freshwater_risk 
-                WHERE ABS(y - %s) <= %s AND ABS(x - %s) <= %s
-            """, (lat, search_radius, lon, search_radius))
-            
-            for row in cursor.fetchall():
-                normalized_risk = float(row[2]) if row[2] else 0.5
-                risk_level_db = row[3] if row[3] else "Low"
-                risk_level, _ = calculate_risk_from_hci(normalized_risk, "freshwater")
-                risk_data.append({
-                    "latitude": float(row[1]) if row[1] else lat,
-                    "longitude": float(row[0]) if row[0] else lon,
-                    "risk_type": "Freshwater Ecosystem Risk",
-                    "description": f"Normalized Risk: {normalized_risk:.2f}, Risk Level: {risk_level_db}",
-                    "threat_code": risk_level,
-                    "source": "freshwater_risk"
-                })
-        except Exception as e:
-            print(f"Error querying freshwater risks: {e}")
-        
-        # Query marine risks
-        cursor.execute("""
-            SELECT x, y, marine_hci 
-            FROM marine_hci 
-            WHERE ABS(y - %s) <= %s AND ABS(x - %s) <= %s
-        """, (lat, search_radius, lon, search_radius))
-        
-        for row in cursor.fetchall():
-            hci_value = float(row[2]) if row[2] else 0.1
-            risk_level, normalized_risk = calculate_risk_from_hci(hci_value, "marine")
-            risk_data.append({
-                "latitude": float(row[1]) if row[1] else lat,
-                "longitude": float(row[0]) if row[0] else lon,
-                "risk_type": "Marine Ecosystem Risk",
-                "description": f"Marine HCI: {hci_value:.2f}, Human-coexistence impact level: {risk_level}",
-                "threat_code": risk_level,
-                "source": "marine_hci"
-            })
-        
-        # Query terrestrial risks (handle potential missing columns)
-        try:
-            cursor.execute("""
-                SELECT x, y, normalized_risk, risk_level 
-                FROM terrestrial_risk 
-                WHERE ABS(y - %s) <= %s AND ABS(x - %s) <= %s
-            """, (lat, search_radius, lon, search_radius))
-            
-            for row in cursor.fetchall():
-                normalized_risk = float(row[2]) if row[2] else 0.5
-                risk_level_db = row[3] if row[3] else "low"
-                risk_level, _ = calculate_risk_from_hci(normalized_risk, "terrestrial")
-                risk_data.append({
-                    "latitude": float(row[1]) if row[1] else lat,
-                    "longitude": float(row[0]) if row[0] else lon,
-                    "risk_type": "Terrestrial Ecosystem Risk",
-                    "description": f"Normalized Risk: {normalized_risk:.2f}, Risk Level: {risk_level_db}",
-                    "threat_code": risk_level_db.lower() if risk_level_db else risk_level,
-                    "source": "terrestrial_risk"
-                })
-        except Exception as e:
-            print(f"Error querying terrestrial risks: {e}")
-        
+                return query_combined_risks(cursor, lat, lon, search_radius, radii)
+            except Exception as e:
+                print(f"⚠️ Combined risk query failed: {e} - falling back to per-layer queries")
+                conn.rollback()
+                reset_risk_layer_plans()
+
+        for layer in RISK_LAYERS:
+            risk_data.extend(query_risk_layer(conn, cursor, layer, lat, lon, search_radius))
+        if radii:
+            risk_data = trim_to_smallest_radius(risk_data, lat, lon, radii)
     except Exception as e:
         print(f"Error querying biodiversity risks: {e}")
     finally:
@@ -312,21 +793,329 @@ def query_biodiversity_risks(lat, lon, search_radius=0.1):
     
     return risk_data
 
+def search_biodiversity_risks(lat, lon, radius_mi=None, timed_out_layers=None, pad=0.0):
+    """Run the configured radius strategy for /search; risks come back unranked
+
+    pad widens the query square (in degrees), e.g. when lat/lon were snapped to a cache grid.
+    """
+    if radius_mi is not None:
+        # One query over the square that encloses the circle; the caller filters by real distance
+        return query_biodiversity_risks(
+            lat, lon, search_radius=degree_radius_for_miles(lat, radius_mi) + pad,
+            timed_out_layers=timed_out_layers
+        )
+
+    if SEARCH_RADIUS_MODE == "single_pass":
+        # One query at the widest radius, trimmed to the smallest radius with results
+        return query_biodiversity_risks(lat, lon, radii=SEARCH_RADII, timed_out_layers=timed_out_layers)
+
+    biodiversity_risks = query_biodiversity_risks(
+        lat, lon, search_radius=SEARCH_RADII[0], timed_out_layers=timed_out_layers
+    )
+    # If no risks found in immediate area, expand search radius progressively
+    for radius in SEARCH_RADII[1:]:
+        if biodiversity_risks:
+            break
+        print(f"🔍 Expanding search radius to {radius} degrees")
+        biodiversity_risks = query_biodiversity_risks(
+            lat, lon, search_radius=radius, timed_out_layers=timed_out_layers
+        )
+    return biodiversity_risks
+
+# Search result cache (SEARCH_CACHE_ENABLED, on by default)
+search_cache = SearchResultCache() if SEARCH_CACHE_AVAILABLE and SEARCH_CACHE_ENABLED else None
+
+def cached_biodiversity_search(lat, lon, radius_mi=None, timed_out_layers=None):
+    """search_biodiversity_risks() through the result cache, keyed on the snapped point and dataset version"""
+    # Without the version triggers a reload would go unnoticed, so nothing is cached (as for /tiles)
+    version = get_dataset_version(connect_db) if search_cache is not None and DATASET_VERSION_AVAILABLE else None
+    if version is None or version == UNVERSIONED:
+        return search_biodiversity_risks(lat, lon, radius_mi, timed_out_layers)
+
+    radius = ("mi", radius_mi) if radius_mi is not None else (SEARCH_RADIUS_MODE, tuple(SEARCH_RADII))
+    key = search_cache.key(lat, lon, radius, [layer["table"] for layer in RISK_LAYERS], version)
+
+    cached = search_cache.get(key)
+    if cached is not None:
+        print(f"⚡ Search cache hit for {key[:2]}")
+        return [dict(risk) for risk in cached]  # Ranking adds distance_mi per request
+
+    snapped_lat, snapped_lon = key[0], key[1]
+    missed = []
+    risks = search_biodiversity_risks(
+        snapped_lat, snapped_lon, radius_mi, missed, pad=search_cache.precision if radius_mi is not None else 0.0
+    )
+    if timed_out_layers is not None:
+        timed_out_layers.extend(missed)
+    # Never cache partial results, nor empty ones (query errors also come back empty)
+    if risks and not missed:
+        search_cache.set(key, [dict(risk) for risk in risks])
+    return risks
+
+def rank_risks_by_distance(risks, lat, lon, radius_mi=None, sort=False):
+    """Attach distance_mi to each risk; with radius_mi, drop risks outside it and sort nearest first"""
+    if not risks or not DISTANCE_SEARCH_AVAILABLE:
+        return risks
+
+    distances = haversine_many(
+        lat, lon,
+        [risk["latitude"] for risk in risks],
+        [risk["longitude"] for risk in risks]
+    )
+    for risk, distance in zip(risks, distances):
+        risk["distance_mi"] = round(float(distance), 3)
+
+    if radius_mi is None:
+        if sort:
+            risks.sort(key=lambda risk: risk["distance_mi"])
+        return risks
+
+    within = [risk for risk in risks if risk["distance_mi"] <= radius_mi]
+    within.sort(key=lambda risk: risk["distance_mi"])
+    return within
+
+# In-memory spatial index (opt-in via SPATIAL_INDEX_ENABLED=true)
+risk_index = None  # Set once the background load has finished; DB is used until then
+risk_index_loading = False
+risk_index_requested_version = None  # Version the latest rebuild was started for; each version is tried once
+risk_index_lock = threading.Lock()
+
+def start_risk_index_load(version=None):
+    """(Re)build the grid index in the background unless a build is running or already ran for version"""
+    global risk_index_loading, risk_index_requested_version
+    with risk_index_lock:
+        if risk_index_loading or (version is not None and version == risk_index_requested_version):
+            return
+        risk_index_loading = True
+        risk_index_requested_version = version
+    threading.Thread(target=load_risk_index, name="risk-index-loader", daemon=True).start()
+
+def current_risk_index():
+    """The grid index if it was built at the current dataset version; otherwise None and a rebuild starts"""
+    index = risk_index
+    if index is None or not DATASET_VERSION_AVAILABLE or index.version is None:
+        return index
+    version = get_dataset_version(connect_db)
+    if version != index.version:
+        start_risk_index_load(version)
+        return None  # Stale rows: the database answers until the rebuilt index is published
+    return index
+
+def query_risk_layers_mixed(index, missing_layers, lat, lon, search_radius):
+    """Layers the index holds come from memory, layers that failed to load from the database"""
+    db_records = {}
+    conn = connect_db() if DATABASE_AVAILABLE else None
+    if conn is not None:
+        cursor = conn.cursor()
+        try:
+            for layer in missing_layers:
+                db_records[layer["table"]] = query_risk_layer(conn, cursor, layer, lat, lon, search_radius)
+        finally:
+            cursor.close()
+            conn.close()
+
+    risk_data = []
+    for layer in RISK_LAYERS:
+        if layer["table"] in index.layers:
+            risk_data.extend(index.query_layer(layer["table"], lat, lon, search_radius))
+        else:
+            risk_data.extend(db_records.get(layer["table"], []))
+    return risk_data
+
+def load_risk_index():
+    """Build the index and clear the loading flag, whatever happens"""
+    global risk_index_loading
+    try:
+        return build_risk_index()
+    finally:
+        with risk_index_lock:
+            risk_index_loading = False
+
+def build_risk_index():
+    """Stream every risk layer into an in-memory grid index"""
+    global risk_index
+
+    conn = connect_db()
+    if conn is None:
+        print("⚠️ Spatial index not loaded: no database connection")
+        return None
+
+    try:
+        # Read before the rows: a change committed during the load leaves the index stale, not wrong
+        version = None
+        if DATASET_VERSION_AVAILABLE:
+            try:
+                cursor = conn.cursor()
+                version = read_dataset_version(cursor)
+                cursor.close()
+            except Exception as e:
+                print(f"⚠️ Could not read dataset version for the spatial index: {e}")
+                conn.rollback()
+
+        index = RiskGridIndex(cell_size=float(os.getenv('SPATIAL_INDEX_CELL_SIZE', DEFAULT_CELL_SIZE)), version=version)
+        for layer in RISK_LAYERS:
+            for columns, build_record in layer["queries"]:
+                column_names = [c.strip() for c in columns.split(",")]
+                # Server-side cursor so marine_hci is never materialized as one result set
+                cursor = conn.cursor(name=f"risk_index_{layer['table']}")
+                cursor.itersize = 10000
+                try:
+                    cursor.execute(f"""
+                        SELECT {columns}
+                        FROM {layer['table']}
+                        WHERE {layer['lat_column']} IS NOT NULL AND {layer['lon_column']} IS NOT NULL
+                    """)
+                    grid_layer = index.add_layer(
+                        layer["table"],
+                        cursor,
+                        column_names.index(layer["lat_column"]),
+                        column_names.index(layer["lon_column"]),
+                        build_record
+                    )
+                    cursor.close()
+                    print(f"🗺️ Indexed {len(grid_layer)} rows from {layer['table']}")
+                    break
+                except Exception as e:
+                    print(f"⚠️ Could not index {layer['table']} ({columns}): {e}")
+                    conn.rollback()
+            else:
+                # Every column variant failed: /search reads this layer from the database instead
+                index.failed_layers.append(layer["table"])
+        risk_index = index
+        print(f"✅ Spatial index ready: {index.stats()}")
+        return index
+    except Exception as e:
+        print(f"⚠️ Spatial index load failed: {e} - using database queries")
+        return None
+    finally:
+        conn.close()
+
+if SPATIAL_INDEX_ENABLED and SPATIAL_INDEX_AVAILABLE and DATABASE_AVAILABLE:
+    # Load in the background so the app binds its port before the health check
+    start_risk_index_load()
+
+# Precomputed map clusters, built on the first /risks/clusters request
+risk_clusters = None
+risk_clusters_loader = None
+risk_clusters_lock = threading.Lock()
+
+def load_risk_clusters():
+    """Stream every risk layer into a multi-resolution cluster pyramid"""
+    global risk_clusters
+
+    conn = connect_db()
+    if conn is None:
+        return None
+
+    try:
+        # Read before the rows, as for the spatial index: a concurrent change leaves the pyramid stale, not wrong
+        version = None
+        if DATASET_VERSION_AVAILABLE:
+            try:
+                cursor = conn.cursor()
+                version = read_dataset_version(cursor)
+                cursor.close()
+            except Exception as e:
+                print(f"⚠️ Could not read dataset version for the risk clusters: {e}")
+                conn.rollback()
+
+        pyramid = RiskClusterPyramid(max_zoom=CLUSTER_MAX_ZOOM, version=version)
+        cursor = conn.cursor()
+        plans = get_risk_layer_plans(cursor)
+        cursor.close()
+        for layer in RISK_LAYERS:
+            plan = plans.get(layer["table"])
+            if plan is None:
+                continue
+            columns, build_record, _ = plan
+            # Server-side cursor, as for the spatial index - only the aggregates are kept
+            cursor = conn.cursor(name=f"risk_clusters_{layer['table']}")
+            cursor.itersize = 10000
+            cursor.execute(f"""
+                SELECT {columns}
+                FROM {layer['table']}
+                WHERE {layer['lat_column']} IS NOT NULL AND {layer['lon_column']} IS NOT NULL
+            """)
+            for row in cursor:
+                record = build_record(row, None, None)
+                if record["latitude"] is None or record["longitude"] is None:
+                    continue
+                pyramid.add(record["latitude"], record["longitude"], record["threat_code"])
+            cursor.close()
+        risk_clusters = pyramid.build()
+        print(f"✅ Risk clusters ready: {pyramid.points} points, zoom 0-{pyramid.max_zoom}")
+        return pyramid
+    except Exception as e:
+        print(f"⚠️ Risk cluster build failed: {e}")
+        return None
+    finally:
+        conn.close()
+
+def ensure_risk_clusters_loading(version=None):
+    """Start the background cluster build once (again after a failed build or a dataset version change)"""
+    global risk_clusters_loader
+    with risk_clusters_lock:
+        pyramid = risk_clusters
+        outdated = pyramid is None or (version is not None and pyramid.version != version)
+        if outdated and (risk_clusters_loader is None or not risk_clusters_loader.is_alive()):
+            risk_clusters_loader = threading.Thread(
+                target=load_risk_clusters, name="risk-clusters-loader", daemon=True
+            )
+            risk_clusters_loader.start()
+
+def current_risk_clusters():
+    """The cluster pyramid if it was built at the current dataset version; otherwise None and a rebuild starts"""
+    pyramid = risk_clusters
+    if pyramid is None or not DATASET_VERSION_AVAILABLE or pyramid.version is None:
+        return pyramid
+    version = get_dataset_version(connect_db)
+    if version != pyramid.version:
+        ensure_risk_clusters_loading(version)
+        return None  # Never serve counts from an older dataset, as tiles are never served across versions
+    return pyramid
+
+# Open HCI rasters, re-mapped when a new export replaces the files
+hci_rasters = {}
+hci_rasters_lock = threading.Lock()
+
+def get_hci_raster(table):
+    """Memory-mapped raster for an HCI layer, or None if it has not been exported"""
+    with hci_rasters_lock:
+        raster = hci_rasters.get(table)
+        if raster is None or raster.is_stale():
+            try:
+                raster = HciRaster(HCI_RASTER_DIR, table)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ HCI raster for {table} not available: {e}")
+                return None
+            hci_rasters[table] = raster
+        return raster
+
+def hci_record_builder(table):
+    """The /search record builder whose columns are exactly x, y and the raster bands"""
+    layer = next(layer for layer in RISK_LAYERS if layer["table"] == table)
+    for columns, build_record in layer["queries"]:
+        if split_columns(columns) == ["x", "y"] + HCI_LAYERS[table]:
+            return build_record
+    return None
+
 # Geocoding helper functions
 def get_lat_lon_from_zip(zipcode):
-    """Get coordinates from ZIP code"""
+    """Get coordinates from ZIP code (bundled NJ table first, network for unknown codes)"""
     try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"postalcode": zipcode, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
+        if ZIP_CENTROIDS_AVAILABLE:
+            point = resolve_zip(zipcode, geocode=geocode_zip if GEOCODE_CACHE_AVAILABLE else None)
+        elif GEOCODE_CACHE_AVAILABLE:
+            point = geocode_zip(zipcode)
+        else:
+            point = None
+        if point is None and not GEOCODE_CACHE_AVAILABLE:
+            # services.geocoding is missing: ask the fallback Nominatim client with a plain query
+            lat, lon, _ = get_lat_lon_from_address(f"{zipcode}, NJ")
+            point = (lat, lon) if lat and lon else None
 
-        if response.status_code == 200 and response.json():
-            data = response.json()[0]
-            latitude = float(data["lat"])
-            longitude = float(data["lon"])
-            return latitude, longitude
+        if point:
+            return point
         else:
             return 40.0583, -74.4057  # Default coordinates for New Jersey
 
@@ -337,14 +1126,10 @@ def get_lat_lon_from_zip(zipcode):
 def get_lat_lon_from_address(address):
     """Get coordinates from address string"""
     try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": address, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
+        results = nominatim_search({"q": address, "countrycodes": "us", "format": "json"})
 
-        if response.status_code == 200 and response.json():
-            data = response.json()[0]
+        if results:
+            data = results[0]
             latitude = float(data["lat"])
             longitude = float(data["lon"])
             # Extract ZIP code from display name
@@ -380,6 +1165,12 @@ def test():
     return jsonify({
         "message": "Test endpoint working",
         "database_available": DATABASE_AVAILABLE,
+        "spatial_index": risk_index.stats() if risk_index is not None else {"enabled": SPATIAL_INDEX_ENABLED, "ready": False},
+        "risk_clusters": risk_clusters.stats() if risk_clusters is not None else {"ready": False},
+        "search_cache": search_cache.stats() if search_cache is not None else {"enabled": False},
+        "geocode_cache": get_geocode_cache().stats() if GEOCODE_CACHE_AVAILABLE else {"enabled": False},
+        "zip_centroids": get_zip_centroids().stats() if ZIP_CENTROIDS_AVAILABLE else {"enabled": False},
+        "autocomplete": get_address_autocomplete().stats() if AUTOCOMPLETE_AVAILABLE else {"enabled": False},
         "environment_vars": {
             "PORT": os.getenv('PORT'),
             "DATABASE_URL_EXISTS": bool(os.getenv('DATABASE_URL')),
@@ -425,7 +1216,8 @@ def db_status():
             "status": "connected",
             "postgres_version": version[0] if version else "unknown",
             "users_table_exists": users_table_exists,
-            "database_url_configured": bool(os.getenv('DATABASE_URL'))
+            "database_url_configured": bool(os.getenv('DATABASE_URL')),
+            "connection_pool": pool_stats() if DB_POOL_AVAILABLE else None
         }), 200
         
     except Exception as e:
@@ -463,6 +1255,27 @@ def migrate_database():
             print(f"⚠️ Could not add updated_at column: {e}")
         
         conn.commit()
+
+        # Indexes for the /risks/bbox keyset pages
+        try:
+            for statement in bbox_keyset_index_statements():
+                cursor.execute(statement)
+            conn.commit()
+            print("✅ Created /risks/bbox keyset indexes")
+        except Exception as e:
+            print(f"⚠️ Could not create /risks/bbox keyset indexes: {e}")
+            conn.rollback()
+
+        # Dataset version stamp that invalidates cached tiles and searches whenever a loader rewrites a risk table
+        if DATASET_VERSION_AVAILABLE:
+            try:
+                for statement in dataset_version_setup_statements([layer["table"] for layer in RISK_LAYERS]):
+                    cursor.execute(statement)
+                conn.commit()
+                print("✅ Installed dataset version triggers on the risk tables")
+            except Exception as e:
+                print(f"⚠️ Could not install dataset version triggers: {e}")
+                conn.rollback()
         cursor.close()
         conn.close()
         
@@ -600,6 +1413,70 @@ def init_database():
     except Exception as e:
         return jsonify({"error": f"Database initialization failed: {str(e)}"}), 500
 
+def postgis_setup_statements():
+    """SQL that adds, backfills, indexes and maintains a geom column on every risk layer (see postgis_setup.sql)"""
+    statements = ["CREATE EXTENSION IF NOT EXISTS postgis;"]
+    trigger_functions = {}
+    for layer in RISK_LAYERS:
+        table, lat_column, lon_column = layer["table"], layer["lat_column"], layer["lon_column"]
+        function_name = "set_geom_from_" + "_".join(sorted([lat_column, lon_column]))
+        if function_name not in trigger_functions:
+            trigger_functions[function_name] = f"""
+                CREATE OR REPLACE FUNCTION {function_name}() RETURNS trigger AS $$
+                BEGIN
+                    NEW.geom := CASE
+                        WHEN NEW.{lat_column} IS NULL OR NEW.{lon_column} IS NULL THEN NULL
+                        ELSE ST_SetSRID(ST_MakePoint(NEW.{lon_column}, NEW.{lat_column}), 4326)
+                    END;
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+            """
+            statements.append(trigger_functions[function_name])
+
+        statements.extend([
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326);",
+            f"""
+                UPDATE {table} SET geom = ST_SetSRID(ST_MakePoint({lon_column}, {lat_column}), 4326)
+                WHERE geom IS NULL AND {lat_column} IS NOT NULL AND {lon_column} IS NOT NULL;
+            """,
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_geom ON {table} USING GIST (geom);",
+            f"DROP TRIGGER IF EXISTS trg_{table}_geom ON {table};",
+            f"""
+                CREATE TRIGGER trg_{table}_geom BEFORE INSERT OR UPDATE OF {lat_column}, {lon_column} ON {table}
+                FOR EACH ROW EXECUTE FUNCTION {function_name}();
+            """,
+            f"ANALYZE {table};",
+        ])
+    return statements
+
+@app.route("/init-postgis", methods=["GET"])
+def init_postgis():
+    """Add PostGIS geometry columns and GiST indexes to all risk tables"""
+    if not DATABASE_AVAILABLE:
+        return jsonify({"error": "Database dependencies not available"}), 500
+    
+    try:
+        conn = connect_db()
+        if conn is None:
+            return jsonify({"error": "Failed to connect to database"}), 500
+        
+        cursor = conn.cursor()
+        for statement in postgis_setup_statements():
+            cursor.execute(statement)
+        
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        return jsonify({
+            "message": "PostGIS geometry columns and GiST indexes initialized successfully",
+            "postgis_search_enabled": POSTGIS_ENABLED
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": f"PostGIS initialization failed: {str(e)}"}), 500
+
 # User Authentication Routes
 @app.route('/register', methods=['POST', 'OPTIONS'])
 def register():
@@ -729,21 +1606,17 @@ def address_autocomplete():
         return jsonify([])
 
     try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": query, "countrycodes": "us", "format": "json", "limit": 5},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
+        if AUTOCOMPLETE_AVAILABLE:
+            # Local prefix index; Nominatim only when nothing matches
+            return jsonify([{"display_name": name} for name in get_address_autocomplete().suggest(query)])
 
-        if response.status_code == 200:
-            suggestions = [
-                {"display_name": item.get("display_name", "")}
-                for item in response.json()
-                if "New Jersey" in item.get("display_name", "")
-            ]
-            return jsonify(suggestions)
-        else:
-            return jsonify([])
+        results = nominatim_search({"q": query, "countrycodes": "us", "format": "json", "limit": 5})
+        suggestions = [
+            {"display_name": item.get("display_name", "")}
+            for item in results
+            if "New Jersey" in item.get("display_name", "")
+        ]
+        return jsonify(suggestions)
     except Exception as e:
         print(f"Error fetching autocomplete data: {e}")
         return jsonify([])
@@ -773,7 +1646,7 @@ def search():
                 # Coordinates input (lat,lon)
                 try:
                     lat, lon = map(float, input_text.split(","))
-                    zip_code = "Unknown"
+                    zip_code = (nearest_zip(lat, lon) if ZIP_CENTROIDS_AVAILABLE else None) or "Unknown"
                     location_type = "coordinates"
                     print(f"📍 Parsed as coordinates: {lat}, {lon}")
                 except ValueError:
@@ -810,17 +1683,33 @@ def search():
                 "error": f"The location ({lat:.4f}, {lon:.4f}) is outside of New Jersey. This tool only supports New Jersey locations."
             }), 400
         
-        # Query real biodiversity risks from database
-        print(f"🔍 Searching biodiversity risks around lat: {lat}, lon: {lon}")
-        biodiversity_risks = query_biodiversity_risks(lat, lon, search_radius=0.1)
-        
-        # If no risks found in immediate area, expand search radius progressively
-        search_radii = [0.1, 0.2, 0.5]
-        for radius in search_radii:
-            if biodiversity_risks:
-                break
-            print(f"🔍 Expanding search radius to {radius} degrees")
-            biodiversity_risks = query_biodiversity_risks(lat, lon, search_radius=radius)
+        # Optional true distance search: "radius_mi" switches from degree squares to great-circle miles
+        radius_mi = data.get("radius_mi")
+        if radius_mi is not None:
+            try:
+                radius_mi = float(radius_mi)
+            except (TypeError, ValueError):
+                return jsonify({"error": "radius_mi must be a number of miles"}), 400
+            if not math.isfinite(radius_mi) or not 0 < radius_mi <= SEARCH_MAX_RADIUS_MI:
+                return jsonify({"error": f"radius_mi must be greater than 0 and at most {SEARCH_MAX_RADIUS_MI}"}), 400
+            if not DISTANCE_SEARCH_AVAILABLE:
+                return jsonify({"error": "Distance search is not available on this server"}), 500
+
+        # Layers that missed their deadline in parallel mode (results are then partial)
+        timed_out_layers = []
+
+        if radius_mi is not None:
+            print(f"🔍 Searching biodiversity risks within {radius_mi} mi of lat: {lat}, lon: {lon}")
+        else:
+            print(f"🔍 Searching biodiversity risks around lat: {lat}, lon: {lon} ({SEARCH_RADIUS_MODE}, radii {SEARCH_RADII})")
+        biodiversity_risks = cached_biodiversity_search(lat, lon, radius_mi, timed_out_layers)
+
+        if radius_mi is not None:
+            biodiversity_risks = rank_risks_by_distance(biodiversity_risks, lat, lon, radius_mi)
+        else:
+            biodiversity_risks = rank_risks_by_distance(
+                biodiversity_risks, lat, lon, sort=SEARCH_RADIUS_MODE == "single_pass"
+            )
         
         # If still no risks, create a general New Jersey biodiversity entry
         if not biodiversity_risks:
@@ -860,6 +1749,9 @@ def search():
             "search_metadata": {
                 "input_text": input_text,
                 "location_type": location_type,
+                "radius_mi": radius_mi,
+                "partial": bool(timed_out_layers),
+                "timed_out_layers": sorted(set(timed_out_layers)),
                 "search_successful": True
             },
             "message": f"Found {len(biodiversity_risks)} biodiversity risk(s) in the area around {input_text}"
@@ -877,6 +1769,325 @@ def search():
             }
         }), 500
 
+@app.route("/risks/bbox", methods=["GET"])
+def risks_in_bbox():
+    """Risks inside the map viewport, one keyset page per layer
+
+    Query parameters: south, west, north, east, zoom, optional limit (rows per layer) and
+    cursor (the next_cursor of the previous page for the same viewport and zoom). zoom does not
+    thin the rows - it only binds the cursor to the map state; use /risks/clusters or /tiles for
+    zoomed-out views. Run GET /migrate-db once for the indexes the pages rely on.
+    """
+    if not DATABASE_AVAILABLE or not COMBINED_QUERY_AVAILABLE:
+        return jsonify({"error": "Database not available - please check database connection"}), 500
+
+    try:
+        bounds = {key: float(request.args[key]) for key in ("south", "west", "north", "east")}
+        zoom = int(request.args["zoom"])
+        page_size = int(request.args.get("limit", BBOX_PAGE_SIZE))
+    except (KeyError, ValueError):
+        return jsonify({"error": "south, west, north, east and zoom are required numbers"}), 400
+
+    if bounds["south"] > bounds["north"] or bounds["west"] > bounds["east"]:
+        return jsonify({"error": "Invalid bounds: south must be <= north and west <= east"}), 400
+    if not all(math.isfinite(value) for value in bounds.values()):
+        return jsonify({"error": "south, west, north and east must be finite numbers"}), 400
+    if not 0 <= zoom <= 22:
+        return jsonify({"error": "zoom must be between 0 and 22"}), 400
+    page_size = max(1, min(page_size, BBOX_MAX_PAGE_SIZE))
+
+    # The cursor is tied to the viewport it was issued for
+    viewport = [round(bounds[key], 6) for key in ("south", "west", "north", "east")]
+    cursor_token = request.args.get("cursor")
+    if cursor_token:
+        try:
+            state = decode_page_cursor(cursor_token)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        after_ids = state.get("after")
+        if not isinstance(after_ids, dict) or not all(isinstance(v, int) for v in after_ids.values()):
+            return jsonify({"error": "malformed cursor"}), 400
+        if state.get("bbox") != viewport or state.get("zoom") != zoom:
+            return jsonify({"error": "Cursor does not match this viewport - start again without a cursor"}), 400
+    else:
+        after_ids = {layer["table"]: 0 for layer in RISK_LAYERS}
+
+    # Nothing is stored outside New Jersey, so only query the part of the viewport inside it
+    clipped = {
+        "south": max(bounds["south"], NJ_BOUNDS["south"]),
+        "west": max(bounds["west"], NJ_BOUNDS["west"]),
+        "north": min(bounds["north"], NJ_BOUNDS["north"]),
+        "east": min(bounds["east"], NJ_BOUNDS["east"]),
+    }
+    risks, next_ids = [], {}
+    if clipped["south"] <= clipped["north"] and clipped["west"] <= clipped["east"]:
+        conn = connect_db()
+        if conn is None:
+            return jsonify({"error": "Database connection failed"}), 500
+        cursor = conn.cursor()
+        try:
+            risks, next_ids = query_bbox_page(cursor, clipped, after_ids, page_size)
+        except Exception as e:
+            print(f"❌ Viewport risk query error: {e}")
+            conn.rollback()
+            reset_risk_layer_plans()
+            return jsonify({"error": f"Viewport query failed: {str(e)}"}), 500
+        finally:
+            cursor.close()
+            conn.close()
+
+    next_cursor = encode_page_cursor({"bbox": viewport, "zoom": zoom, "after": next_ids}) if next_ids else None
+    # Label the viewport with the ZIP nearest its centre (local k-d tree lookup)
+    center_zip = None
+    if ZIP_CENTROIDS_AVAILABLE:
+        center_zip = nearest_zip((bounds["south"] + bounds["north"]) / 2, (bounds["west"] + bounds["east"]) / 2)
+    return jsonify({
+        "risks": risks,
+        "total_risks": len(risks),
+        "bbox": bounds,
+        "zoom": zoom,
+        "zip": center_zip,
+        "page_size": page_size,
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor
+    }), 200
+
+@app.route("/risks/clusters", methods=["GET"])
+def risk_clusters_in_bbox():
+    """Pre-aggregated risk clusters (count, centroid, dominant threat_code) inside the map viewport
+
+    Query parameters: south, west, north, east, zoom. Answers 503 with ready=false while the
+    cluster pyramid is still being built; retry shortly or fall back to /risks/bbox.
+    """
+    if not DATABASE_AVAILABLE or not RISK_CLUSTERS_AVAILABLE:
+        return jsonify({"error": "Risk clusters not available on this server"}), 500
+
+    try:
+        bounds = {key: float(request.args[key]) for key in ("south", "west", "north", "east")}
+        zoom = int(request.args["zoom"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "south, west, north, east and zoom are required numbers"}), 400
+
+    if not all(math.isfinite(value) for value in bounds.values()):
+        return jsonify({"error": "south, west, north and east must be finite numbers"}), 400
+    if bounds["south"] > bounds["north"] or bounds["west"] > bounds["east"]:
+        return jsonify({"error": "Invalid bounds: south must be <= north and west <= east"}), 400
+    if not 0 <= zoom <= 22:
+        return jsonify({"error": "zoom must be between 0 and 22"}), 400
+
+    pyramid = current_risk_clusters()
+    if pyramid is None:
+        ensure_risk_clusters_loading()
+        return jsonify({"ready": False, "message": "Risk clusters are being built - try again shortly"}), 503
+
+    # No clusters lie outside New Jersey, so only the part of the viewport inside it is read
+    clipped = {
+        "south": max(bounds["south"], NJ_BOUNDS["south"]),
+        "west": max(bounds["west"], NJ_BOUNDS["west"]),
+        "north": min(bounds["north"], NJ_BOUNDS["north"]),
+        "east": min(bounds["east"], NJ_BOUNDS["east"]),
+    }
+    if clipped["south"] <= clipped["north"] and clipped["west"] <= clipped["east"]:
+        cluster_zoom, clusters = pyramid.query(clipped["south"], clipped["west"], clipped["north"],
+                                               clipped["east"], zoom)
+    else:
+        cluster_zoom, clusters = min(zoom, pyramid.max_zoom), []
+    return jsonify({
+        "ready": True,
+        "clusters": clusters,
+        "total_clusters": len(clusters),
+        "total_risks": sum(cluster["count"] for cluster in clusters),
+        "bbox": bounds,
+        "zoom": zoom,
+        "cluster_zoom": cluster_zoom,
+        "max_cluster_zoom": pyramid.max_zoom
+    }), 200
+
+@app.route("/tiles/metadata", methods=["GET"])
+def tile_metadata():
+    """Tile URL template pinned to the current dataset version, plus the available layers"""
+    if not DATABASE_AVAILABLE or not VECTOR_TILES_AVAILABLE:
+        return jsonify({"error": "Vector tiles not available on this server"}), 500
+
+    version = get_dataset_version(connect_db)
+    return jsonify({
+        "dataset_version": version,
+        "layers": [layer["table"] for layer in RISK_LAYERS],
+        "minzoom": 0,
+        "maxzoom": TILE_MAX_ZOOM,
+        "tiles": f"{request.host_url.rstrip('/')}/tiles/{{layer}}/{{z}}/{{x}}/{{y}}.mvt?v={version}"
+    }), 200
+
+# Dataset version whose tiles are on disk; older versions are deleted when it changes
+tile_cache = TileDiskCache(TILE_CACHE_DIR) if VECTOR_TILES_AVAILABLE else None
+tile_cache_version = None
+
+@app.route("/tiles/<layer_name>/<int:z>/<int:x>/<int:y>.mvt", methods=["GET"])
+def risk_tile(layer_name, z, x, y):
+    """One risk layer as a Mapbox Vector Tile, cached on disk per dataset version
+
+    URLs carrying the current version (?v=, see /tiles/metadata) never change content and
+    are cached by browsers for a year; other URLs revalidate against the version ETag.
+    """
+    global tile_cache_version
+    if not DATABASE_AVAILABLE or not VECTOR_TILES_AVAILABLE:
+        return jsonify({"error": "Vector tiles not available on this server"}), 500
+
+    layer = next((layer for layer in RISK_LAYERS if layer["table"] == layer_name), None)
+    if layer is None:
+        return jsonify({"error": f"Unknown layer '{layer_name}'"}), 404
+    if not 0 <= z <= TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": f"Invalid tile {z}/{x}/{y}"}), 400
+
+    # Without the version triggers a reload would go unnoticed, so nothing is cached
+    version = get_dataset_version(connect_db)
+    cacheable = version != UNVERSIONED
+    if cacheable and version != tile_cache_version:
+        tile_cache_version = version
+        tile_cache.prune(keep_version=version)
+
+    tile = tile_cache.get(version, layer_name, z, x, y) if cacheable else None
+    if tile is None:
+        conn = connect_db()
+        if conn is None:
+            return jsonify({"error": "Database connection failed"}), 500
+        cursor = conn.cursor()
+        try:
+            tile = build_risk_tile(cursor, layer, z, x, y)
+        except Exception as e:
+            print(f"❌ Tile {layer_name}/{z}/{x}/{y} failed: {e}")
+            conn.rollback()
+            reset_risk_layer_plans()
+            return jsonify({"error": f"Tile generation failed: {str(e)}"}), 500
+        finally:
+            cursor.close()
+            conn.close()
+        if cacheable:
+            try:
+                tile_cache.put(version, layer_name, z, x, y, tile)
+            except OSError as e:
+                print(f"⚠️ Could not cache tile {layer_name}/{z}/{x}/{y}: {e}")
+
+    response = Response(tile, mimetype="application/vnd.mapbox-vector-tile")
+    if not cacheable:
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    response.set_etag(version)
+    if request.args.get("v") == version:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response.headers["Cache-Control"] = f"public, max-age={TILE_MAX_AGE_SECONDS}"
+    return response.make_conditional(request)
+
+@app.route("/export-hci-rasters", methods=["GET"])
+def export_hci_rasters():
+    """Export the gridded HCI layers as memory-mapped rasters for /hci lookups"""
+    if not DATABASE_AVAILABLE or not HCI_RASTER_AVAILABLE or not COMBINED_QUERY_AVAILABLE:
+        return jsonify({"error": "HCI raster export not available on this server"}), 500
+
+    conn = connect_db()
+    if conn is None:
+        return jsonify({"error": "Failed to connect to database"}), 500
+
+    dataset_version = get_dataset_version(connect_db) if DATASET_VERSION_AVAILABLE else None
+    exported, failed = {}, {}
+    try:
+        cursor = conn.cursor()
+        available = detect_table_columns(cursor, list(HCI_LAYERS))
+        cursor.close()
+        for table, bands in HCI_LAYERS.items():
+            columns = ["x", "y"] + bands
+            if not set(columns) <= available.get(table, set()):
+                failed[table] = "table or required columns missing"
+                continue
+            cursor = conn.cursor(name=f"hci_export_{table}")
+            cursor.itersize = 10000
+            try:
+                cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE x IS NOT NULL AND y IS NOT NULL")
+                metadata = export_raster(cursor, bands, HCI_RASTER_DIR, table, dataset_version)
+                exported[table] = {key: metadata[key] for key in ("width", "height", "cells", "transform")}
+                print(f"🗺️ Exported {table} raster: {metadata['width']}x{metadata['height']}, {metadata['cells']} cells")
+                cursor.close()
+            except Exception as e:
+                failed[table] = str(e)
+                conn.rollback()
+    finally:
+        conn.close()
+
+    status = 200 if exported else 500
+    return jsonify({"directory": HCI_RASTER_DIR, "exported": exported, "failed": failed}), status
+
+@app.route("/hci/<layer_name>/point", methods=["GET"])
+def hci_point(layer_name):
+    """HCI values of the grid cell containing lat/lon, read from the memory-mapped raster"""
+    if not HCI_RASTER_AVAILABLE:
+        return jsonify({"error": "HCI rasters not available on this server"}), 500
+    if layer_name not in HCI_LAYERS:
+        return jsonify({"error": f"Unknown HCI layer '{layer_name}'", "layers": list(HCI_LAYERS)}), 404
+
+    try:
+        lat, lon = float(request.args["lat"]), float(request.args["lon"])
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lon are required numbers"}), 400
+    if not (math.isfinite(lat) and math.isfinite(lon)):
+        return jsonify({"error": "lat and lon must be finite numbers"}), 400
+
+    raster = get_hci_raster(layer_name)
+    if raster is None:
+        return jsonify({"error": f"No raster exported for {layer_name} - run /export-hci-rasters"}), 503
+
+    row = raster.point(lat, lon)
+    if row is None:
+        return jsonify({"layer": layer_name, "found": False}), 200
+
+    build_record = hci_record_builder(layer_name)
+    return jsonify({
+        "layer": layer_name,
+        "found": True,
+        "cell": {"x": row[0], "y": row[1]},
+        "values": dict(zip(raster.bands, row[2:])),
+        "risk": build_record(row, lat, lon) if build_record else None
+    }), 200
+
+@app.route("/hci/<layer_name>/window", methods=["GET"])
+def hci_window(layer_name):
+    """Risk records for every grid cell inside south/west/north/east, read from the raster"""
+    if not HCI_RASTER_AVAILABLE:
+        return jsonify({"error": "HCI rasters not available on this server"}), 500
+    if layer_name not in HCI_LAYERS:
+        return jsonify({"error": f"Unknown HCI layer '{layer_name}'", "layers": list(HCI_LAYERS)}), 404
+
+    try:
+        bounds = {key: float(request.args[key]) for key in ("south", "west", "north", "east")}
+    except (KeyError, ValueError):
+        return jsonify({"error": "south, west, north and east are required numbers"}), 400
+    if not all(math.isfinite(value) for value in bounds.values()):
+        return jsonify({"error": "south, west, north and east must be finite numbers"}), 400
+    if bounds["south"] > bounds["north"] or bounds["west"] > bounds["east"]:
+        return jsonify({"error": "Invalid bounds: south must be <= north and west <= east"}), 400
+
+    raster = get_hci_raster(layer_name)
+    if raster is None:
+        return jsonify({"error": f"No raster exported for {layer_name} - run /export-hci-rasters"}), 503
+
+    rows, cols = raster.window_shape(bounds["south"], bounds["west"], bounds["north"], bounds["east"])
+    window_cells = (rows.stop - rows.start) * (cols.stop - cols.start)
+    if window_cells > HCI_WINDOW_MAX_CELLS:
+        return jsonify({
+            "error": f"Window covers {window_cells} grid cells; the limit is {HCI_WINDOW_MAX_CELLS}"
+        }), 400
+
+    build_record = hci_record_builder(layer_name)
+    center_lat = (bounds["south"] + bounds["north"]) / 2
+    center_lon = (bounds["west"] + bounds["east"]) / 2
+    cells = raster.window(bounds["south"], bounds["west"], bounds["north"], bounds["east"])
+    return jsonify({
+        "layer": layer_name,
+        "bbox": bounds,
+        "risks": [build_record(row, center_lat, center_lon) for row in cells] if build_record else [],
+        "total_risks": len(cells)
+    }), 200
+
 @app.route("/session-risks", methods=["GET"])
 def get_session_risks():
     """Get risks from current session"""
@@ -1080,24 +2291,46 @@ def edit_location():
         if not all([new_hotel_name, new_street_address, new_city, new_zip_code, new_email]):
             return jsonify({"error": "All updated fields are required"}), 400
         
-        # Get coordinates for new address
-        full_address = f"{new_street_address}, {new_city}, NJ {new_zip_code}"
-        lat, lon, _ = get_lat_lon_from_address(full_address)
+        conn = connect_db()
+        if conn is None:
+            return jsonify({"error": "Failed to connect to database"}), 500
+        
+        cursor = conn.cursor()
+        
+        # Keep the stored coordinates when only the name or email changed
+        lat = lon = None
+        address_unchanged = (
+            (new_street_address, new_city, new_zip_code) ==
+            (original_street_address, original_city, original_zip_code)
+        )
+        if address_unchanged:
+            cursor.execute("""
+                SELECT latitude, longitude FROM hotel_locations
+                WHERE user_id = %s AND hotel_name = %s AND street_address = %s
+                      AND city = %s AND zip_code = %s
+            """, (session['user_id'], original_hotel_name, original_street_address,
+                  original_city, original_zip_code))
+            stored = cursor.fetchone()
+            if stored:
+                lat, lon = stored
+        
+        if lat is None or lon is None:
+            # Get coordinates for new address
+            full_address = f"{new_street_address}, {new_city}, NJ {new_zip_code}"
+            lat, lon, _ = get_lat_lon_from_address(full_address)
         
         if lat is None or lon is None:
+            cursor.close()
+            conn.close()
             return jsonify({"error": "Could not determine coordinates for the new address"}), 400
         
         # Check if new location is within New Jersey bounds
         if not (NJ_BOUNDS["south"] <= lat <= NJ_BOUNDS["north"] and 
                 NJ_BOUNDS["west"] <= lon <= NJ_BOUNDS["east"]):
+            cursor.close()
+            conn.close()
             return jsonify({"error": "New location must be within New Jersey"}), 400
         
-        conn = connect_db()
-        if conn is None:
-            return jsonify({"error": "Failed to connect to database"}), 500
-        
-        cursor = conn.cursor()
-        
         # Update the location (only for the current user)
         cursor.execute("""
             UPDATE hotel_locations 
@@ -1231,6 +2464,24 @@ if __name__ == "__main__":
     port = int(os.getenv('PORT', 5000))
     print(f"🚀 Starting minimal Flask app on 0.0.0.0:{port}")
     
+    # Detect risk table capabilities once at startup so the first search doesn't pay for it
+    if DATABASE_AVAILABLE and COMBINED_QUERY_AVAILABLE:
+        try:
+            conn = connect_db()
+            if conn:
+                cursor = conn.cursor()
+                get_risk_layer_plans(cursor)
+                cursor.close()
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ Capability detection failed: {e} - will retry on first search")
+    
+    # Load the bundled ZIP table now rather than on the first ZIP search
+    if ZIP_CENTROIDS_AVAILABLE:
+        get_zip_centroids()
+    if AUTOCOMPLETE_AVAILABLE:
+        get_address_autocomplete()
+    
     try:
         app.run(
             host='0.0.0.0',
@@ -0,0 +1,93 @@
+-- =====================================================
+-- Bioscope Optional PostGIS Setup
+-- Run this script in your Supabase SQL Editor after database_setup.sql,
+-- then set POSTGIS_ENABLED=true on the backend.
+-- (GET /init-postgis on minimal_app.py runs the same statements.)
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+-- =====================================================
+-- Keep geom in sync with the coordinate columns the loaders write
+-- =====================================================
+CREATE OR REPLACE FUNCTION set_geom_from_latitude_longitude() RETURNS trigger AS $$
+BEGIN
+    NEW.geom := CASE
+        WHEN NEW.latitude IS NULL OR NEW.longitude IS NULL THEN NULL
+        ELSE ST_SetSRID(ST_MakePoint(NEW.longitude, NEW.latitude), 4326)
+    END;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION set_geom_from_x_y() RETURNS trigger AS $$
+BEGIN
+    NEW.geom := CASE
+        WHEN NEW.x IS NULL OR NEW.y IS NULL THEN NULL
+        ELSE ST_SetSRID(ST_MakePoint(NEW.x, NEW.y), 4326)
+    END;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- 1. INVASIVE SPECIES
+-- =====================================================
+ALTER TABLE invasive_species ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326);
+UPDATE invasive_species SET geom = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+WHERE geom IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_invasive_species_geom ON invasive_species USING GIST (geom);
+DROP TRIGGER IF EXISTS trg_invasive_species_geom ON invasive_species;
+CREATE TRIGGER trg_invasive_species_geom BEFORE INSERT OR UPDATE OF latitude, longitude ON invasive_species
+FOR EACH ROW EXECUTE FUNCTION set_geom_from_latitude_longitude();
+
+-- =====================================================
+-- 2. IUCN DATA
+-- =====================================================
+ALTER TABLE iucn_data ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326);
+UPDATE iucn_data SET geom = ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)
+WHERE geom IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_iucn_data_geom ON iucn_data USING GIST (geom);
+DROP TRIGGER IF EXISTS trg_iucn_data_geom ON iucn_data;
+CREATE TRIGGER trg_iucn_data_geom BEFORE INSERT OR UPDATE OF latitude, longitude ON iucn_data
+FOR EACH ROW EXECUTE FUNCTION set_geom_from_latitude_longitude();
+
+-- =====================================================
+-- 3. FRESHWATER RISK
+-- =====================================================
+ALTER TABLE freshwater_risk ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326);
+UPDATE freshwater_risk SET geom = ST_SetSRID(ST_MakePoint(x, y), 4326)
+WHERE geom IS NULL AND x IS NOT NULL AND y IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_freshwater_risk_geom ON freshwater_risk USING GIST (geom);
+DROP TRIGGER IF EXISTS trg_freshwater_risk_geom ON freshwater_risk;
+CREATE TRIGGER trg_freshwater_risk_geom BEFORE INSERT OR UPDATE OF x, y ON freshwater_risk
+FOR EACH ROW EXECUTE FUNCTION set_geom_from_x_y();
+
+-- =====================================================
+-- 4. MARINE HCI
+-- =====================================================
+ALTER TABLE marine_hci ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326);
+UPDATE marine_hci SET geom = ST_SetSRID(ST_MakePoint(x, y), 4326)
+WHERE geom IS NULL AND x IS NOT NULL AND y IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_marine_hci_geom ON marine_hci USING GIST (geom);
+DROP TRIGGER IF EXISTS trg_marine_hci_geom ON marine_hci;
+CREATE TRIGGER trg_marine_hci_geom BEFORE INSERT OR UPDATE OF x, y ON marine_hci
+FOR EACH ROW EXECUTE FUNCTION set_geom_from_x_y();
+
+-- =====================================================
+-- 5. TERRESTRIAL RISK
+-- =====================================================
+ALTER TABLE terrestrial_risk ADD COLUMN IF NOT EXISTS geom geometry(Point, 4326);
+UPDATE terrestrial_risk SET geom = ST_SetSRID(ST_MakePoint(x, y), 4326)
+WHERE geom IS NULL AND x IS NOT NULL AND y IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_terrestrial_risk_geom ON terrestrial_risk USING GIST (geom);
+DROP TRIGGER IF EXISTS trg_terrestrial_risk_geom ON terrestrial_risk;
+CREATE TRIGGER trg_terrestrial_risk_geom BEFORE INSERT OR UPDATE OF x, y ON terrestrial_risk
+FOR EACH ROW EXECUTE FUNCTION set_geom_from_x_y();
+
+-- Refresh planner statistics so the GiST indexes are picked up
+ANALYZE invasive_species;
+ANALYZE iucn_data;
+ANALYZE freshwater_risk;
+ANALYZE marine_hci;
+ANALYZE terrestrial_risk;
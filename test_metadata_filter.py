@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Offline parity checks for matches_where (backend/services/metadata_filter.py).
+
+The numpy vector store and the BM25 index filter metadata in Python, while
+the default backend hands the same where clauses to ChromaDB. Each case below
+lists the ids ChromaDB 1.5.9 returned for collection.get(where=...) over
+METADATAS, so the two backends answer a filtered query identically.
+
+    python test_metadata_filter.py      (or: python -m pytest test_metadata_filter.py)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from services.metadata_filter import matches_where  # noqa: E402
+
+METADATAS = {
+    "0": {"risk_type": "invasive", "level": 1},
+    "1": {"risk_type": "freshwater", "level": 2},
+    "2": {"risk_type": "marine"},
+    "3": {"level": 3},
+    "4": {"risk_type": "invasive", "level": 3, "flag": True},
+}
+
+# (where, ids ChromaDB returns)
+CHROMA_CASES = [
+    ({"risk_type": "invasive"}, ["0", "4"]),
+    ({"risk_type": {"$eq": "marine"}}, ["2"]),
+    ({"risk_type": {"$ne": "invasive"}}, ["1", "2", "3"]),
+    ({"risk_type": {"$in": ["invasive", "marine"]}}, ["0", "2", "4"]),
+    ({"risk_type": {"$nin": ["invasive"]}}, ["1", "2", "3"]),
+    ({"level": {"$ne": 3}}, ["0", "1", "2"]),
+    ({"level": {"$nin": [1, 2]}}, ["2", "3", "4"]),
+    ({"$and": [{"risk_type": "invasive"}, {"level": 3}]}, ["4"]),
+    ({"$or": [{"risk_type": "marine"}, {"level": 2}]}, ["1", "2"]),
+    ({"$or": [{"$and": [{"risk_type": "invasive"}, {"level": {"$ne": 1}}]},
+              {"risk_type": {"$eq": "freshwater"}}]}, ["1", "4"]),
+    ({"flag": True}, ["4"]),
+    ({"flag": {"$eq": True}}, ["4"]),
+    ({"level": 1.0}, ["0"]),
+    # Booleans and numbers never compare equal
+    ({"flag": 1}, []),
+    ({"level": True}, []),
+    ({"flag": {"$in": [1]}}, []),
+    ({"flag": {"$ne": 1}}, ["0", "1", "2", "3", "4"]),
+    ({"level": {"$nin": [True]}}, ["0", "1", "2", "3", "4"]),
+    # A missing field passes $ne and $nin
+    ({"missing": {"$ne": "x"}}, ["0", "1", "2", "3", "4"]),
+    ({"missing": {"$nin": ["x"]}}, ["0", "1", "2", "3", "4"]),
+]
+
+
+def filtered_ids(where):
+    return sorted(row_id for row_id, metadata in METADATAS.items() if matches_where(metadata, where))
+
+
+def test_chroma_parity():
+    for where, expected in CHROMA_CASES:
+        assert filtered_ids(where) == expected, (where, filtered_ids(where), expected)
+
+
+def test_empty_where_matches_everything():
+    assert filtered_ids(None) == sorted(METADATAS)
+    assert filtered_ids({}) == sorted(METADATAS)
+
+
+def test_unsupported_operator_is_rejected():
+    try:
+        matches_where({"level": 2}, {"level": {"$gt": 1}})
+    except ValueError:
+        return
+    raise AssertionError("$gt should raise ValueError instead of silently matching")
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} metadata filter checks passed")
+    sys.exit(1 if failed else 0)
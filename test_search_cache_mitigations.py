@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Offline check that /search (backend/app.py) never serves mitigation texts
+from the search result cache.
+
+A search answered while the ML components are still loading gets the static
+fallback actions. The same search repeated once the knowledge base is ready
+must come from the cache (no second database query) yet carry the real
+actions. The database, dataset version and ChromaDB lookup are stubbed on
+the imported modules; nothing leaves the process.
+
+    python test_search_cache_mitigations.py      (or: python -m pytest test_search_cache_mitigations.py)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+os.environ.setdefault("MITIGATION_ML_PRELOAD", "false")
+os.environ["SEARCH_CACHE_ENABLED"] = "true"
+
+import app as backend_app  # noqa: E402
+import mitigation_action  # noqa: E402
+
+RISK_ROWS = [
+    {"latitude": 40.0, "longitude": -74.5, "risk_type": "Invasive Species",
+     "description": "Japanese stiltgrass", "threat_code": "high"},
+    {"latitude": 40.01, "longitude": -74.49, "risk_type": "Marine Risk",
+     "description": "Marine HCI Score: 0.8", "threat_code": "high"},
+]
+READY_ACTION = {"score": 9, "action": "Remove the stand before seed set."}
+
+
+class FakeConnection:
+    def cursor(self):
+        return object()
+
+    def close(self):
+        pass
+
+
+def search(client):
+    # A ZIP from the bundled centroid table, so no geocoding request is made
+    response = client.post("/search", json={"input_text": "08540"})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["risks"]
+
+
+def test_cached_search_gets_current_mitigations():
+    queries = []
+
+    def query_search_risks(cursor, lat, lon, offset):
+        queries.append((lat, lon, offset))
+        return [dict(risk) for risk in RISK_ROWS]
+
+    saved = (backend_app.connect_db, backend_app.get_dataset_version, backend_app.query_search_risks,
+             mitigation_action.chroma_collection, mitigation_action.start_ml_loading,
+             mitigation_action.resolve_mitigation_actions)
+    backend_app.connect_db = FakeConnection
+    backend_app.get_dataset_version = lambda connect: "42"
+    backend_app.query_search_risks = query_search_risks
+    mitigation_action.start_ml_loading = lambda: None
+    backend_app.search_cache.clear()
+    try:
+        client = backend_app.app.test_client()
+
+        # Still loading: fallback actions, and the rows go into the cache
+        mitigation_action.chroma_collection = None
+        loading = search(client)
+        assert len(queries) == 1
+        assert all("Monitor the area periodically" in risk["mitigation"]["action"] for risk in loading)
+
+        # Ready: answered from the cache, with the knowledge base's actions
+        mitigation_action.chroma_collection = object()
+        mitigation_action.resolve_mitigation_actions = lambda keys: {key: READY_ACTION for key in keys}
+        ready = search(client)
+        assert len(queries) == 1, "the second search should be a cache hit"
+        assert [risk["description"] for risk in ready] == [risk["description"] for risk in RISK_ROWS]
+        assert all(risk["mitigation"] == READY_ACTION for risk in ready)
+    finally:
+        (backend_app.connect_db, backend_app.get_dataset_version, backend_app.query_search_risks,
+         mitigation_action.chroma_collection, mitigation_action.start_ml_loading,
+         mitigation_action.resolve_mitigation_actions) = saved
+        backend_app.search_cache.clear()
+
+
+if __name__ == "__main__":
+    try:
+        test_cached_search_gets_current_mitigations()
+        print("✅ test_cached_search_gets_current_mitigations")
+    except AssertionError as e:
+        print(f"❌ test_cached_search_gets_current_mitigations: {e}")
+        sys.exit(1)
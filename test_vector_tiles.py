@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Offline checks for the MVT encoder in backend/services/vector_tiles.py.
+
+Decodes the encoder's output with a minimal protobuf reader and checks it
+against the Mapbox Vector Tile 2.1 spec: zigzag and command integers, layer
+fields, key/value deduplication and a full feature round trip.
+
+    python test_vector_tiles.py      (or: python -m pytest test_vector_tiles.py)
+"""
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from services.vector_tiles import (  # noqa: E402
+    DEFAULT_BUFFER, DEFAULT_EXTENT, _tile_position, _zigzag, encode_point_layer, encode_tile, tile_bounds
+)
+
+# Tile 10/297/388 covers central New Jersey
+Z, X, Y = 10, 297, 388
+
+
+def read_varint(data, position):
+    result = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, position
+
+
+def read_fields(data):
+    """[(field number, wire type, value)] of one protobuf message; length-delimited values stay bytes."""
+    fields, position = [], 0
+    while position < len(data):
+        key, position = read_varint(data, position)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, position = read_varint(data, position)
+        elif wire_type == 1:
+            value, position = data[position:position + 8], position + 8
+        elif wire_type == 2:
+            length, position = read_varint(data, position)
+            value, position = data[position:position + length], position + length
+        else:
+            raise AssertionError(f"unexpected wire type {wire_type}")
+        fields.append((field, wire_type, value))
+    return fields
+
+
+def read_packed(data):
+    values, position = [], 0
+    while position < len(data):
+        value, position = read_varint(data, position)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    (field, _, value), = read_fields(data)
+    if field == 1:
+        return value.decode("utf-8")
+    if field == 3:
+        return struct.unpack("<d", value)[0]
+    if field == 5:
+        return value
+    if field == 6:
+        return unzigzag(value)
+    if field == 7:
+        return bool(value)
+    raise AssertionError(f"unexpected value field {field}")
+
+
+def decode_layer(data):
+    layer = {"features": [], "keys": [], "values": []}
+    for field, _, value in read_fields(data):
+        if field == 15:
+            layer["version"] = value
+        elif field == 1:
+            layer["name"] = value.decode("utf-8")
+        elif field == 2:
+            layer["features"].append(read_fields(value))
+        elif field == 3:
+            layer["keys"].append(value.decode("utf-8"))
+        elif field == 4:
+            layer["values"].append(decode_value(value))
+        elif field == 5:
+            layer["extent"] = value
+    return layer
+
+
+def decode_feature(layer, fields):
+    feature = {}
+    for field, _, value in fields:
+        if field == 1:
+            feature["id"] = value
+        elif field == 2:
+            tags = read_packed(value)
+            feature["properties"] = {layer["keys"][k]: layer["values"][v] for k, v in zip(tags[::2], tags[1::2])}
+        elif field == 3:
+            feature["type"] = value
+        elif field == 4:
+            feature["geometry"] = read_packed(value)
+    return feature
+
+
+def decode_tile(data):
+    layers = []
+    for field, _, value in read_fields(data):
+        assert field == 3, "a Tile only holds layers (field 3)"
+        layers.append(decode_layer(value))
+    return layers
+
+
+def tile_center():
+    south, west, north, east = tile_bounds(Z, X, Y)
+    return (south + north) / 2, (west + east) / 2
+
+
+def test_zigzag():
+    # Examples from the protobuf encoding guide
+    for value, expected in ((0, 0), (-1, 1), (1, 2), (-2, 3), (2147483647, 4294967294), (-2147483648, 4294967295)):
+        assert _zigzag(value) == expected, (value, _zigzag(value))
+        assert unzigzag(_zigzag(value)) == value
+
+
+def test_point_command_integers():
+    lat, lon = tile_center()
+    layer = decode_layer(encode_point_layer("risks", [(7, lat, lon, {})], Z, X, Y))
+    feature = decode_feature(layer, layer["features"][0])
+    command, dx, dy = feature["geometry"]
+    # MoveTo (id 1) with a count of 1: (1 & 0x7) | (1 << 3)
+    assert command == 9
+    assert feature["type"] == 1  # POINT
+    assert (unzigzag(dx), unzigzag(dy)) == _tile_position(lat, lon, Z, X, Y, DEFAULT_EXTENT)
+    assert "properties" not in feature  # no tags field for a feature without properties
+
+
+def test_layer_fields():
+    layer = decode_layer(encode_point_layer("invasive_species", [], Z, X, Y))
+    assert layer["version"] == 2
+    assert layer["name"] == "invasive_species"
+    assert layer["extent"] == DEFAULT_EXTENT
+    assert layer["features"] == [] and layer["keys"] == [] and layer["values"] == []
+
+
+def test_key_and_value_dedup():
+    lat, lon = tile_center()
+    features = [
+        (1, lat, lon, {"threat_code": "high", "risk_type": "Invasive"}),
+        (2, lat + 0.05, lon, {"threat_code": "high", "risk_type": "Invasive"}),
+        (3, lat, lon + 0.05, {"threat_code": "low", "risk_type": "Invasive"}),
+    ]
+    layer = decode_layer(encode_point_layer("risks", features, Z, X, Y))
+    assert layer["keys"] == ["threat_code", "risk_type"]
+    assert layer["values"] == ["high", "Invasive", "low"]
+
+
+def test_values_of_different_types_are_not_merged():
+    lat, lon = tile_center()
+    properties = {"a": 1, "b": 1.0, "c": True, "d": "1", "e": -5}
+    layer = decode_layer(encode_point_layer("risks", [(1, lat, lon, properties)], Z, X, Y))
+    assert len(layer["values"]) == 5
+    feature = decode_feature(layer, layer["features"][0])
+    for key, value in properties.items():
+        assert feature["properties"][key] == value and type(feature["properties"][key]) is type(value), key
+
+
+def test_round_trip():
+    south, west, north, east = tile_bounds(Z, X, Y)
+    features = [
+        (101, south + (north - south) * 0.25, west + (east - west) * 0.75,
+         {"risk_id": "iucn_data:101", "threat_code": "high", "score": 0.875}),
+        (102, south + (north - south) * 0.6, west + (east - west) * 0.1,
+         {"risk_id": "iucn_data:102", "threat_code": "low", "description": None}),
+    ]
+    tile = encode_tile([encode_point_layer("iucn_data", features, Z, X, Y),
+                        encode_point_layer("marine_hci", [], Z, X, Y)])
+    layers = decode_tile(tile)
+    assert [layer["name"] for layer in layers] == ["iucn_data", "marine_hci"]
+
+    decoded = [decode_feature(layers[0], fields) for fields in layers[0]["features"]]
+    assert [feature["id"] for feature in decoded] == [101, 102]
+    for feature, (_, lat, lon, properties) in zip(decoded, features):
+        _, dx, dy = feature["geometry"]
+        assert (unzigzag(dx), unzigzag(dy)) == _tile_position(lat, lon, Z, X, Y, DEFAULT_EXTENT)
+        # None properties are left out rather than encoded
+        assert feature["properties"] == {key: value for key, value in properties.items() if value is not None}
+
+
+def test_same_pixel_and_out_of_buffer_points_are_dropped():
+    lat, lon = tile_center()
+    south, west, north, east = tile_bounds(Z, X, Y)
+    far_east = east + (east - west) * (2 * DEFAULT_BUFFER / DEFAULT_EXTENT)
+    features = [
+        (1, lat, lon, {}),
+        (2, lat + 1e-9, lon, {}),  # lands on the same pixel as feature 1
+        (3, lat, far_east, {}),  # outside the tile and its buffer
+        (4, lat, east + (east - west) * (DEFAULT_BUFFER / 2 / DEFAULT_EXTENT), {}),  # inside the buffer
+    ]
+    layer = decode_layer(encode_point_layer("risks", features, Z, X, Y))
+    assert [decode_feature(layer, fields)["id"] for fields in layer["features"]] == [1, 4]
+
+
+if __name__ == "__main__":
+    tests = [(name, test) for name, test in sorted(globals().items()) if name.startswith("test_") and callable(test)]
+    failed = 0
+    for name, test in tests:
+        try:
+            test()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {name}: {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} vector tile checks passed")
+    sys.exit(1 if failed else 0)